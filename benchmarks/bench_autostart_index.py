@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# Cold vs warm autostart scan over synthetic .desktop files.
+# Usage: python3 benchmarks/bench_autostart_index.py [count]
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from toastcore.index import DesktopIndex
+
+
+def make_entries(directory, count):
+    directory.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        (directory / f"app-{i:05d}.desktop").write_text(
+            "[Desktop Entry]\n"
+            "Type=Application\n"
+            f"Name=Synthetic App {i}\n"
+            f"Comment=Benchmark entry number {i}\n"
+            f"Exec=/usr/bin/synthetic-{i} --background\n"
+            "Icon=application-x-executable\n"
+            f"Hidden={'true' if i % 7 == 0 else 'false'}\n"
+            "X-GNOME-Autostart-enabled=true\n"
+        )
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        user_dir = tmp / "user"
+        system_dir = tmp / "system"
+        make_entries(user_dir, count // 2)
+        make_entries(system_dir, count - count // 2)
+        dirs = [(user_dir, "user"), (system_dir, "system")]
+        cache = tmp / "cache" / "autostart-index.json"
+
+        cold_ms, rows = timed(lambda: DesktopIndex(cache, dirs).scan())
+        # Fresh instance: index is read back from disk, as on the next app start.
+        warm_index = DesktopIndex(cache, dirs)
+        warm_ms, _ = timed(warm_index.scan)
+        warm_parsed = warm_index.parsed
+        hot_ms, _ = timed(warm_index.scan)
+
+        (user_dir / "app-00000.desktop").write_text("[Desktop Entry]\nName=Touched\n")
+        touched_ms, _ = timed(warm_index.scan)
+
+        print(f"entries:              {len(rows)}")
+        print(f"cold scan (no cache): {cold_ms:8.1f} ms")
+        print(f"warm scan (disk):     {warm_ms:8.1f} ms  parsed={warm_parsed}")
+        print(f"hot rescan:           {hot_ms:8.1f} ms")
+        print(f"rescan, 1 changed:    {touched_ms:8.1f} ms  parsed={warm_index.parsed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# Opens ToastWindow once and prints its startup marks as JSON
+# ({"first_paint_ms": ..., "populated_ms": ...}), measured from the import of
+# main.py. Used by run.py.
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.argv = sys.argv[:1]
+
+import main as app  # noqa: E402
+from gi.repository import GLib, Gtk  # noqa: E402
+
+
+def check(win):
+    if "populated" in win.startup_marks:
+        Gtk.main_quit()
+        return False
+    return True
+
+
+win = app.ToastWindow()
+win.show_all()
+GLib.timeout_add(10, check, win)
+GLib.timeout_add_seconds(30, Gtk.main_quit)
+Gtk.main()
+print(json.dumps({f"{stage}_ms": round(ms, 1) for stage, ms in win.startup_marks.items()}))
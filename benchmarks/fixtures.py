@@ -0,0 +1,101 @@
+# Synthetic /proc trees and autostart directories for the benchmarks.
+# Everything is generated from a seed, so two runs see identical inputs.
+
+import os
+import random
+from pathlib import Path
+
+HZ = os.sysconf("SC_CLK_TCK")
+COMMS = (
+    "bash", "firefox", "Web Content", "code", "python3", "node", "pipewire",
+    "gnome-shell", "Xwayland", "dbus-daemon", "systemd", "kworker/0:1",
+    "evolution-alarm", "tracker-miner-f", "nautilus", "slack", "discord",
+    "steam", "chrome", "(sd-pam)", "gvfsd", "nm-applet", "synthetic app",
+)
+UPTIME = 86400.0
+MEM_TOTAL_KB = 16 * 1024 * 1024
+
+
+def stat_line(pid, comm, state, ppid, utime, stime, threads, starttime, rss_pages):
+    # Field layout of /proc/<pid>/stat (proc(5)); unused fields are zero.
+    fields = [state, ppid, pid, pid, 0, -1, 4194304, 0, 0, 0, 0, utime, stime,
+              0, 0, 20, 0, threads, 0, starttime, rss_pages * 4096 * 4, rss_pages]
+    fields += [0] * (52 - 2 - len(fields))
+    return f"{pid} ({comm}) " + " ".join(str(f) for f in fields) + "\n"
+
+
+def write_process(root, pid, rng, tick=0):
+    comm = rng.choice(COMMS)
+    d = root / str(pid)
+    d.mkdir(exist_ok=True)
+    starttime = rng.randrange(1, int(UPTIME * HZ) // 2)
+    utime = rng.randrange(0, 50000) + tick * rng.randrange(0, 30)
+    stime = rng.randrange(0, 10000)
+    rss_pages = rng.randrange(100, 200000)
+    threads = rng.randrange(1, 64)
+    ppid = max(1, pid - rng.randrange(1, 50))
+    (d / "stat").write_text(stat_line(pid, comm, rng.choice("SSSSRID"), ppid, utime, stime,
+                                      threads, starttime, rss_pages))
+    args = [f"/usr/bin/{comm.split()[0].lower()}"] + [f"--opt-{rng.randrange(1000)}" for _ in range(rng.randrange(0, 6))]
+    (d / "cmdline").write_bytes(b"\0".join(a.encode() for a in args) + b"\0")
+    (d / "comm").write_text(comm + "\n")
+    (d / "io").write_text(f"rchar: 0\nwchar: 0\nsyscr: 0\nsyscw: 0\n"
+                          f"read_bytes: {rng.randrange(0, 1 << 30)}\n"
+                          f"write_bytes: {rng.randrange(0, 1 << 28)}\n"
+                          "cancelled_write_bytes: 0\n")
+    (d / "smaps_rollup").write_text(f"00400000-7fff0000 ---p 00000000 00:00 0 [rollup]\n"
+                                    f"Rss: {rss_pages * 4} kB\nPss: {rss_pages * 3} kB\n")
+
+
+def make_proc_tree(root, count, seed=0):
+    # A fake /proc with `count` process dirs plus meminfo, uptime and stat.
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    (root / "meminfo").write_text(f"MemTotal: {MEM_TOTAL_KB} kB\nMemFree: {MEM_TOTAL_KB // 2} kB\n"
+                                  f"MemAvailable: {MEM_TOTAL_KB // 2} kB\n")
+    (root / "uptime").write_text(f"{UPTIME:.2f} {UPTIME * 4:.2f}\n")
+    for pid in range(1, count + 1):
+        write_process(root, pid, rng)
+    return root
+
+
+def advance_proc_tree(root, count, tick, seed=0, churn=0.01):
+    # Rewrites stat for every process (more CPU time) and replaces `churn`
+    # of them with new processes, as between two real refresh ticks.
+    root = Path(root)
+    rng = random.Random(seed * 1000003 + tick)
+    for pid in range(1, count + 1):
+        if rng.random() < churn:
+            write_process(root, pid, rng, tick)
+            continue
+        path = root / str(pid) / "stat"
+        head, _, rest = path.read_text().rpartition(") ")
+        fields = rest.split()
+        fields[11] = str(int(fields[11]) + rng.randrange(0, 30))
+        path.write_text(f"{head}) {' '.join(fields)}\n")
+
+
+def make_autostart_dir(directory, count, seed=0, start=0):
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    for i in range(start, start + count):
+        comm = rng.choice(COMMS)
+        lines = [
+            "[Desktop Entry]\n",
+            "Type=Application\n",
+            f"Name={comm if i % 3 == 0 else f'Synthetic App {i}'}\n",
+            f"Name[de]=Synthetische App {i}\n",
+            f"Comment=Benchmark entry number {i}\n",
+            f"Exec=/usr/bin/synthetic-{i} --background\n",
+            "Icon=application-x-executable\n",
+            f"Hidden={'true' if i % 7 == 0 else 'false'}\n",
+            "X-GNOME-Autostart-enabled=true\n",
+        ]
+        if i % 5 == 0:
+            lines.append("OnlyShowIn=GNOME;KDE;\n")
+        if i % 11 == 0:
+            lines.append("\n[Desktop Action New]\nName=New Window\nExec=/usr/bin/synthetic --new\n")
+        (directory / f"app-{i:05d}.desktop").write_text("".join(lines))
+    return directory
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# Refresh-path benchmarks over generated /proc trees and autostart dirs.
+#
+#   python3 benchmarks/run.py --out results.json
+#   python3 benchmarks/run.py --quick --compare results.json --threshold 10
+#
+# Exits 1 in compare mode if any benchmark got slower than the threshold (%).
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / "src"))
+sys.path.insert(0, str(BENCH_DIR))
+
+from fixtures import advance_proc_tree, make_autostart_dir, make_proc_tree
+from toastcore.autostart import AutostartRepository
+from toastcore.filtering import filter_processes
+from toastcore.index import DesktopIndex
+from toastcore.sampler import Sampler
+
+# Differences below this are timer noise, whatever the percentage.
+NOISE_FLOOR_MS = 0.05
+
+
+def measure(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": round(statistics.median(runs), 3), "min_ms": round(min(runs), 3), "runs": len(runs)}
+
+
+def tick_counters(sampler):
+    # What one steady-state sample costs besides time: bytes read from
+    # /proc/<pid>, processes read in full, and the allocations it leaves
+    # alive (the snapshot) and peaks at.
+    gc.collect()
+    tracemalloc.start()
+    sampler.sample()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"bytes_read": sampler.bytes_read, "full_reads": sampler.full_reads,
+            "live_blocks": blocks, "peak_kb": peak // 1024}
+
+
+def process_rows(processes):
+    # The per-row formatting ToastWindow.show_processes does, minus GTK.
+    return [[str(p.pid), p.comm, f"{p.cpu:.1f}", f"{p.mem:.1f}", p.args, p.comm.lower()] for p in processes]
+
+
+def liststore_update():
+    # Gtk.ListStore works without a display; returns None if GTK is missing.
+    try:
+        import gi
+        gi.require_version("Gtk", "3.0")
+        from gi.repository import Gtk
+    except (ImportError, ValueError):
+        return None
+
+    def update(rows):
+        store = Gtk.ListStore(str, str, str, str, str, str)
+        for row in rows:
+            store.append(row)
+    return update
+
+
+def first_window_ms():
+    # Launches the real window once per run under a display (or xvfb-run).
+    env = dict(os.environ)
+    cmd = [sys.executable, str(BENCH_DIR / "first_window.py")]
+    if not (env.get("DISPLAY") or env.get("WAYLAND_DISPLAY")):
+        if not shutil.which("xvfb-run"):
+            return None, "no display and no xvfb-run"
+        cmd = ["xvfb-run", "-a"] + cmd
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, timeout=60, env=env)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return None, str(e)
+    try:
+        return json.loads(out.stdout.strip().splitlines()[-1]), None
+    except (ValueError, IndexError):
+        return None, (out.stderr.strip().splitlines() or ["no output"])[-1]
+
+
+def run_suite(args):
+    results = {}
+    skipped = {}
+    counters = {}
+
+    def record(name, value):
+        results[name] = value
+        print(f"{name:<34}{value['median_ms']:>10.2f} ms  (min {value['min_ms']:.2f})", flush=True)
+
+    with tempfile.TemporaryDirectory(prefix="simplytoast-bench-") as tmp:
+        tmp = Path(tmp)
+        snapshots = {}
+        for n in args.procs:
+            root = make_proc_tree(tmp / f"proc-{n}", n, seed=n)
+            sampler = Sampler(proc_root=str(root))
+            sampler.sample()
+            record(f"proc.scan[{n}]", measure(sampler.sample, args.repeat))
+            advance_proc_tree(root, n, 1, seed=n)
+            name = f"proc.tick[{n}]"
+            counters[name] = tick_counters(sampler)
+            print(f"{name:<34}" + "  ".join(f"{k}={v}" for k, v in counters[name].items()), flush=True)
+            snapshot = sampler.sample()
+            snapshots[n] = snapshot.processes
+            record(f"proc.filter[{n}]", measure(lambda: filter_processes(snapshot.processes, "fire"), args.repeat))
+            record(f"model.rows[{n}]", measure(lambda: process_rows(snapshot.processes), args.repeat))
+            update = liststore_update()
+            if update is None:
+                skipped[f"model.liststore[{n}]"] = "PyGObject not available"
+            else:
+                rows = process_rows(snapshot.processes)
+                record(f"model.liststore[{n}]", measure(lambda: update(rows), args.repeat))
+            shutil.rmtree(root)
+
+        impact_procs = snapshots[min(snapshots, key=lambda n: abs(n - 10000))] if snapshots else ()
+        for m in args.entries:
+            user_dir = make_autostart_dir(tmp / f"autostart-{m}" / "user", m // 2, seed=m)
+            system_dir = make_autostart_dir(tmp / f"autostart-{m}" / "system", m - m // 2, seed=m + 1, start=m // 2)
+            dirs = [(user_dir, "user"), (system_dir, "system")]
+            record(f"autostart.parse[{m}]", measure(lambda: DesktopIndex(None, dirs).scan(), args.repeat))
+            index = DesktopIndex(None, dirs)
+            index.scan()
+            record(f"autostart.scan[{m}]", measure(index.scan, args.repeat))
+            repo = AutostartRepository(index)
+            repo.refresh()
+            record(f"autostart.impact[{m}x{len(impact_procs)}]",
+                   measure(lambda: repo.impact(impact_procs), args.repeat))
+
+    if args.window:
+        value, reason = first_window_ms()
+        if value is None:
+            skipped["startup.first_window"] = reason
+        else:
+            for name, ms in value.items():
+                record(f"startup.{name}", {"median_ms": ms, "min_ms": ms, "runs": 1})
+
+    for name, reason in skipped.items():
+        print(f"{name:<34}   skipped: {reason}")
+    return {
+        "meta": {
+            "time": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+        "counters": counters,
+        "skipped": skipped,
+    }
+
+
+def compare(current, baseline, threshold):
+    # Returns the names that regressed by more than threshold percent. The
+    # fastest run is compared, as it is the least disturbed by other load.
+    regressions = []
+    print(f"\n{'benchmark (min ms)':<34}{'baseline':>10}{'current':>10}{'change':>9}")
+    for name, value in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if old is None:
+            continue
+        before, after = old["min_ms"], value["min_ms"]
+        change = (after - before) / before * 100 if before else 0.0
+        flag = ""
+        if change > threshold and after - before > NOISE_FLOOR_MS:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<34}{before:>10.2f}{after:>10.2f}{change:>+8.1f}%{flag}")
+    return regressions
+
+
+def sizes(text):
+    return [int(s) for s in text.split(",") if s]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SimplyToast refresh-path benchmarks")
+    parser.add_argument("--procs", type=sizes, default=[1000, 10000, 50000], help="fake /proc sizes")
+    parser.add_argument("--entries", type=sizes, default=[100, 5000], help="autostart dir sizes")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="1k processes and 100 entries only")
+    parser.add_argument("--no-window", dest="window", action="store_false", help="skip time-to-first-window")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.procs, args.entries = [1000], [100]
+
+    current = run_suite(args)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(current, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:g}%: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# How Sampler scales with worker threads on a generated /proc tree.
+#
+#   python3 benchmarks/scaling.py --procs 20000 --workers 1,2,4,8
+#
+# Every worker count is forced parallel (parallel_min=0); the last line shows
+# what the automatic choice does for the same tree on this machine.
+
+import argparse
+import gc
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / "src"))
+sys.path.insert(0, str(BENCH_DIR))
+
+from fixtures import make_proc_tree
+from toastcore.sampler import Sampler
+
+
+def time_sampler(sampler, repeat):
+    sampler.sample()
+    runs = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        sampler.sample()
+        runs.append((time.perf_counter() - start) * 1000)
+    return statistics.median(runs), min(runs)
+
+
+def sizes(text):
+    return [int(s) for s in text.split(",") if s]
+
+
+def main(argv=None):
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, 8, cpus} & set(range(1, cpus + 1))) or [1]
+    parser = argparse.ArgumentParser(description="Sampler thread scaling")
+    parser.add_argument("--procs", type=int, default=20000)
+    parser.add_argument("--workers", type=sizes, default=default_workers)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="simplytoast-scaling-") as tmp:
+        root = str(make_proc_tree(Path(tmp) / "proc", args.procs, seed=args.procs))
+        print(f"{args.procs} processes, {cpus} CPUs")
+        print(f"{'workers':<10}{'median ms':>12}{'min ms':>10}{'speedup':>9}")
+        base = None
+        reference = None
+        for workers in args.workers:
+            sampler = Sampler(proc_root=root, workers=workers, parallel_min=0)
+            median, fastest = time_sampler(sampler, args.repeat)
+            keys = sorted(p.key for p in sampler.latest.processes)
+            if reference is None:
+                reference = keys
+            elif keys != reference:
+                print(f"{workers} workers returned a different process set", file=sys.stderr)
+                return 1
+            sampler.close()
+            base = base or median
+            print(f"{workers:<10}{median:>12.2f}{fastest:>10.2f}{base / median:>8.2f}x")
+        sampler = Sampler(proc_root=root)
+        median, fastest = time_sampler(sampler, args.repeat)
+        sampler.close()
+        print(f"{'auto':<10}{median:>12.2f}{fastest:>10.2f}{base / median:>8.2f}x"
+              f"  ({sampler.shards} shard{'s' if sampler.shards != 1 else ''})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -74,6 +74,8 @@ mkdir -p "$TMP_DEB"/{usr/bin,usr/share/simplytoast,usr/share/applications,usr/sh
 # Ensure executable and correct permissions
 install -Dm755 src/main.py "$TMP_DEB/usr/bin/simplytoast"
 cp -r assets data "$TMP_DEB/usr/share/simplytoast/"
+mkdir -p "$TMP_DEB/usr/share/simplytoast/src"
+cp -r src/toastcore "$TMP_DEB/usr/share/simplytoast/src/"
 cp data/com.toast1599.SimplyToast.desktop "$TMP_DEB/usr/share/applications/"
 cp data/com.toast1599.SimplyToast.png "$TMP_DEB/usr/share/icons/hicolor/512x512/apps/"
 cp data/com.toast1599.SimplyToast.appdata.xml "$TMP_DEB/usr/share/metainfo/" || true
@@ -98,6 +100,8 @@ mkdir -p "$TMP_APPDIR"/{usr/bin,usr/share/simplytoast,usr/share/applications,usr
 
 install -Dm755 src/main.py "$TMP_APPDIR/usr/bin/simplytoast"
 cp -r assets data "$TMP_APPDIR/usr/share/simplytoast/"
+mkdir -p "$TMP_APPDIR/usr/share/simplytoast/src"
+cp -r src/toastcore "$TMP_APPDIR/usr/share/simplytoast/src/"
 cp data/com.toast1599.SimplyToast.desktop "$TMP_APPDIR/usr/share/applications/"
 cp data/com.toast1599.SimplyToast.png "$TMP_APPDIR/usr/share/icons/hicolor/512x512/apps/"
 cp data/com.toast1599.SimplyToast.appdata.xml "$TMP_APPDIR/usr/share/metainfo/" || true
@@ -131,6 +135,7 @@ else
   # copy src, data, assets, and any desktop/icon referenced
   mkdir -p "$TMP_SNAPDIR/src" "$TMP_SNAPDIR/data" "$TMP_SNAPDIR/assets"
   cp -a src/main.py "$TMP_SNAPDIR/src/"
+  cp -a src/toastcore "$TMP_SNAPDIR/src/"
   cp -a data/* "$TMP_SNAPDIR/data/" || true
   cp -a assets/* "$TMP_SNAPDIR/assets/" || true
 
@@ -1,23 +1,72 @@
 #!/usr/bin/env python3
 
-import gi
-gi.require_version("Gtk", "3.0")
-from gi.repository import Gtk, Gdk, GdkPixbuf, GLib
+import time
+STARTED = time.perf_counter()
+
 import json
-import subprocess
+import sys
+import threading
 from pathlib import Path
 import os
 
+# Installed builds keep the toastcore package under /usr/share/simplytoast/src.
+APP_DIR = Path(__file__).resolve().parent
+if not (APP_DIR / "toastcore").is_dir():
+    sys.path.insert(0, str(APP_DIR.parent / "share" / "simplytoast" / "src"))
+
+from toastcore.cli import COMMANDS, run as run_cli
+
+# CLI subcommands never load GTK.
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+    sys.exit(run_cli(sys.argv[1:]))
+
+import gi
+gi.require_version("Gtk", "3.0")
+from gi.repository import Gtk, Gdk, GdkPixbuf, GLib, Gio
+
+from toastcore.alerts import AlertEngine
+from toastcore.autostart import AutostartRepository, render_entry, write_atomic
+from toastcore.baseline import (SIGNIFICANT_T, BaselineCapture, BaselineError, compare, format_change,
+                                list_baselines, load_baseline, save_baseline)
+from toastcore.control import ThrottleSet
+from toastcore.daemon import CollectorClient
+from toastcore.desktop import current_desktops
+from toastcore.details import DetailLoader, format_details
+from toastcore.filtering import filter_processes, toast_filter
+from toastcore.focus import FocusMode
+from toastcore.leaks import LeakDetector, format_rate
+from toastcore.lifecycle import LifecycleLog
+from toastcore.paths import AUTOSTART_USER, CACHE_DIR, CONFIG_DIR, autostart_dirs
+from toastcore.processes import impact_percent, usage_by_comm
+from toastcore.profiling import PROFILER
+from toastcore.rules import RuleEngine
+from toastcore.sampler import Sampler
+from toastcore.snapshot import EMPTY_SNAPSHOT
+from toastcore.system import EMPTY_SYSTEM, SystemSampler, refresh_factor
+from toastcore.trace import TraceError, TraceReader, TraceWriter, changes as trace_changes
+from toastcore.users import SCOPE_USER, SCOPES, USER_NAMES
+
 # ---------- Constants ----------
-CONFIG_DIR = Path.home() / ".config" / "simplytoast"
 SETTINGS_FILE = CONFIG_DIR / "settings.json"
-CSS_DIR = Path(__file__).resolve().parent.parent / "data" / "css"
-AUTOSTART_USER = Path.home() / ".config" / "autostart"
-AUTOSTART_SYSTEM = Path("/etc/xdg/autostart")
+SETTINGS_SAVE_DELAY_MS = 1000
+CSS_DIR = APP_DIR.parent / "data" / "css"
+USER_THEME_DIR = CONFIG_DIR / "themes"
+BUILTIN_THEMES = ("light", "mid", "dark")
 REFRESH_INTERVAL_MS = 3000
+WATCH_COALESCE_MS = 250
+WATCH_MAX_PENDING = 256
 DEFAULT_THEME = "dark"
-
-current_provider = None
+GENERIC_ICON = "application-x-executable"
+PROFILE_FILE = CACHE_DIR / "profile.json"
+# (menu text, minutes or None for "until resumed").
+FREEZE_CHOICES = (("Until resumed", None), ("For 15 minutes", 15), ("For 1 hour", 60))
+SCOPE_LABELS = {"me": "My Processes", "all": "All Users", "system": "System Services"}
+REPLAY_SPEEDS = (0.5, 1, 2, 4, 8, 16)
+# Replay waits the recorded gap between snapshots / speed, within these bounds.
+REPLAY_MIN_STEP_MS = 50
+REPLAY_MAX_STEP_MS = 10000
+# (menu text, seconds) for Capture Baseline.
+BASELINE_CHOICES = (("1 minute", 60), ("5 minutes", 300), ("15 minutes", 900))
 
 
 # ---------- Settings ----------
@@ -36,88 +85,237 @@ def load_settings():
 
 def save_settings(settings):
     CONFIG_DIR.mkdir(parents=True, exist_ok=True)
-    with open(SETTINGS_FILE, "w") as f:
-        json.dump(settings, f, indent=2)
+    write_atomic(SETTINGS_FILE, json.dumps(settings, indent=2))
 
 
-# ---------- Theme ----------
-def apply_theme(window, theme_name):
-    global current_provider
-    css_path = CSS_DIR / f"{theme_name}.css"
-    if not css_path.exists():
-        return
-
-    screen = Gdk.Screen.get_default()
-    if current_provider is not None:
-        try:
-            Gtk.StyleContext.remove_provider_for_screen(screen, current_provider)
-        except Exception:
-            pass
+class SettingsWriter:
+    # Debounces settings.json writes: repeated changes within
+    # SETTINGS_SAVE_DELAY_MS collapse into one atomic write.
 
-    provider = Gtk.CssProvider()
-    provider.load_from_path(str(css_path))
-    Gtk.StyleContext.add_provider_for_screen(screen, provider, Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
-    current_provider = provider
+    def __init__(self, settings):
+        self.settings = settings
+        self.save_id = 0
 
+    def schedule(self):
+        if self.save_id:
+            GLib.source_remove(self.save_id)
+        self.save_id = GLib.timeout_add(SETTINGS_SAVE_DELAY_MS, self.flush)
 
-# ---------- Autostart handling ----------
-def scan_autostart():
-    entries = []
-    if AUTOSTART_USER.exists():
-        for f in sorted(AUTOSTART_USER.glob("*.desktop")):
-            entries.append((f, "user"))
-    if AUTOSTART_SYSTEM.exists():
-        for f in sorted(AUTOSTART_SYSTEM.glob("*.desktop")):
-            entries.append((f, "system"))
-    return entries
+    def flush(self):
+        if self.save_id:
+            GLib.source_remove(self.save_id)
+            self.save_id = 0
+        try:
+            save_settings(self.settings)
+        except OSError:
+            pass
+        return False
 
 
-def parse_desktop_file(filepath):
-    name = filepath.stem
-    comment = ""
-    icon = ""
-    enabled = True
+# ---------- Notifications ----------
+class Notifier:
+    # Desktop notifications over org.freedesktop.Notifications, sent
+    # asynchronously; a repeat for the same key replaces the old bubble.
 
-    try:
-        with open(filepath, "r", errors="ignore") as f:
-            for line in f:
-                if line.startswith("Name="):
-                    name = line.split("=", 1)[1].strip()
-                elif line.startswith("Comment="):
-                    comment = line.split("=", 1)[1].strip()
-                elif line.startswith("Icon="):
-                    icon = line.split("=", 1)[1].strip()
-                elif line.startswith("Hidden="):
-                    enabled = not ("true" in line.lower())
-    except Exception:
-        pass
+    def __init__(self):
+        self.bus = None
+        self.ids = {}
 
-    return name, comment, icon, enabled
+    def send(self, key, title, body, icon="dialog-warning"):
+        if self.bus is None:
+            try:
+                self.bus = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+            except GLib.Error:
+                return
+        params = GLib.Variant("(susssasa{sv}i)", (
+            "SimplyToast", self.ids.get(key, 0), icon, title, body, [], {}, -1))
+        self.bus.call("org.freedesktop.Notifications", "/org/freedesktop/Notifications",
+                      "org.freedesktop.Notifications", "Notify", params, GLib.VariantType("(u)"),
+                      Gio.DBusCallFlags.NONE, -1, None, self.on_sent, key)
+
+    def on_sent(self, bus, result, key):
+        try:
+            self.ids[key] = bus.call_finish(result).unpack()[0]
+        except GLib.Error:
+            pass
 
 
-def set_enabled(filepath, enabled):
-    try:
-        lines = []
-        found = False
-        with open(filepath, "r", errors="ignore") as f:
-            for line in f:
-                if line.startswith("Hidden="):
-                    found = True
-                    line = "Hidden=false\n" if enabled else "Hidden=true\n"
-                lines.append(line)
-        if not found:
-            lines.append("Hidden=false\n" if enabled else "Hidden=true\n")
-        with open(filepath, "w") as f:
-            f.writelines(lines)
-    except Exception:
-        pass
+# ---------- Theme ----------
+class ThemeManager:
+    # Every theme is parsed once into its own Gtk.CssProvider; switching only
+    # swaps providers on the screen. Themes come from CSS_DIR and from
+    # CONFIG_DIR/themes (a user file with a built-in name replaces it). Edited
+    # theme files are re-parsed one at a time from a Gio.FileMonitor.
 
+    def __init__(self):
+        self.paths = {}
+        self.providers = {}
+        self.current = None
+        self.monitors = []
+        self.preload_id = 0
+
+    def discover(self):
+        self.paths = {}
+        for directory in (CSS_DIR, USER_THEME_DIR):
+            try:
+                names = sorted(os.listdir(directory))
+            except OSError:
+                continue
+            for name in names:
+                if name.endswith(".css"):
+                    self.paths[name[:-4]] = str(directory / name)
+
+    def names(self):
+        builtin = [name for name in BUILTIN_THEMES if name in self.paths]
+        return builtin + sorted(name for name in self.paths if name not in BUILTIN_THEMES)
+
+    def load(self, name):
+        # Parses one theme; a broken edit keeps the last good provider.
+        path = self.paths.get(name)
+        if path is None:
+            return None
+        with PROFILER.span("theme.load"):
+            provider = Gtk.CssProvider()
+            try:
+                provider.load_from_path(path)
+            except GLib.Error:
+                return self.providers.get(name)
+        self.providers[name] = provider
+        return provider
+
+    def preload(self):
+        # The other themes are parsed at idle so the first paint doesn't wait.
+        pending = [name for name in self.names() if name not in self.providers]
+
+        def step():
+            while pending:
+                name = pending.pop(0)
+                if name not in self.providers:
+                    self.load(name)
+                    return True
+            self.preload_id = 0
+            return False
+        if pending and not self.preload_id:
+            self.preload_id = GLib.idle_add(step, priority=GLib.PRIORITY_LOW)
+
+    def apply(self, name):
+        provider = self.providers.get(name) or self.load(name)
+        if provider is None:
+            return False
+        with PROFILER.span("theme.swap"):
+            screen = Gdk.Screen.get_default()
+            if self.current is not None and self.current[1] is not provider:
+                Gtk.StyleContext.remove_provider_for_screen(screen, self.current[1])
+            if self.current is None or self.current[1] is not provider:
+                Gtk.StyleContext.add_provider_for_screen(screen, provider, Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
+        self.current = (name, provider)
+        return True
 
-def delete_autostart(filepath):
-    try:
-        Path(filepath).unlink(missing_ok=True)
-    except Exception:
-        pass
+    def start(self):
+        for directory in (CSS_DIR, USER_THEME_DIR):
+            try:
+                monitor = Gio.File.new_for_path(str(directory)).monitor_directory(Gio.FileMonitorFlags.WATCH_MOVES, None)
+            except GLib.Error:
+                continue
+            monitor.set_rate_limit(WATCH_COALESCE_MS)
+            monitor.connect("changed", self.on_event)
+            self.monitors.append(monitor)
+
+    def stop(self):
+        for monitor in self.monitors:
+            monitor.cancel()
+        self.monitors = []
+        if self.preload_id:
+            GLib.source_remove(self.preload_id)
+            self.preload_id = 0
+
+    def on_event(self, monitor, gfile, other, event):
+        if event not in (Gio.FileMonitorEvent.CHANGES_DONE_HINT, Gio.FileMonitorEvent.CREATED,
+                         Gio.FileMonitorEvent.DELETED, Gio.FileMonitorEvent.MOVED_IN,
+                         Gio.FileMonitorEvent.MOVED_OUT, Gio.FileMonitorEvent.RENAMED):
+            return
+        touched = set()
+        for f in (gfile, other):
+            name = f.get_basename() if f is not None else None
+            if name and name.endswith(".css"):
+                touched.add(name[:-4])
+        if not touched:
+            return
+        before = dict(self.paths)
+        self.discover()
+        for name in touched:
+            if name not in self.paths:
+                self.providers.pop(name, None)
+            elif self.paths[name] != before.get(name) or name in self.providers:
+                self.load(name)
+        # Re-apply if the active theme was reparsed (new provider object) or removed.
+        if self.current is not None and self.current[0] in touched:
+            name = self.current[0] if self.current[0] in self.paths else DEFAULT_THEME
+            self.apply(name)
+
+
+# ---------- Autostart watching ----------
+class AutostartWatcher:
+    # One Gio.FileMonitor per autostart dir. Bursts of events are coalesced into
+    # a single on_changed({path: source}) call; on_rescan() is only used when the
+    # monitor loses track (unmount, directory itself replaced, event flood).
+
+    def __init__(self, on_changed, on_rescan):
+        self.on_changed = on_changed
+        self.on_rescan = on_rescan
+        self.monitors = []
+        self.pending = {}
+        self.overflowed = False
+        self.flush_id = 0
+
+    def start(self):
+        self.stop()
+        for directory, source in autostart_dirs():
+            try:
+                monitor = Gio.File.new_for_path(str(directory)).monitor_directory(
+                    Gio.FileMonitorFlags.WATCH_MOVES, None)
+            except GLib.Error:
+                continue
+            monitor.set_rate_limit(WATCH_COALESCE_MS)
+            monitor.connect("changed", self.on_event, str(directory), source)
+            self.monitors.append(monitor)
+
+    def stop(self):
+        for monitor in self.monitors:
+            monitor.cancel()
+        self.monitors = []
+        if self.flush_id:
+            GLib.source_remove(self.flush_id)
+            self.flush_id = 0
+        self.pending = {}
+        self.overflowed = False
+
+    def on_event(self, monitor, gfile, other, event, directory, source):
+        if event in (Gio.FileMonitorEvent.PRE_UNMOUNT, Gio.FileMonitorEvent.UNMOUNTED):
+            self.overflowed = True
+        else:
+            for f in (gfile, other):
+                path = f.get_path() if f is not None else None
+                if not path:
+                    continue
+                if path == directory:
+                    self.overflowed = True
+                elif path.endswith(".desktop") and os.path.dirname(path) == directory:
+                    self.pending[path] = source
+            if len(self.pending) > WATCH_MAX_PENDING:
+                self.overflowed = True
+        if not self.flush_id:
+            self.flush_id = GLib.timeout_add(WATCH_COALESCE_MS, self.flush)
+
+    def flush(self):
+        self.flush_id = 0
+        pending, self.pending = self.pending, {}
+        if self.overflowed:
+            self.overflowed = False
+            self.on_rescan()
+        elif pending:
+            self.on_changed(pending)
+        return False
 
 
 # ---------- Entry Windows ----------
@@ -168,35 +366,18 @@ class NewEntryWindow(Gtk.Window):
             self.destroy()
             return
 
-        AUTOSTART_USER.mkdir(parents=True, exist_ok=True)
         filename = AUTOSTART_USER / f"{name.replace(' ', '_')}.desktop"
-
-        text = [
-            "[Desktop Entry]\n",
-            "Type=Application\n",
-            f"Name={name}\n",
-            f"Exec={cmd}\n",
-        ]
-        if comment:
-            text.append(f"Comment={comment}\n")
-        if icon:
-            text.append(f"Icon={icon}\n")
-
-        text.append("Hidden=false\n")
-        text.append("X-GNOME-Autostart-enabled=true\n")
-
-        with open(filename, "w") as f:
-            f.writelines(text)
-
-        self.parent.refresh_autostart()
+        batch = self.parent.repo.batch()
+        batch.write(filename, render_entry(name, cmd, comment, icon))
+        self.parent.apply_batch(batch)
         self.destroy()
 
 
 class EditEntryWindow(Gtk.Window):
-    def __init__(self, parent, filepath, name, cmd, comment, icon):
+    def __init__(self, parent, entry):
         super().__init__(title="Edit Autostart Entry")
         self.parent = parent
-        self.filepath = filepath
+        self.entry = entry
         self.set_default_size(350, 300)
         self.set_modal(True)
         self.set_transient_for(parent)
@@ -208,10 +389,10 @@ class EditEntryWindow(Gtk.Window):
         box.set_margin_right(20)
         self.add(box)
 
-        self.entry_name = self._labeled_entry(box, "Name:", name)
-        self.entry_cmd = self._labeled_entry(box, "Command:", cmd)
-        self.entry_comment = self._labeled_entry(box, "Comment:", comment)
-        self.entry_icon = self._labeled_entry(box, "Icon:", icon)
+        self.entry_name = self._labeled_entry(box, "Name:", entry.name)
+        self.entry_cmd = self._labeled_entry(box, "Command:", entry.exec)
+        self.entry_comment = self._labeled_entry(box, "Comment:", entry.comment)
+        self.entry_icon = self._labeled_entry(box, "Icon:", entry.icon)
 
         btn_box = Gtk.Box(spacing=10)
         btn_cancel = Gtk.Button(label="Cancel")
@@ -237,69 +418,124 @@ class EditEntryWindow(Gtk.Window):
         comment = self.entry_comment.get_text().strip()
         icon = self.entry_icon.get_text().strip()
 
-        lines = [
-            "[Desktop Entry]\n",
-            "Type=Application\n",
-            f"Name={name}\n",
-            f"Exec={cmd}\n",
-        ]
-        if comment:
-            lines.append(f"Comment={comment}\n")
-        if icon:
-            lines.append(f"Icon={icon}\n")
-        lines.append("Hidden=false\n")
-        lines.append("X-GNOME-Autostart-enabled=true\n")
-
-        with open(self.filepath, "w") as f:
-            f.writelines(lines)
+        if not name or not cmd:
+            self.destroy()
+            return
 
-        self.parent.refresh_autostart()
+        # Only the edited keys change; OnlyShowIn, TryExec, actions etc. are kept.
+        # Editing a system entry writes a user shadow file with the same basename.
+        batch = self.parent.repo.batch()
+        batch.update(self.entry, {
+            "Name": name,
+            "Exec": cmd,
+            "Comment": comment or None,
+            "Icon": icon or None,
+        })
+        self.parent.apply_batch(batch)
         self.destroy()
 
 
-# ---------- Processes & Filtering ----------
-def scan_processes():
-    user = os.environ.get("USER") or os.getlogin()
-    try:
-        cmd = f"ps -u {user} -o pid=,comm=,%cpu=,%mem=,args="
-        out = subprocess.check_output(cmd, shell=True, stderr=subprocess.DEVNULL).decode(errors="ignore")
-        rows = []
-        for line in out.splitlines():
-            parts = line.strip().split(None, 4)
-            if len(parts) >= 5:
-                pid, comm, cpu, mem, args = parts
-            elif len(parts) == 4:
-                pid, comm, cpu, mem = parts
-                args = comm
-            else:
-                continue
-            try:
-                cpu_f = float(cpu)
-                mem_f = float(mem)
-            except Exception:
-                cpu_f = 0.0
-                mem_f = 0.0
-            rows.append((pid, comm, cpu, mem, args, cpu_f, mem_f))
-        rows.sort(key=lambda x: (-x[5], -x[6]))
-        return rows
-    except Exception:
-        return []
+# ---------- System header ----------
+class SystemHeader(Gtk.DrawingArea):
+    # Per-core CPU bars plus CPU / memory / swap / PSI text, drawn with cairo
+    # in one widget: an update is a queue_draw(), never a relayout.
+    WIDTH = 300
+    HEIGHT = 40
 
+    def __init__(self):
+        super().__init__()
+        self.sample = EMPTY_SYSTEM
+        self.set_size_request(self.WIDTH, self.HEIGHT)
+        self.set_has_tooltip(True)
+        self.connect("draw", self.on_draw)
+        self.connect("query-tooltip", self.on_query_tooltip)
+
+    def update(self, sample):
+        self.sample = sample
+        self.queue_draw()
+
+    def on_draw(self, widget, cr):
+        ctx = self.get_style_context()
+        fg = ctx.get_color(ctx.get_state())
+        height = self.get_allocated_height()
+        s = self.sample
+        cores = s.cores or (s.cpu,)
+        bar = max(2.0, min(8.0, 80.0 / len(cores)))
+        x = 0.0
+        for busy in cores:
+            cr.set_source_rgba(fg.red, fg.green, fg.blue, 0.15)
+            cr.rectangle(x, 4, bar - 1, height - 8)
+            cr.fill()
+            cr.set_source_rgba(fg.red, fg.green, fg.blue, 0.75)
+            level = (height - 8) * min(busy, 100.0) / 100
+            cr.rectangle(x, height - 4 - level, bar - 1, level)
+            cr.fill()
+            x += bar
+        x += 8
+        cr.set_source_rgba(fg.red, fg.green, fg.blue, fg.alpha)
+        cr.set_font_size(11)
+        gib = 1024 * 1024
+        cr.move_to(x, height / 2 - 3)
+        line = f"CPU {s.cpu:.0f}%   Mem {s.mem_used / gib:.1f}/{s.mem_total / gib:.1f}G"
+        if s.swap_total:
+            line += f"   Swap {s.swap_used / gib:.1f}G"
+        cr.show_text(line)
+        cr.move_to(x, height / 2 + 11)
+        if s.pressure:
+            cr.show_text("Stall  " + "  ".join(f"{r} {some:.0f}%" for r, (some, _) in s.pressure.items()))
+        return False
+
+    def on_query_tooltip(self, widget, x, y, keyboard, tooltip):
+        s = self.sample
+        lines = [f"CPU {s.cpu:.1f}% (" + ", ".join(f"{c:.0f}" for c in s.cores) + ")",
+                 f"Memory {s.mem_used // 1024} / {s.mem_total // 1024} MB",
+                 f"Swap {s.swap_used // 1024} / {s.swap_total // 1024} MB"]
+        for resource, (some, full) in s.pressure.items():
+            lines.append(f"{resource} pressure: some {some:.1f}%, full {full:.1f}%")
+        if not s.pressure:
+            lines.append("Pressure stall information not available")
+        tooltip.set_text("\n".join(lines))
+        return True
 
-def toast_filter(data, text, columns):
-    text = (text or "").lower()
-    if not text:
-        return list(data)
-    result = []
-    for row in data:
-        for col in columns:
-            try:
-                if text in str(row[col]).lower():
-                    result.append(row)
-                    break
-            except Exception:
-                continue
-    return result
+
+# ---------- Baseline comparison ----------
+class BaselineDiffWindow(Gtk.Window):
+    # Per-app before → after (change) for two saved baselines; * marks a
+    # change that is significant given the variance measured in each window.
+    COLUMNS = ("App", "CPU %", "PSS MB", "I/O KB/s", "Login CPU s")
+
+    def __init__(self, parent, before, after):
+        super().__init__(title=f"{before['name']} → {after['name']}")
+        self.set_default_size(900, 500)
+        self.set_transient_for(parent)
+
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
+        box.set_margin_top(12)
+        box.set_margin_bottom(12)
+        box.set_margin_start(12)
+        box.set_margin_end(12)
+        self.add(box)
+
+        summary = Gtk.Label(xalign=0)
+        summary.set_text(
+            f"{before['name']}: {before['ticks']} samples, {before['session_age'] / 60:.0f} min after login\n"
+            f"{after['name']}: {after['ticks']} samples, {after['session_age'] / 60:.0f} min after login\n"
+            f"* significant (Welch's |t| ≥ {SIGNIFICANT_T})")
+        box.pack_start(summary, False, False, 0)
+
+        store = Gtk.ListStore(str, str, str, str, str, int)
+        apps, total = compare(before, after)
+        for n, c in enumerate([total] + apps):
+            store.append([c.app, format_change(c.cpu), format_change(c.pss, 1024), format_change(c.io, 1024),
+                          format_change(c.login), 700 if n == 0 else 400])
+        view = Gtk.TreeView(model=store)
+        for n, title in enumerate(self.COLUMNS):
+            column = Gtk.TreeViewColumn(title, Gtk.CellRendererText(), text=n, weight=5)
+            column.set_resizable(True)
+            view.append_column(column)
+        scroll = Gtk.ScrolledWindow()
+        scroll.add(view)
+        box.pack_start(scroll, True, True, 0)
 
 
 # ---------- Help Window ----------
@@ -340,16 +576,20 @@ class HelpWindow(Gtk.Window):
 
 # ---------- Main Window ----------
 class ToastWindow(Gtk.Window):
-    def __init__(self):
+    def __init__(self, startup_profile=False):
         super().__init__(title="SimplyToast")
+        self.startup_profile = startup_profile
+        self.startup_marks = {}
         self.set_default_size(1100, 630)
         self.settings = load_settings()
+        self.settings_writer = SettingsWriter(self.settings)
 
         # Header
         hb = Gtk.HeaderBar()
         hb.set_show_close_button(True)
         hb.props.title = "SimplyToast"
         self.set_titlebar(hb)
+        self.header_bar = hb
 
         # Menu
         self.menu_button = Gtk.MenuButton()
@@ -358,15 +598,39 @@ class ToastWindow(Gtk.Window):
         menu = Gtk.Menu()
         item_new = Gtk.MenuItem(label="New Autostart Entry")
         item_edit = Gtk.MenuItem(label="Edit Selected")
+        item_enable = Gtk.MenuItem(label="Enable Selected")
+        item_disable = Gtk.MenuItem(label="Disable Selected")
         item_delete = Gtk.MenuItem(label="Delete Selected")
+        item_freeze = Gtk.MenuItem(label="Freeze Selected (Focus Mode)")
+        item_resume = Gtk.MenuItem(label="Resume All Frozen Apps")
+        self.item_record = Gtk.MenuItem(label="Record Session…")
+        item_replay = Gtk.MenuItem(label="Replay Recording…")
+        self.item_baseline = Gtk.MenuItem(label="Capture Baseline…")
+        item_compare = Gtk.MenuItem(label="Compare Baselines…")
         item_help = Gtk.MenuItem(label="Help & Support")
         item_new.connect("activate", self.on_new_entry)
         item_edit.connect("activate", self.on_edit_selected)
+        item_enable.connect("activate", self.on_set_selected_enabled, True)
+        item_disable.connect("activate", self.on_set_selected_enabled, False)
         item_delete.connect("activate", self.on_delete_selected)
+        item_freeze.connect("activate", self.on_freeze_selected)
+        item_resume.connect("activate", lambda w: self.run_control(self.focus.resume_all, "Some apps could not be resumed"))
+        self.item_record.connect("activate", self.on_record)
+        item_replay.connect("activate", self.on_replay_open)
+        self.item_baseline.connect("activate", self.on_capture_baseline)
+        item_compare.connect("activate", self.on_compare_baselines)
         item_help.connect("activate", self.on_help)
-        for it in (item_new, item_edit, item_delete):
+        for it in (item_new, item_edit, item_enable, item_disable, item_delete):
             menu.append(it)
         menu.append(Gtk.SeparatorMenuItem())
+        menu.append(item_freeze)
+        menu.append(item_resume)
+        menu.append(Gtk.SeparatorMenuItem())
+        menu.append(self.item_record)
+        menu.append(item_replay)
+        menu.append(self.item_baseline)
+        menu.append(item_compare)
+        menu.append(Gtk.SeparatorMenuItem())
         menu.append(item_help)
         menu.show_all()
         self.menu_button.set_popup(menu)
@@ -378,6 +642,17 @@ class ToastWindow(Gtk.Window):
         self.search_entry.connect("search-changed", self.on_search)
         hb.pack_start(self.search_entry)
 
+        # Whose processes are listed
+        scope = self.settings.get("scope", SCOPE_USER)
+        if scope not in SCOPES:
+            scope = SCOPE_USER
+        self.scope_combo = Gtk.ComboBoxText()
+        for name in SCOPES:
+            self.scope_combo.append(name, SCOPE_LABELS[name])
+        self.scope_combo.set_active_id(scope)
+        self.scope_combo.connect("changed", self.on_scope_changed)
+        hb.pack_start(self.scope_combo)
+
         # Theme button
         btn_theme = Gtk.Button(label="Theme")
         btn_theme.connect("clicked", self.on_toggle_theme)
@@ -399,10 +674,43 @@ class ToastWindow(Gtk.Window):
         icon2 = Gtk.Image.new_from_icon_name("view-refresh-symbolic", Gtk.IconSize.BUTTON)
         self.center_refresh_btn.add(icon2)
         self.center_refresh_btn.connect("clicked", self.on_refresh)
+        self.system_header = SystemHeader()
+        center_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        center_box.set_halign(Gtk.Align.CENTER)
+        center_box.pack_start(self.center_refresh_btn, False, False, 0)
+        center_box.pack_start(self.system_header, False, False, 0)
         top_grid.attach(lbl_left, 0, 0, 1, 1)
-        top_grid.attach(self.center_refresh_btn, 1, 0, 1, 1)
+        top_grid.attach(center_box, 1, 0, 1, 1)
         top_grid.attach(lbl_right, 2, 0, 1, 1)
 
+        # Replay controls, shown only while a recording is loaded
+        self.replay_bar = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        self.replay_bar.set_margin_start(12)
+        self.replay_bar.set_margin_end(12)
+        self.replay_bar.set_margin_bottom(6)
+        self.replay_play_btn = Gtk.Button()
+        self.replay_play_icon = Gtk.Image.new_from_icon_name("media-playback-start-symbolic", Gtk.IconSize.BUTTON)
+        self.replay_play_btn.add(self.replay_play_icon)
+        self.replay_play_btn.connect("clicked", self.on_replay_play)
+        self.replay_scale = Gtk.Scale.new_with_range(Gtk.Orientation.HORIZONTAL, 0, 1, 1)
+        self.replay_scale.set_draw_value(False)
+        self.replay_scale_id = self.replay_scale.connect("value-changed", self.on_replay_seek)
+        self.replay_label = Gtk.Label()
+        self.replay_speed = Gtk.ComboBoxText()
+        for speed in REPLAY_SPEEDS:
+            self.replay_speed.append(str(speed), f"{speed}×")
+        self.replay_speed.set_active_id("1")
+        replay_close = Gtk.Button(label="Back to Live")
+        replay_close.connect("clicked", lambda b: self.stop_replay())
+        self.replay_bar.pack_start(self.replay_play_btn, False, False, 0)
+        self.replay_bar.pack_start(self.replay_scale, True, True, 0)
+        self.replay_bar.pack_start(self.replay_label, False, False, 0)
+        self.replay_bar.pack_start(self.replay_speed, False, False, 0)
+        self.replay_bar.pack_start(replay_close, False, False, 0)
+        self.replay_bar.set_no_show_all(True)
+        for child in self.replay_bar.get_children():
+            child.show_all()
+
         # Paned
         self.paned = Gtk.Paned.new(Gtk.Orientation.HORIZONTAL)
         self.paned.set_wide_handle(True)
@@ -437,13 +745,14 @@ class ToastWindow(Gtk.Window):
         col_impact.set_alignment(1.0)
         self.autostart_view.append_column(col_impact)
         self.autostart_view.set_tooltip_column(5)
+        self.autostart_view.get_selection().set_mode(Gtk.SelectionMode.MULTIPLE)
         sc_left = Gtk.ScrolledWindow()
         sc_left.add(self.autostart_view)
         left_box.pack_start(sc_left, True, True, 0)
 
         # Right (processes)
         right_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
-        self.process_list = Gtk.ListStore(str, str, str, str, str, str)
+        self.process_list = Gtk.ListStore(str, str, str, str, str, str, str, str, str, str)
         self.process_view = Gtk.TreeView(model=self.process_list)
         renderer_picon = Gtk.CellRendererPixbuf()
         col_picon = Gtk.TreeViewColumn("", renderer_picon, icon_name=5)
@@ -453,102 +762,590 @@ class ToastWindow(Gtk.Window):
         col_cpu = Gtk.TreeViewColumn("CPU%", Gtk.CellRendererText(), text=2)
         col_mem = Gtk.TreeViewColumn("MEM%", Gtk.CellRendererText(), text=3)
         col_args = Gtk.TreeViewColumn("Command", Gtk.CellRendererText(), text=4)
+        col_limits = Gtk.TreeViewColumn("Limits", Gtk.CellRendererText(), text=6)
+        col_leak = Gtk.TreeViewColumn("Growth", Gtk.CellRendererText(), text=7)
+        self.col_uid = Gtk.TreeViewColumn("UID", Gtk.CellRendererText(), text=8)
+        self.col_user = Gtk.TreeViewColumn("User", Gtk.CellRendererText(), text=9)
         col_comm.set_expand(True)
         col_args.set_expand(True)
-        for col in (col_pid, col_comm, col_cpu, col_mem, col_args):
+        for col in (col_pid, self.col_user, self.col_uid, col_comm, col_cpu, col_mem, col_leak, col_limits, col_args):
             self.process_view.append_column(col)
+        # Owner columns only matter once other users' processes are listed.
+        self.col_uid.set_visible(scope != SCOPE_USER)
+        self.col_user.set_visible(scope != SCOPE_USER)
+        self.process_view.connect("button-press-event", self.on_process_button)
+        self.process_menu = None
         sc_right = Gtk.ScrolledWindow()
         sc_right.add(self.process_view)
         right_box.pack_start(sc_right, True, True, 0)
 
+        # Details of the selected process, loaded only while expanded
+        self.details = DetailLoader()
+        self.detail_key = None
+        self.detail_shown = None
+        self.detail_buffer = Gtk.TextBuffer()
+        detail_text = Gtk.TextView(buffer=self.detail_buffer, editable=False, cursor_visible=False, monospace=True)
+        sc_detail = Gtk.ScrolledWindow()
+        sc_detail.set_size_request(-1, 200)
+        sc_detail.add(detail_text)
+        self.detail_expander = Gtk.Expander(label="Details")
+        self.detail_expander.add(sc_detail)
+        self.detail_expander.connect("notify::expanded", lambda *a: self.load_details())
+        right_box.pack_start(self.detail_expander, False, False, 0)
+
+        # Recently exited processes, newest first (LifecycleLog)
+        self.lifecycle = LifecycleLog()
+        self.exited_list = Gtk.ListStore(str, str, str, str, str, str)
+        exited_view = Gtk.TreeView(model=self.exited_list)
+        for n, title in enumerate(("Exited", "PID", "App", "Last CPU%", "Last RSS MB", "CPU s")):
+            exited_view.append_column(Gtk.TreeViewColumn(title, Gtk.CellRendererText(), text=n))
+        sc_exited = Gtk.ScrolledWindow()
+        sc_exited.set_size_request(-1, 160)
+        sc_exited.add(exited_view)
+        self.exited_expander = Gtk.Expander(label="Recently exited")
+        self.exited_expander.add(sc_exited)
+        right_box.pack_start(self.exited_expander, False, False, 0)
+        self.process_view.get_selection().connect("changed", self.on_process_selected)
+
         # Attach
         self.paned.add1(left_box)
         self.paned.add2(right_box)
 
+        # Profiling overlay (Ctrl+Shift+P; starts visible with SIMPLYTOAST_PROFILE=1)
+        overlay = Gtk.Overlay()
+        overlay.add(self.paned)
+        self.profile_label = Gtk.Label()
+        self.profile_label.set_halign(Gtk.Align.END)
+        self.profile_label.set_valign(Gtk.Align.START)
+        self.profile_label.set_margin_top(6)
+        self.profile_label.set_margin_end(6)
+        self.profile_label.get_style_context().add_class("osd")
+        self.profile_label.set_no_show_all(True)
+        overlay.add_overlay(self.profile_label)
+        self.profile_update_id = 0
+
         # Outer
         outer = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
         outer.pack_start(top_grid, False, False, 0)
-        outer.pack_start(self.paned, True, True, 0)
+        outer.pack_start(self.replay_bar, False, False, 0)
+        outer.pack_start(overlay, True, True, 0)
         self.add(outer)
         self.connect("size-allocate", self.on_resize_keep_split)
-
-        # Load
-        self.refresh_autostart()
-        self.refresh_processes()
-        apply_theme(self, self.settings.get("theme", DEFAULT_THEME))
-
-        # Auto-refresh
-        self.auto_refresh_id = GLib.timeout_add(REFRESH_INTERVAL_MS, self.auto_refresh_processes)
+        self.connect("key-press-event", self.on_key_press)
+
+        # Load. Nothing is read from disk or /proc here: the themed window
+        # paints empty first and is populated in stages after that (see
+        # on_first_draw).
+        self.repo = AutostartRepository()
+        self.sampler = Sampler(scope=scope)
+        self.pending_scope = None
+        self.system_sampler = SystemSampler()
+        self.pressure_factor = 1
+        self.snapshot = EMPTY_SNAPSHOT
+        self.proc_usage = {}
+        self.proc_total = 1.0
+        self._autostart_original = []
+        self.throttles = ThrottleSet()
+        self.rules = RuleEngine(throttles=self.throttles)
+        self.rule_errors = []
+        self.leaks = LeakDetector()
+        # Groups whose owner is gone were left behind by a run whose guard did
+        # not get to them; resume those before showing anything. Another
+        # running window's freezes stay as they are.
+        self.focus = FocusMode()
+        self.focus.adopt()
+        self.focus.resume_all()
+        self.alerts = AlertEngine(self.settings.get("alerts", ()))
+        if self.alerts.errors:
+            GLib.idle_add(self.show_errors, "Some alerts in settings.json were ignored", self.alerts.errors)
+        self.notifier = Notifier()
+        self.recorder = None
+        self.capture = None
+        self.replay = None
+        self.replay_index = -1
+        self.replay_timer_id = 0
+        self.collector = None
+        self.collector_watch_id = 0
+        self.auto_refresh_id = 0
+        self.sampling = False
+        self.sample_error = None
+        self.autostart_stale = True
+        self.icon_cache = {}
+        self.icon_queue = set()
+        self.icon_idle_id = 0
+        self.themes = ThemeManager()
+        self.themes.discover()
+        if not self.themes.apply(self.settings.get("theme", DEFAULT_THEME)):
+            self.themes.apply(DEFAULT_THEME)
+
+        self.autostart_watcher = AutostartWatcher(self.patch_autostart, self.refresh_autostart)
+        self.first_draw_id = self.connect("draw", self.on_first_draw)
+        self.connect("destroy", self.on_destroy)
+        if PROFILER.enabled:
+            self.set_profile_overlay(True)
+
+    def on_destroy(self, widget):
+        self.stop_recording()
+        if self.replay is not None:
+            self.replay.close()
+        self.focus.resume_all()
+        self.focus.stop_guard()
+        self.sampler.close()
+        self.autostart_watcher.stop()
+        self.themes.stop()
+        if self.settings_writer.save_id:
+            self.settings_writer.flush()
+        if self.collector_watch_id:
+            GLib.source_remove(self.collector_watch_id)
+            self.collector_watch_id = 0
+        if self.collector is not None:
+            self.collector.close()
+        if PROFILER.histograms:
+            self.dump_profile()
+
+    # Staged startup
+    def mark(self, stage):
+        if stage in self.startup_marks:
+            return
+        ms = (time.perf_counter() - STARTED) * 1000
+        self.startup_marks[stage] = ms
+        if self.startup_profile:
+            print(f"startup: {stage:<12}{ms:8.1f} ms", flush=True)
+
+    def on_first_draw(self, widget, cr):
+        self.disconnect(self.first_draw_id)
+        self.mark("first_paint")
+        GLib.idle_add(self.load_autostart_stage)
+        return False
+
+    def load_autostart_stage(self):
+        # Names and toggles come straight from the cached index; Impact and the
+        # inactive-reason tooltips are filled in once the first sample lands.
+        self.refresh_autostart(detail=False)
+        self.mark("autostart")
+        # Processes come from the collector daemon when one is running (it
+        # pushes diffs), otherwise from the sampler thread on a timer.
+        self.go_live()
+        self.autostart_watcher.start()
+        self.themes.preload()
+        self.themes.start()
+        return False
 
     # Auto refresh
     def auto_refresh_processes(self):
         self.refresh_processes()
         return True
 
+    def go_live(self):
+        # The collector samples only our own processes; other scopes are
+        # always sampled in-process.
+        scope = self.pending_scope or self.sampler.scope
+        if scope != SCOPE_USER or not self.connect_collector():
+            self.use_local_sampler()
+
+    def connect_collector(self):
+        client = CollectorClient()
+        if not client.connect():
+            return False
+        try:
+            client.subscribe(REFRESH_INTERVAL_MS / 1000)
+        except OSError:
+            client.close()
+            return False
+        # The first snapshot arrives through on_collector_data like every diff.
+        self.collector = client
+        self.collector_watch_id = GLib.io_add_watch(
+            client.fileno(), GLib.PRIORITY_DEFAULT,
+            GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR, self.on_collector_data)
+        return True
+
+    def on_collector_data(self, fd, condition):
+        try:
+            snapshot = self.collector.read()
+        except (OSError, ValueError):
+            # Daemon went away (or sent garbage): carry on sampling in-process.
+            self.collector_watch_id = 0
+            self.use_local_sampler()
+            return False
+        if snapshot is not None:
+            # The daemon only streams processes; the header is five small
+            # reads, done here on the same tick.
+            system = self.system_sampler.sample()
+            self.apply_system(system)
+            self.record_trace(snapshot, system)
+            if self.capture is not None:
+                with PROFILER.span("baseline.feed"):
+                    self.capture.feed(snapshot)
+                self.check_capture()
+            self.record_lifecycle(snapshot, self.collector.started, self.collector.exited)
+            self.apply_snapshot(snapshot)
+        return True
+
+    def use_local_sampler(self):
+        if self.collector is not None:
+            self.collector.close()
+            self.collector = None
+        self.refresh_processes()
+        if not self.auto_refresh_id:
+            self.auto_refresh_id = GLib.timeout_add(REFRESH_INTERVAL_MS * self.pressure_factor,
+                                                    self.auto_refresh_processes)
+
+    def apply_system(self, system):
+        self.system_header.update(system)
+        # Under CPU/memory/IO pressure, refresh less often rather than add to it.
+        factor = refresh_factor(system)
+        if factor == self.pressure_factor:
+            return
+        self.pressure_factor = factor
+        interval = REFRESH_INTERVAL_MS * factor
+        if self.collector is not None:
+            try:
+                self.collector.subscribe(interval / 1000)
+            except OSError:
+                pass
+        elif self.auto_refresh_id:
+            GLib.source_remove(self.auto_refresh_id)
+            self.auto_refresh_id = GLib.timeout_add(interval, self.auto_refresh_processes)
+
     # Data loaders
-    def refresh_autostart(self):
+    def update_proc_usage(self, processes):
+        self.proc_usage = usage_by_comm(processes)
+        self.proc_total = sum(self.proc_usage.values()) or 1.0
+
+    def autostart_tooltip(self, entry, desktops=(), which_cache=None, detail=True):
+        tooltip = entry.comment or "No description available"
+        # inactive_reason may look up TryExec on $PATH; skipped for the first paint.
+        reason = entry.inactive_reason(desktops, which_cache) if detail else ""
+        if reason:
+            tooltip += f"\nNot started in this session: {reason}"
+        if entry.overrides:
+            tooltip += f"\nOverrides {entry.overrides}"
+        rate = self.leaks.rates.get(entry.name.lower())
+        if rate:
+            tooltip += f"\nMemory growing steadily: {format_rate(rate)}"
+        return tooltip
+
+    def autostart_row(self, entry, desktops=(), which_cache=None, detail=True):
+        score = self.proc_usage.get(entry.name.lower(), 0.0)
+        return [
+            entry.name,
+            entry.enabled,
+            entry.path,
+            entry.source,
+            entry.icon or "application-x-executable",
+            self.autostart_tooltip(entry, desktops, which_cache, detail),
+            score,
+            impact_percent(score, self.proc_total)
+        ]
+
+    def show_autostart_rows(self, rows):
         self.autostart_list.clear()
-        proc_usage = {}
-        for pid, comm, cpu, mem, args, _, _ in scan_processes():
-            try:
-                score = float(cpu) + float(mem)
-            except Exception:
-                score = 0.0
-            proc_usage[comm.lower()] = score
+        if not rows:
+            self.autostart_list.append(["(empty)", False, "", "", "", "", 0.0, 0.0])
+            return
+        for row in rows:
+            self.autostart_list.append(row)
 
-        entries = scan_autostart()
-        self._autostart_original = []
+    def refresh_autostart(self, detail=True):
+        desktops = current_desktops()
+        which_cache = {}
+        with PROFILER.span("autostart.scan"):
+            entries = self.repo.refresh()
+        with PROFILER.span("autostart.rows"):
+            rows = [self.autostart_row(entry, desktops, which_cache, detail) for entry in entries]
+            rows.sort(key=lambda x: -x[6])
+        self._autostart_original = rows
+        text = self.search_entry.get_text().lower()
+        with PROFILER.span("autostart.store"):
+            self.show_autostart_rows(toast_filter(rows, text, [0]) if text else rows)
+
+    def patch_autostart(self, changes):
+        # Re-resolve only the touched desktop ids and patch their rows in place.
+        # Rows are keyed by id, so a user file appearing replaces the system row.
+        updated = self.repo.update(changes)
+        ids = set(updated)
+        desktops = current_desktops()
+        new_rows = {}
+        for i, entry in updated.items():
+            new_rows[i] = None if entry is None else self.autostart_row(entry, desktops)
+
+        rows = [row for row in self._autostart_original if os.path.basename(row[2]) not in ids]
+        rows.extend(row for row in new_rows.values() if row is not None)
+        rows.sort(key=lambda x: -x[6])
+        self._autostart_original = rows
+
+        text = self.search_entry.get_text().lower()
+        if text or len(self.autostart_list) == 0 or self.autostart_list[0][2] == "":
+            self.show_autostart_rows(toast_filter(rows, text, [0]) if text else rows)
+            return
 
+        # A touched row's score may have changed, so it is taken out and put
+        # back at its place in the sorted rows. Untouched rows keep their
+        # relative order (the sort is stable), so inserting in ascending
+        # position lands each one where a full refresh would put it.
+        store = self.autostart_list
+        it = store.get_iter_first()
+        while it is not None:
+            if os.path.basename(store[it][2]) in ids:
+                if not store.remove(it):
+                    it = None
+                continue
+            it = store.iter_next(it)
+        for pos, row in enumerate(rows):
+            if os.path.basename(row[2]) in ids:
+                store.insert(pos, row)
+        if len(store) == 0:
+            self.show_autostart_rows(rows)
+
+    def patch_growth_tooltips(self, old_rates):
+        # A growth rate only shows in the Impact tooltip, so rows of the apps
+        # whose rate changed get a new tooltip in place; order and scores
+        # wait for the next full refresh.
+        rates = self.leaks.rates
+        names = {name for name in old_rates.keys() | rates.keys() if old_rates.get(name) != rates.get(name)}
+        entries = [entry for entry in self.repo.entries.values() if entry.name.lower() in names]
         if not entries:
-            self.autostart_list.append(["(empty)", False, "", "", "", ""])
-            return
-
-        rows_temp = []
-        total_score = sum(proc_usage.values()) or 1.0
-
-        for filepath, source in entries:
-            name, comment, icon, enabled = parse_desktop_file(filepath)
-            if not icon:
-                icon = "application-x-executable"
-            score = proc_usage.get(name.lower(), 0.0)
-            impact_percent = round((score / total_score) * 100, 1)
-            row = [
-                name,
-                enabled,
-                str(filepath),
-                source,
-                icon,
-                comment or "No description available",
-                score,
-                float(f"{impact_percent:.2f}")
-            ]
-            rows_temp.append(row)
-
-        rows_temp.sort(key=lambda x: -x[6])
-        for row in rows_temp:
-            self.autostart_list.append(row)
+            return
+        desktops = current_desktops()
+        which_cache = {}
+        tooltips = {entry.path: self.autostart_tooltip(entry, desktops, which_cache) for entry in entries}
+        for row in self._autostart_original:
+            if row[2] in tooltips:
+                row[5] = tooltips[row[2]]
+        for row in self.autostart_list:
+            if row[2] in tooltips:
+                row[5] = tooltips[row[2]]
 
     def refresh_processes(self):
-        self.process_list.clear()
-        rows = scan_processes()
-        theme = Gtk.IconTheme.get_default()
-        for pid, comm, cpu, mem, args, _, _ in rows:
-            icon_name = comm.lower()
+        if self.replay is not None:
+            return
+        if self.collector is not None:
+            # Ask for a fresh full sample; it arrives via on_collector_data.
             try:
-                if not theme.has_icon(icon_name):
-                    icon_name = "application-x-executable"
-            except Exception:
-                icon_name = "application-x-executable"
-            self.process_list.append([pid, comm, cpu, mem, args, icon_name])
+                self.collector.request_snapshot()
+            except OSError:
+                pass
+            if self.collector.latest is not None:
+                self.apply_snapshot(self.collector.latest)
+            return
+        # /proc is walked on a worker thread; one sample in flight at a time.
+        if self.sampling:
+            return
+        if self.pending_scope is not None:
+            # Switched here, between samples, so the worker never sees a
+            # half-changed sampler.
+            self.sampler.set_scope(self.pending_scope)
+            self.pending_scope = None
+        self.sampling = True
+        threading.Thread(target=self.sample_worker, daemon=True).start()
+
+    def sample_worker(self):
+        # on_sample or on_sample_failed always runs, so self.sampling never
+        # stays set and refreshing never stops silently.
+        try:
+            with PROFILER.span("processes.sample"):
+                snapshot = self.sampler.sample()
+                system = self.system_sampler.sample()
+            # Baseline PSS/I/O reads stay off the main thread too; one sample is
+            # in flight at a time, so feed() never runs concurrently.
+            capture = self.capture
+            if capture is not None:
+                with PROFILER.span("baseline.feed"):
+                    capture.feed(snapshot)
+        except Exception as e:
+            GLib.idle_add(self.on_sample_failed, e)
+            return
+        GLib.idle_add(self.on_sample, snapshot, self.sampler.started, self.sampler.exited, system)
+
+    def on_sample_failed(self, error):
+        self.sampling = False
+        # Shown once per distinct failure, not on every tick.
+        message = f"{type(error).__name__}: {error}"
+        if message != self.sample_error:
+            self.sample_error = message
+            import traceback
+
+            traceback.print_exception(type(error), error, error.__traceback__)
+            self.show_errors("Sampling processes failed", [("sample", error)])
+        return False
+
+    def on_sample(self, snapshot, started, exited, system):
+        self.sampling = False
+        self.sample_error = None
+        if self.collector is None and self.replay is None:
+            self.apply_system(system)
+            self.record_trace(snapshot, system)
+            self.check_capture()
+            # Rules only look at processes that are new since the last sample.
+            with PROFILER.span("processes.rules"):
+                self.report_rule_errors(self.rules.apply(started))
+            if snapshot.interval:
+                self.record_lifecycle(snapshot, started, exited)
+            self.apply_snapshot(snapshot)
+        return False
+
+    def record_lifecycle(self, snapshot, started, exited):
+        events = self.lifecycle.record(snapshot.time, started, exited)
+        if not exited:
+            return
+        store = self.exited_list
+        for event in events:
+            if event.kind != "exited":
+                continue
+            p = event.process
+            store.prepend([time.strftime("%H:%M:%S", time.localtime(event.time)), str(p.pid), p.comm,
+                           f"{p.cpu:.1f}", f"{p.rss / 1024:.1f}", f"{p.cpu_time:.1f}"])
+        while len(store) > self.lifecycle.exited.maxlen:
+            store.remove(store.iter_nth_child(None, len(store) - 1))
+        self.exited_expander.set_label(f"Recently exited ({len(store)})")
+
+    def apply_snapshot(self, snapshot):
+        self.snapshot = snapshot
+        # Alerts, growth trends and limits are about the live system; a
+        # replayed recording only drives the panes.
+        if self.replay is None:
+            self.watch_snapshot(snapshot)
+        with PROFILER.span("processes.filter"):
+            self.update_proc_usage(self.snapshot.processes)
+            processes = filter_processes(self.snapshot.processes, self.search_entry.get_text())
+        self.show_processes(processes)
+        if self.autostart_stale:
+            # Impact depends on the sample; rescore with full tooltips.
+            self.autostart_stale = False
+            self.refresh_autostart()
+            self.mark("populated")
+
+    def watch_snapshot(self, snapshot):
+        if self.alerts.rules:
+            with PROFILER.span("processes.alerts"):
+                for alert in self.alerts.feed(snapshot):
+                    self.notifier.send((alert.rule, alert.app), alert.title(), alert.body())
+        with PROFILER.span("processes.leaks"):
+            old_rates = self.leaks.rates
+            if self.leaks.feed(snapshot):
+                self.patch_growth_tooltips(old_rates)
+        if self.throttles.active:
+            self.throttles.prune({p.key for p in snapshot.processes})
+
+    def show_processes(self, processes):
+        # Icon lookups are cached per comm; unknown ones show the generic icon
+        # until resolve_icons has run at idle priority.
+        with PROFILER.span("processes.icons"):
+            icons = self.icon_cache
+            for p in processes:
+                name = p.comm.lower()
+                if name not in icons:
+                    self.icon_queue.add(name)
+            if self.icon_queue and not self.icon_idle_id:
+                self.icon_idle_id = GLib.idle_add(self.resolve_icons, priority=GLib.PRIORITY_LOW)
+        throttles = self.throttles if self.throttles.active else None
+        rates = self.leaks.rates
+        selected = None
+        users = USER_NAMES
+        users.refresh()
+        with PROFILER.span("processes.store"):
+            self.process_list.clear()
+            for p in processes:
+                name = p.comm.lower()
+                limits = ", ".join(t.describe() for t in throttles.for_process(p)) if throttles else ""
+                it = self.process_list.append([str(p.pid), p.comm, f"{p.cpu:.1f}", f"{p.mem:.1f}", p.args,
+                                               icons.get(name, GENERIC_ICON), limits, format_rate(rates.get(name)),
+                                               str(p.uid), users.name(p.uid)])
+                if p.key == self.detail_key:
+                    selected = it
+        if selected is not None:
+            # Keeps the selection across refreshes; also refreshes the pane
+            # once its cached details are older than DETAIL_TTL.
+            self.process_view.get_selection().select_iter(selected)
+            self.load_details()
+
+    # Process details
+    def on_process_selected(self, selection):
+        model, it = selection.get_selected()
+        if it is None:
+            # The list is cleared on every refresh; keep the last selection.
+            return
+        proc = self.snapshot.by_pid().get(int(model[it][0]))
+        key = proc.key if proc is not None else None
+        if key != self.detail_key:
+            self.detail_key = key
+            self.load_details()
+
+    def load_details(self):
+        if self.replay is not None:
+            # Details come from /proc, which a recording does not have.
+            self.details.cancel()
+            self.detail_buffer.set_text("Not available while replaying a recording.")
+            self.detail_shown = None
+            return
+        if not self.detail_expander.get_expanded() or self.detail_key is None:
+            self.details.cancel()
+            return
+        details = self.details.request(self.detail_key, lambda d: GLib.idle_add(self.show_details, d))
+        if details is not None:
+            self.show_details(details)
+
+    def show_details(self, details):
+        if details.key == self.detail_key and details is not self.detail_shown:
+            self.detail_shown = details
+            self.detail_buffer.set_text(format_details(details))
+        return False
+
+    def resolve_icons(self):
+        self.icon_idle_id = 0
+        theme = Gtk.IconTheme.get_default()
+        queue, self.icon_queue = self.icon_queue, set()
+        with PROFILER.span("processes.icons"):
+            for name in queue:
+                try:
+                    self.icon_cache[name] = name if theme.has_icon(name) else GENERIC_ICON
+                except Exception:
+                    self.icon_cache[name] = GENERIC_ICON
+        for row in self.process_list:
+            name = row[1].lower()
+            if name in queue and self.icon_cache[name] != GENERIC_ICON:
+                row[5] = self.icon_cache[name]
+        return False
 
     # UI actions
+    def on_scope_changed(self, combo):
+        scope = combo.get_active_id()
+        if scope is None or scope == (self.pending_scope or self.sampler.scope):
+            return
+        self.settings["scope"] = scope
+        self.settings_writer.schedule()
+        self.col_uid.set_visible(scope != SCOPE_USER)
+        self.col_user.set_visible(scope != SCOPE_USER)
+        USER_NAMES.refresh(force=True)
+        self.pending_scope = scope
+        self.autostart_stale = True
+        if self.replay is not None:
+            # Applied when live sampling resumes.
+            return
+        if self.collector is not None:
+            # The collector only has our own processes.
+            if self.collector_watch_id:
+                GLib.source_remove(self.collector_watch_id)
+                self.collector_watch_id = 0
+            self.use_local_sampler()
+        elif scope == SCOPE_USER and self.connect_collector():
+            # The local sampler picks the scope up if it is ever used again.
+            if self.auto_refresh_id:
+                GLib.source_remove(self.auto_refresh_id)
+                self.auto_refresh_id = 0
+        else:
+            self.refresh_processes()
+
     def on_refresh(self, button):
         self.search_entry.set_text("")
-        self.refresh_autostart()
+        # The autostart rescan is done when the new sample lands (apply_snapshot).
+        self.autostart_stale = True
         self.refresh_processes()
 
     def on_toggle_theme(self, button):
-        themes = ["light", "mid", "dark"]
+        themes = self.themes.names()
+        if not themes:
+            return
         current = self.settings.get("theme", "light")
         try:
             idx = themes.index(current)
@@ -556,8 +1353,8 @@ class ToastWindow(Gtk.Window):
             idx = 0
         new_theme = themes[(idx + 1) % len(themes)]
         self.settings["theme"] = new_theme
-        save_settings(self.settings)
-        apply_theme(self, new_theme)
+        self.settings_writer.schedule()
+        self.themes.apply(new_theme)
 
     def on_help(self, menuitem):
         win = HelpWindow(self)
@@ -567,88 +1364,578 @@ class ToastWindow(Gtk.Window):
         win = NewEntryWindow(self)
         win.show_all()
 
-    def on_edit_selected(self, menuitem):
-        if self.search_entry.get_text().strip():
-            return
-        selection = self.autostart_view.get_selection()
-        model, treeiter = selection.get_selected()
-        if not treeiter:
+    def selected_entries(self):
+        model, paths = self.autostart_view.get_selection().get_selected_rows()
+        entries = []
+        for path in paths:
+            entry = self.repo.for_path(model[path][2])
+            if entry is not None:
+                entries.append(entry)
+        return entries
+
+    def apply_batch(self, batch):
+        # One commit, one directory fsync, one model patch for the whole batch.
+        if not len(batch):
             return
-        values = list(model[treeiter]) + ["", ""]
-        name, enabled, filepath, source, icon, comment = values[:6]
-        if source == "system" or name == "(empty)":
+        changed, errors = batch.commit()
+        if changed:
+            self.patch_autostart({path: None for path in changed})
+        if errors:
+            self.show_errors("Some autostart entries could not be changed", errors)
+
+    def report_rule_errors(self, errors):
+        # rules.json problems (once per reload) and failed actions, gathered
+        # into one dialog shown from idle rather than inside the sample.
+        if not errors:
             return
-        cmd = ""
-        try:
-            with open(filepath, "r", errors="ignore") as f:
-                for line in f:
-                    if line.startswith("Exec="):
-                        cmd = line.split("=", 1)[1].strip()
-        except Exception:
-            pass
-        win = EditEntryWindow(self, filepath, name, cmd, comment, icon)
-        win.show_all()
+        pending = self.rule_errors
+        self.rule_errors = pending + errors
+        if not pending:
+            GLib.idle_add(self.show_rule_errors)
+
+    def show_rule_errors(self):
+        errors, self.rule_errors = self.rule_errors, []
+        self.show_errors("Some rules in rules.json could not be applied", errors)
+        return False
+
+    def show_errors(self, text, errors):
+        dialog = Gtk.MessageDialog(
+            transient_for=self,
+            modal=True,
+            message_type=Gtk.MessageType.ERROR,
+            buttons=Gtk.ButtonsType.CLOSE,
+            text=text,
+        )
+        dialog.format_secondary_text("\n".join(f"{label}: {getattr(e, 'strerror', None) or e}" for label, e in errors))
+        dialog.run()
+        dialog.destroy()
+
+    # Process controls
+    def on_process_button(self, view, event):
+        if event.type != Gdk.EventType.BUTTON_PRESS or event.button != 3 or self.replay is not None:
+            return False
+        hit = view.get_path_at_pos(int(event.x), int(event.y))
+        if hit is None:
+            return False
+        view.get_selection().select_path(hit[0])
+        proc = self.snapshot.by_pid().get(int(self.process_list[hit[0]][0]))
+        if proc is None:
+            return True
+        self.process_menu = self.build_process_menu(proc)
+        self.process_menu.popup_at_pointer(event)
+        return True
 
-    def on_delete_selected(self, menuitem):
-        if self.search_entry.get_text().strip():
-            return
-        selection = self.autostart_view.get_selection()
-        model, treeiter = selection.get_selected()
-        if not treeiter:
+    def control_submenu(self, label, title, choices):
+        item = Gtk.MenuItem(label=label)
+        submenu = Gtk.Menu()
+        for text, action in choices:
+            child = Gtk.MenuItem(label=text)
+            child.connect("activate", lambda w, a=action: self.run_control(a, title))
+            submenu.append(child)
+        item.set_submenu(submenu)
+        return item
+
+    def control_items(self, targets, label):
+        t = self.throttles
+        cpus = sorted(os.sched_getaffinity(0))
+        half = cpus[:max(len(cpus) // 2, 1)]
+        # Without CAP_SYS_NICE a process cannot be made less nice again, so
+        # say so before the change rather than offer a revert that fails.
+        nice_choices = []
+        for text, value in (("5", 5), ("10", 10), ("19 (lowest)", 19)):
+            if not t.nice_revertible(targets, value):
+                text += " (can't be undone)"
+            nice_choices.append((text, lambda v=value: t.renice(targets, v)))
+        return [
+            self.control_submenu("Nice", f"Could not renice {label}", nice_choices),
+            self.control_submenu("I/O Priority", f"Could not change the I/O priority of {label}", [
+                ("Best effort, low", lambda: t.ionice(targets, "best-effort", 7)),
+                ("Idle", lambda: t.ionice(targets, "idle")),
+            ]),
+            self.control_submenu("CPU Cores", f"Could not pin {label} to those cores", [
+                (f"Core {cpus[0]} only", lambda: t.pin(targets, cpus[:1])),
+                (f"Cores {half[0]}–{half[-1]}", lambda: t.pin(targets, half)),
+                ("All cores", lambda: t.pin(targets, cpus)),
+            ]),
+            self.control_submenu("Limit CPU (cgroup)", f"Could not limit the CPU of {label}", [
+                ("50% of a core", lambda: t.limit_cpu(targets, 50)),
+                ("25% of a core", lambda: t.limit_cpu(targets, 25)),
+                ("10% of a core", lambda: t.limit_cpu(targets, 10)),
+            ]),
+            self.control_submenu("Limit Memory (cgroup)", f"Could not limit the memory of {label}", [
+                ("512 MB", lambda: t.limit_memory(targets, 512 << 20)),
+                ("1 GB", lambda: t.limit_memory(targets, 1 << 30)),
+                ("2 GB", lambda: t.limit_memory(targets, 2 << 30)),
+            ]),
+            self.control_submenu("Freeze (Focus Mode)", f"Could not freeze {label}", [
+                (text, lambda m=minutes: self.freeze(targets, label, m)) for text, minutes in FREEZE_CHOICES
+            ]),
+        ]
+
+    def build_process_menu(self, proc):
+        # Every action exists for the clicked PID and for all processes with
+        # the same comm; cgroup limits always cover the process's whole scope.
+        group = [p for p in self.snapshot.processes if p.comm == proc.comm]
+        menu = Gtk.Menu()
+        scopes = [([proc], f"{proc.comm} ({proc.pid})")]
+        if len(group) > 1:
+            scopes.append((group, f"All {proc.comm} ({len(group)} processes)"))
+        for targets, title in scopes:
+            header = Gtk.MenuItem(label=title)
+            header.set_sensitive(False)
+            menu.append(header)
+            for item in self.control_items(targets, title):
+                menu.append(item)
+            menu.append(Gtk.SeparatorMenuItem())
+
+        active = {}
+        for p in group:
+            for throttle in self.throttles.for_process(p):
+                active[(throttle.kind, throttle.target)] = throttle
+        if active:
+            revertible = [key for key, throttle in active.items() if throttle.revertible]
+            for key, throttle in active.items():
+                if not throttle.revertible:
+                    item = Gtk.MenuItem(label=f"{throttle.describe()} on {throttle.label} stays until it exits")
+                    item.set_sensitive(False)
+                    menu.append(item)
+                    continue
+                text = f"{throttle.describe()} on {throttle.label}"
+                item = Gtk.MenuItem(label=f"Revert {text}")
+                item.connect("activate", lambda w, k=key, t=f"Could not revert {text}": self.run_control(
+                    lambda: self.throttles.revert(k), t))
+                menu.append(item)
+            if len(revertible) > 1:
+                item = Gtk.MenuItem(label=f"Revert all for {proc.comm}")
+                item.connect("activate", lambda w, keys=revertible: self.run_control(
+                    lambda: self.throttles.revert_all(keys), f"Some limits on {proc.comm} could not be reverted"))
+                menu.append(item)
+        else:
+            item = Gtk.MenuItem(label="No active limits")
+            item.set_sensitive(False)
+            menu.append(item)
+        frozen = self.focus.frozen_keys()
+        for gid in {frozen[p.key] for p in group if p.key in frozen}:
+            name = self.focus.groups[gid]["label"]
+            item = Gtk.MenuItem(label=f"Resume {name}")
+            item.connect("activate", lambda w, g=gid, t=f"Could not resume {name}": self.run_control(
+                lambda: self.focus.resume(g), t))
+            menu.append(item)
+        menu.show_all()
+        return menu
+
+    # Focus mode
+    def freeze(self, targets, label, minutes=None):
+        until = time.time() + minutes * 60 if minutes else None
+        gid, errors = self.focus.freeze(targets, label, until)
+        if gid is not None and minutes:
+            GLib.timeout_add_seconds(int(minutes * 60), self.on_focus_due)
+        return errors
+
+    def on_focus_due(self):
+        errors = []
+        for gid in self.focus.due():
+            errors.extend(self.focus.resume(gid))
+        if errors:
+            self.show_errors("Some apps could not be resumed", errors)
+        return False
+
+    def on_freeze_selected(self, menuitem):
+        if self.replay is not None:
             return
-        name, enabled, filepath, source, icon, comment = model[treeiter]
-        if source == "system" or name == "(empty)":
+        names = {e.name.lower() for e in self.selected_entries()}
+        targets = [p for p in self.snapshot.processes if p.comm.lower() in names]
+        if not targets:
             return
-        delete_autostart(filepath)
-        self.refresh_autostart()
+        label = ", ".join(sorted(e.name for e in self.selected_entries()))
+        self.run_control(lambda: self.freeze(targets, label), f"Could not freeze {label}")
 
+    def run_control(self, action, title):
+        errors = action()
+        self.show_processes(filter_processes(self.snapshot.processes, self.search_entry.get_text()))
+        if errors:
+            self.show_errors(title, errors)
 
-    def on_toggle_autostart(self, widget, path):
-        it = self.autostart_list.get_iter(path)
-        row = self.autostart_list[it]
+    def on_edit_selected(self, menuitem):
+        entries = self.selected_entries()
+        if len(entries) != 1:
+            return
+        win = EditEntryWindow(self, entries[0])
+        win.show_all()
 
-        name, enabled, filepath, source, icon, comment = row[:6]
+    def on_set_selected_enabled(self, menuitem, enabled):
+        batch = self.repo.batch()
+        for entry in self.selected_entries():
+            if entry.enabled != enabled:
+                batch.set_enabled(entry, enabled)
+        self.apply_batch(batch)
 
-        if source == "system":
-            return
+    def on_delete_selected(self, menuitem):
+        batch = self.repo.batch()
+        for entry in self.selected_entries():
+            batch.delete(entry)
+        self.apply_batch(batch)
 
-        new_val = not enabled
-        self.autostart_list[it][1] = new_val
-        set_enabled(filepath, new_val)
+    def on_toggle_autostart(self, widget, path):
+        entry = self.repo.for_path(self.autostart_list[path][2])
+        if entry is None:
+            return
+        batch = self.repo.batch()
+        batch.set_enabled(entry, not entry.enabled)
+        self.apply_batch(batch)
 
     def on_search(self, entry):
         text = entry.get_text().lower()
         # Autostart filter
-        self.autostart_list.clear()
-        for row in toast_filter(self._autostart_original, text, [0]):
-            self.autostart_list.append(row)
-        # Background process filter
-        self.process_list.clear()
-        rows = scan_processes()
-        theme = Gtk.IconTheme.get_default()
-        for pid, comm, cpu, mem, args, _, _ in rows:
-            if text in pid.lower() or text in comm.lower() or text in args.lower():
-                icon_name = comm.lower()
-                try:
-                    if not theme.has_icon(icon_name):
-                        icon_name = "application-x-executable"
-                except Exception:
-                    icon_name = "application-x-executable"
-                self.process_list.append([pid, comm, cpu, mem, args, icon_name])
+        with PROFILER.span("search.autostart"):
+            self.autostart_list.clear()
+            for row in toast_filter(self._autostart_original, text, [0]):
+                self.autostart_list.append(row)
+        # Background process filter, on the last sample
+        with PROFILER.span("search.processes"):
+            processes = filter_processes(self.snapshot.processes, text)
+        self.show_processes(processes)
 
     def on_resize_keep_split(self, widget, allocation):
+        with PROFILER.span("resize.split"):
+            try:
+                width = self.paned.get_allocated_width()
+                if width:
+                    self.paned.set_position(width // 2)
+            except Exception:
+                pass
+
+    def update_subtitle(self):
+        parts = []
+        if self.replay is not None:
+            parts.append(f"Replay: {os.path.basename(self.replay.path)}")
+        if self.recorder is not None:
+            parts.append(f"Recording: {self.recorder.records} snapshots, {self.recorder.bytes / 1024:.0f} KB")
+        if self.capture is not None:
+            left = int(self.capture.remaining())
+            parts.append(f"Baseline {self.capture.name}: {left // 60}:{left % 60:02d} left")
+        self.header_bar.props.subtitle = "  ·  ".join(parts) or None
+
+    # Baselines
+    def on_capture_baseline(self, menuitem):
+        if self.capture is not None:
+            self.capture = None
+            self.item_baseline.set_label("Capture Baseline…")
+            self.update_subtitle()
+            return
+        if self.replay is not None:
+            return
+        dialog = Gtk.Dialog(title="Capture Baseline", transient_for=self, modal=True)
+        dialog.add_buttons("_Cancel", Gtk.ResponseType.CANCEL, "_Capture", Gtk.ResponseType.OK)
+        dialog.set_default_response(Gtk.ResponseType.OK)
+        area = dialog.get_content_area()
+        area.set_spacing(6)
+        area.set_margin_top(12)
+        area.set_margin_bottom(12)
+        area.set_margin_start(12)
+        area.set_margin_end(12)
+        name = Gtk.Entry(text=time.strftime("before-%Y%m%d"), activates_default=True)
+        window = Gtk.ComboBoxText()
+        for text, seconds in BASELINE_CHOICES:
+            window.append(str(seconds), text)
+        window.set_active(1)
+        area.pack_start(Gtk.Label(label="Name", xalign=0), False, False, 0)
+        area.pack_start(name, False, False, 0)
+        area.pack_start(Gtk.Label(label="Measure for", xalign=0), False, False, 0)
+        area.pack_start(window, False, False, 0)
+        dialog.show_all()
+        response = dialog.run()
+        text, seconds = name.get_text(), float(window.get_active_id())
+        dialog.destroy()
+        if response != Gtk.ResponseType.OK:
+            return
+        try:
+            self.capture = BaselineCapture(text, seconds)
+        except BaselineError as e:
+            self.show_errors("Could not capture a baseline", [(text, e)])
+            return
+        self.item_baseline.set_label("Stop Baseline Capture")
+        self.update_subtitle()
+
+    def check_capture(self):
+        capture = self.capture
+        if capture is None:
+            return
+        if not capture.done():
+            self.update_subtitle()
+            return
+        self.capture = None
+        self.item_baseline.set_label("Capture Baseline…")
+        self.update_subtitle()
+        try:
+            save_baseline(capture.result())
+        except OSError as e:
+            self.show_errors("Could not save the baseline", [(capture.name, e)])
+
+    def on_compare_baselines(self, menuitem):
+        names = [name for name, _ in list_baselines()]
+        if len(names) < 2:
+            self.show_errors("Nothing to compare",
+                             [("Baselines", BaselineError("capture two baselines first, e.g. before and after"))])
+            return
+        dialog = Gtk.Dialog(title="Compare Baselines", transient_for=self, modal=True)
+        dialog.add_buttons("_Cancel", Gtk.ResponseType.CANCEL, "C_ompare", Gtk.ResponseType.OK)
+        area = dialog.get_content_area()
+        area.set_spacing(6)
+        area.set_margin_top(12)
+        area.set_margin_bottom(12)
+        area.set_margin_start(12)
+        area.set_margin_end(12)
+        combos = []
+        # Newest first, so the default is "second newest → newest".
+        for label, active in (("Before", 1), ("After", 0)):
+            combo = Gtk.ComboBoxText()
+            for name in names:
+                combo.append(name, name)
+            combo.set_active(active)
+            area.pack_start(Gtk.Label(label=label, xalign=0), False, False, 0)
+            area.pack_start(combo, False, False, 0)
+            combos.append(combo)
+        dialog.show_all()
+        response = dialog.run()
+        before, after = (combo.get_active_id() for combo in combos)
+        dialog.destroy()
+        if response != Gtk.ResponseType.OK:
+            return
+        try:
+            window = BaselineDiffWindow(self, load_baseline(before), load_baseline(after))
+        except (OSError, BaselineError) as e:
+            self.show_errors("Could not load the baselines", [("Baselines", e)])
+            return
+        window.show_all()
+
+    # Recording and replay
+    def record_trace(self, snapshot, system):
+        if self.recorder is None:
+            return
+        try:
+            with PROFILER.span("trace.record"):
+                self.recorder.write(snapshot, system)
+        except OSError as e:
+            label = self.recorder.path
+            self.stop_recording()
+            self.show_errors("Recording stopped", [(label, e)])
+            return
+        self.update_subtitle()
+
+    def stop_recording(self):
+        if self.recorder is None:
+            return
+        self.recorder.close()
+        self.recorder = None
+        self.update_subtitle()
+        self.item_record.set_label("Record Session…")
+
+    def on_record(self, menuitem):
+        if self.recorder is not None:
+            self.stop_recording()
+            return
+        if self.replay is not None:
+            return
+        dialog = Gtk.FileChooserDialog(title="Record Session", transient_for=self, action=Gtk.FileChooserAction.SAVE)
+        dialog.add_buttons("_Cancel", Gtk.ResponseType.CANCEL, "_Record", Gtk.ResponseType.ACCEPT)
+        dialog.set_do_overwrite_confirmation(True)
+        dialog.set_current_folder(str(Path.home()))
+        dialog.set_current_name(time.strftime("simplytoast-%Y%m%d-%H%M%S.sttrace"))
+        path = dialog.get_filename() if dialog.run() == Gtk.ResponseType.ACCEPT else None
+        dialog.destroy()
+        if path is None:
+            return
+        try:
+            self.recorder = TraceWriter(path)
+        except OSError as e:
+            self.show_errors("Could not start recording", [(path, e)])
+            return
+        self.item_record.set_label("Stop Recording")
+        self.update_subtitle()
+        # Every later sample is appended; start with the one on screen.
+        if self.snapshot is not EMPTY_SNAPSHOT:
+            self.record_trace(self.snapshot, self.system_header.sample)
+
+    def on_replay_open(self, menuitem):
+        dialog = Gtk.FileChooserDialog(title="Replay Recording", transient_for=self, action=Gtk.FileChooserAction.OPEN)
+        dialog.add_buttons("_Cancel", Gtk.ResponseType.CANCEL, "_Open", Gtk.ResponseType.ACCEPT)
+        trace_filter = Gtk.FileFilter()
+        trace_filter.set_name("SimplyToast recordings")
+        trace_filter.add_pattern("*.sttrace")
+        dialog.add_filter(trace_filter)
+        path = dialog.get_filename() if dialog.run() == Gtk.ResponseType.ACCEPT else None
+        dialog.destroy()
+        if path is None:
+            return
+        try:
+            reader = TraceReader(path)
+        except (OSError, TraceError) as e:
+            self.show_errors("Could not open the recording", [(path, e)])
+            return
+        if not len(reader):
+            reader.close()
+            self.show_errors("Could not open the recording", [(path, TraceError("no snapshots"))])
+            return
+        self.start_replay(reader)
+
+    def start_replay(self, reader):
+        # Live sampling stops while replaying, so nothing overwrites the
+        # recorded panes and nothing reads /proc.
+        self.stop_recording()
+        if self.capture is not None:
+            self.on_capture_baseline(None)
+        if self.replay is not None:
+            self.stop_replay_timer()
+            self.replay.close()
+        if self.auto_refresh_id:
+            GLib.source_remove(self.auto_refresh_id)
+            self.auto_refresh_id = 0
+        if self.collector is not None:
+            if self.collector_watch_id:
+                GLib.source_remove(self.collector_watch_id)
+                self.collector_watch_id = 0
+            self.collector.close()
+            self.collector = None
+        self.replay = reader
+        self.replay_index = -1
+        self.detail_key = None
+        self.lifecycle = LifecycleLog()
+        self.exited_list.clear()
+        self.exited_expander.set_label("Recently exited")
+        self.update_subtitle()
+        self.item_record.set_sensitive(False)
+        self.item_baseline.set_sensitive(False)
+        self.autostart_stale = True
+        with self.replay_scale.handler_block(self.replay_scale_id):
+            self.replay_scale.set_range(0, max(len(reader) - 1, 1))
+            self.replay_scale.set_value(0)
+        self.replay_bar.show()
+        self.show_replay_frame(0)
+
+    def stop_replay(self):
+        if self.replay is None:
+            return
+        self.stop_replay_timer()
+        self.replay.close()
+        self.replay = None
+        self.replay_bar.hide()
+        self.update_subtitle()
+        self.item_record.set_sensitive(True)
+        self.item_baseline.set_sensitive(True)
+        self.detail_buffer.set_text("")
+        self.lifecycle = LifecycleLog()
+        self.exited_list.clear()
+        self.exited_expander.set_label("Recently exited")
+        # Back to live: rescore Impact from the next live sample.
+        self.autostart_stale = True
+        self.go_live()
+
+    def show_replay_frame(self, index):
+        try:
+            snapshot, system = self.replay.frame(index)
+        except TraceError as e:
+            self.stop_replay_timer()
+            self.show_errors("The recording is damaged", [(self.replay.path, e)])
+            return False
+        # Stepping forward one snapshot feeds "Recently exited" like a live
+        # tick; a seek just shows the snapshot it lands on.
+        if index == self.replay_index + 1 and index > 0:
+            self.record_lifecycle(snapshot, *trace_changes(self.snapshot, snapshot))
+        self.replay_index = index
+        self.system_header.update(system or EMPTY_SYSTEM)
+        self.apply_snapshot(snapshot)
+        with self.replay_scale.handler_block(self.replay_scale_id):
+            self.replay_scale.set_value(index)
+        self.replay_label.set_text(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot.time))}"
+                                   f"  {index + 1}/{len(self.replay)}")
+        return True
+
+    def on_replay_seek(self, scale):
+        index = int(round(scale.get_value()))
+        if self.replay is not None and index != self.replay_index:
+            self.show_replay_frame(index)
+            if self.replay_timer_id:
+                # Keep playing from the new position.
+                GLib.source_remove(self.replay_timer_id)
+                self.schedule_replay_step()
+
+    def on_replay_play(self, button):
+        if self.replay_timer_id:
+            self.stop_replay_timer()
+            return
+        if self.replay_index >= len(self.replay) - 1:
+            self.show_replay_frame(0)
+        self.replay_play_icon.set_from_icon_name("media-playback-pause-symbolic", Gtk.IconSize.BUTTON)
+        self.schedule_replay_step()
+
+    def schedule_replay_step(self):
+        times = self.replay.times
+        gap = times[self.replay_index + 1] - times[self.replay_index] if self.replay_index + 1 < len(times) else 0
+        speed = float(self.replay_speed.get_active_id() or 1)
+        delay = min(max(int(gap * 1000 / speed), REPLAY_MIN_STEP_MS), REPLAY_MAX_STEP_MS)
+        self.replay_timer_id = GLib.timeout_add(delay, self.on_replay_step)
+
+    def on_replay_step(self):
+        self.replay_timer_id = 0
+        if self.replay is None or not self.show_replay_frame(self.replay_index + 1):
+            return False
+        if self.replay_index >= len(self.replay) - 1:
+            self.stop_replay_timer()
+        else:
+            self.schedule_replay_step()
+        return False
+
+    def stop_replay_timer(self):
+        if self.replay_timer_id:
+            GLib.source_remove(self.replay_timer_id)
+            self.replay_timer_id = 0
+        self.replay_play_icon.set_from_icon_name("media-playback-start-symbolic", Gtk.IconSize.BUTTON)
+
+    # Profiling
+    def on_key_press(self, widget, event):
+        mods = event.state & Gtk.accelerator_get_default_mod_mask()
+        if mods != (Gdk.ModifierType.CONTROL_MASK | Gdk.ModifierType.SHIFT_MASK):
+            return False
+        key = Gdk.keyval_to_lower(event.keyval)
+        if key == Gdk.KEY_p:
+            self.set_profile_overlay(not self.profile_label.get_visible())
+            return True
+        if key == Gdk.KEY_j:
+            self.dump_profile()
+            return True
+        return False
+
+    def set_profile_overlay(self, visible):
+        # Showing the overlay turns span recording on; hiding it leaves the
+        # collected data (and recording) alone so it can still be dumped.
+        if visible:
+            PROFILER.enabled = True
+            self.update_profile_overlay()
+            self.profile_label.show()
+            if not self.profile_update_id:
+                self.profile_update_id = GLib.timeout_add(1000, self.update_profile_overlay)
+        else:
+            self.profile_label.hide()
+            if self.profile_update_id:
+                GLib.source_remove(self.profile_update_id)
+                self.profile_update_id = 0
+
+    def update_profile_overlay(self):
+        self.profile_label.set_markup(f"<tt>{GLib.markup_escape_text(PROFILER.report())}</tt>")
+        return True
+
+    def dump_profile(self):
         try:
-            width = self.paned.get_allocated_width()
-            if width:
-                self.paned.set_position(width // 2)
-        except Exception:
+            PROFILER.dump(PROFILE_FILE)
+        except OSError:
             pass
 
 
 # ---------- Entry point ----------
 
 def main():
-    win = ToastWindow()
+    win = ToastWindow(startup_profile="--startup-profile" in sys.argv[1:])
     win.connect("destroy", Gtk.main_quit)
     win.show_all()
     Gtk.main()
@@ -5,11 +5,19 @@ gi.require_version("Gtk", "3.0")
 from gi.repository import Gtk, Gdk, GdkPixbuf
 from gi.repository import GLib
 import json
-import subprocess
+import sys
 from pathlib import Path
 import os
 
-CONFIG_DIR = Path.home() / ".config" / "simplytoast"
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from toastcore.autostart import AutostartRepository, render_entry
+from toastcore.filtering import filter_processes, toast_filter
+from toastcore.paths import AUTOSTART_USER, CONFIG_DIR
+from toastcore.processes import impact_percent, usage_by_comm
+from toastcore.sampler import Sampler
+from toastcore.snapshot import EMPTY_SNAPSHOT
+
 SETTINGS_FILE = CONFIG_DIR / "settings.json"
 
 current_provider = None
@@ -72,71 +80,7 @@ def apply_theme(window, theme_name):
 # AUTOSTART HANDLING
 # ===========================
 
-def scan_autostart():
-    entries = []
-
-    user_dir = Path.home() / ".config" / "autostart"
-    system_dir = Path("/etc/xdg/autostart")
-
-    if user_dir.exists():
-        for f in user_dir.glob("*.desktop"):
-            entries.append((f, "user"))
-
-    if system_dir.exists():
-        for f in system_dir.glob("*.desktop"):
-            entries.append((f, "system"))
-
-    return entries
-
-
-def parse_desktop_file(filepath):
-    name = filepath.stem
-    comment = ""
-    icon = ""
-    enabled = True
-
-    try:
-        with open(filepath, "r") as f:
-            for line in f:
-                if line.startswith("Name="):
-                    name = line.split("=", 1)[1].strip()
-                elif line.startswith("Comment="):
-                    comment = line.split("=", 1)[1].strip()
-                elif line.startswith("Icon="):
-                    icon = line.split("=", 1)[1].strip()
-                elif line.startswith("Hidden="):
-                    enabled = not ("true" in line.lower())
-    except:
-        pass
-
-    return name, comment, icon, enabled
-
-
-def set_enabled(filepath, enabled):
-    try:
-        lines = []
-        found = False
-        with open(filepath, "r") as f:
-            for line in f:
-                if line.startswith("Hidden="):
-                    found = True
-                    line = "Hidden=false\n" if enabled else "Hidden=true\n"
-                lines.append(line)
-
-        if not found:
-            lines.append("Hidden=false\n" if enabled else "Hidden=true\n")
-
-        with open(filepath, "w") as f:
-            f.writelines(lines)
-    except:
-        pass
-
-
-def delete_autostart(filepath):
-    try:
-        Path(filepath).unlink(missing_ok=True)
-    except:
-        pass
+# Scanning, parsing and writing live in toastcore (AutostartRepository).
 
 
 # ===========================
@@ -209,28 +153,13 @@ class NewEntryWindow(Gtk.Window):
             self.destroy()
             return
 
-        autostart_dir = Path.home() / ".config" / "autostart"
-        autostart_dir.mkdir(parents=True, exist_ok=True)
-
-        filename = autostart_dir / f"{name.replace(' ', '_')}.desktop"
-
-        text = [
-            "[Desktop Entry]\n",
-            "Type=Application\n",
-            f"Name={name}\n",
-            f"Exec={cmd}\n",
-        ]
-
-        if comment:
-            text.append(f"Comment={comment}\n")
-        if icon:
-            text.append(f"Icon={icon}\n")
-
-        text.append("Hidden=false\n")
-        text.append("X-GNOME-Autostart-enabled=true\n")
+        filename = AUTOSTART_USER / f"{name.replace(' ', '_')}.desktop"
 
-        with open(filename, "w") as f:
-            f.writelines(text)
+        batch = self.parent.repo.batch()
+        batch.write(filename, render_entry(name, cmd, comment, icon))
+        # Stays open on failure so nothing typed is lost.
+        if not self.parent.commit_batch(batch):
+            return
 
         self.parent.refresh_autostart()
         self.destroy()
@@ -308,83 +237,22 @@ class EditEntryWindow(Gtk.Window):
         comment = self.entry_comment.get_text().strip()
         icon = self.entry_icon.get_text().strip()
 
-        lines = [
-            "[Desktop Entry]\n",
-            "Type=Application\n",
-            f"Name={name}\n",
-            f"Exec={cmd}\n",
-        ]
-
-        if comment:
-            lines.append(f"Comment={comment}\n")
-        if icon:
-            lines.append(f"Icon={icon}\n")
-
-        lines.append("Hidden=false\n")
-        lines.append("X-GNOME-Autostart-enabled=true\n")
-
-        with open(self.filepath, "w") as f:
-            f.writelines(lines)
+        entry = self.parent.repo.for_path(self.filepath)
+        if entry is not None:
+            batch = self.parent.repo.batch()
+            batch.update(entry, {
+                "Name": name,
+                "Exec": cmd,
+                "Comment": comment or None,
+                "Icon": icon or None,
+            })
+            if not self.parent.commit_batch(batch):
+                return
 
         self.parent.refresh_autostart()
         self.destroy()
 
 
-# ===========================
-# BACKGROUND PROCESSES
-# ===========================
-
-def scan_processes():
-    user = os.environ.get("USER") or os.getlogin()
-
-    try:
-        cmd = f"ps -u {user} -o pid=,comm=,%cpu=,%mem=,args="
-        out = subprocess.check_output(cmd, shell=True, stderr=subprocess.DEVNULL).decode(errors="ignore")
-
-        rows = []
-
-        for line in out.splitlines():
-            parts = line.strip().split(None, 4)
-            if len(parts) >= 5:
-                pid, comm, cpu, mem, args = parts
-            elif len(parts) == 4:
-                pid, comm, cpu, mem = parts
-                args = comm
-            else:
-                continue
-
-            try:
-                cpu_f = float(cpu)
-                mem_f = float(mem)
-            except:
-                cpu_f = 0.0
-                mem_f = 0.0
-
-            rows.append((pid, comm, cpu, mem, args, cpu_f, mem_f))
-
-        rows.sort(key=lambda x: (-x[5], -x[6]))
-
-        return rows
-
-    except:
-        return []
-
-
-# ===========================
-# FILTERING
-# ===========================
-
-def toast_filter(data, text, columns):
-    text = text.lower()
-    result = []
-    for row in data:
-        for col in columns:
-            if text in str(row[col]).lower():
-                result.append(row)
-                break
-    return result
-
-
 # ===========================
 # MAIN WINDOW
 # ===========================
@@ -601,9 +469,13 @@ class ToastWindow(Gtk.Window):
         self.connect("size-allocate", self.on_resize_keep_split)         
 
         # Load everything
-        
-        self.refresh_autostart()
+        self.repo = AutostartRepository()
+        self.sampler = Sampler()
+        self.snapshot = EMPTY_SNAPSHOT
+        self._autostart_original = []
+
         self.refresh_processes()
+        self.refresh_autostart()
         apply_theme(self, self.settings["theme"])
 
         # Auto-refresh processes
@@ -616,91 +488,96 @@ class ToastWindow(Gtk.Window):
         self.refresh_processes()
         return True
 
+    def commit_batch(self, batch):
+        # Returns True when every write went through.
+        _, errors = batch.commit()
+        if errors:
+            self.show_errors("Some autostart entries could not be changed", errors)
+        return not errors
+
+    def show_errors(self, text, errors):
+        dialog = Gtk.MessageDialog(
+            transient_for=self,
+            modal=True,
+            message_type=Gtk.MessageType.ERROR,
+            buttons=Gtk.ButtonsType.CLOSE,
+            text=text,
+        )
+        dialog.format_secondary_text("\n".join(f"{label}: {getattr(e, 'strerror', None) or e}" for label, e in errors))
+        dialog.run()
+        dialog.destroy()
+
     # ===========================
     # DATA LOADERS
     # ===========================
     def refresh_autostart(self):
         self.autostart_list.clear()
-        # Build process usage map {name: resource_score}
-        proc_usage = {}
-        for pid, comm, cpu, mem, args, _, _ in scan_processes():
-            try:
-                score = float(cpu) + float(mem)
-            except:
-                score = 0.0
-            proc_usage[comm.lower()] = score
+        # Build process usage map {name: resource_score} from the last sample
+        proc_usage = usage_by_comm(self.snapshot.processes)
 
-        entries = scan_autostart()
+        entries = self.repo.refresh()
         self._autostart_original = []
 
         if not entries:
-            self.autostart_list.append(["(empty)", False, "", "", "", ""])
+            self.autostart_list.append(["(empty)", False, "", "", "", "", 0.0, 0.0])
             return
-        
-        rows_temp = []
 
         # total score to calculate percentages
         total_score = sum(proc_usage.values()) or 1.0
 
-
-        for filepath, source in entries:
-            name, comment, icon, enabled = parse_desktop_file(filepath)
-
-            if not icon:
-                icon = "application-x-executable"
-
+        for entry in entries:
             # Get resource usage score
-            score = proc_usage.get(name.lower(), 0.0)
-
-            impact_percent = round((score / total_score) * 100, 1)
+            score = proc_usage.get(entry.name.lower(), 0.0)
 
             row = [
-                name,
-                enabled,
-                str(filepath),
-                source,
-                icon,
-                comment or "No description available",
+                entry.name,
+                entry.enabled,
+                entry.path,
+                entry.source,
+                entry.icon or "application-x-executable",
+                entry.comment or "No description available",
                 score,
-                float(f"{impact_percent:.2f}")
+                impact_percent(score, total_score)
             ]
 
-
-            rows_temp.append(row)
+            self._autostart_original.append(row)
 
         # Sort by resource usage (highest to lowest)
-        rows_temp.sort(key=lambda x: -x[6])
+        self._autostart_original.sort(key=lambda x: -x[6])
 
         # Append sorted items into the ListStore
-        for row in rows_temp:
+        for row in self._autostart_original:
             self.autostart_list.append(row)
 
 
     def refresh_processes(self):
+        self.snapshot = self.sampler.sample()
+        self.show_processes(self.snapshot.processes)
+
+    def show_processes(self, processes):
         self.process_list.clear()
-        rows = scan_processes()
+        theme = Gtk.IconTheme.get_default()
 
-        for pid, comm, cpu, mem, args, _, _ in rows:
+        for p in processes:
 
             # Determine icon name safely
-            icon_name = comm.lower()
+            icon_name = p.comm.lower()
 
             try:
-                theme = Gtk.IconTheme.get_default()
                 if not theme.has_icon(icon_name):
                     icon_name = "application-x-executable"
             except:
                 icon_name = "application-x-executable"
 
-            # Add the row WITHIN the loop
-            self.process_list.append([pid, comm, cpu, mem, args, icon_name])
+            self.process_list.append(
+                [str(p.pid), p.comm, f"{p.cpu:.1f}", f"{p.mem:.1f}", p.args, icon_name])
 
 
 
     def on_refresh(self, button):
         self.search_entry.set_text("")
-        self.refresh_autostart()
         self.refresh_processes()
+        self.refresh_autostart()
 
     def on_toggle_theme(self, button):
         themes = ["light", "mid", "dark"]
@@ -737,23 +614,12 @@ class ToastWindow(Gtk.Window):
         values = list(model[treeiter]) + ["", ""]
         name, enabled, filepath, source, icon, comment = values[:6]
 
-
-        if source == "system":
+        entry = self.repo.for_path(filepath)
+        if entry is None:
             return
-        if name == "(empty)":
-            return
-
-        cmd = ""
-        try:
-            with open(filepath, "r") as f:
-                for line in f:
-                    if line.startswith("Exec="):
-                        cmd = line.split("=", 1)[1].strip()
-        except:
-            pass
 
         win = EditEntryWindow(
-            self, filepath, name, cmd, comment, icon)
+            self, filepath, entry.name, entry.exec, entry.comment, entry.icon)
         win.show_all()
 
     def on_delete_selected(self, menuitem):
@@ -765,26 +631,30 @@ class ToastWindow(Gtk.Window):
         if not treeiter:
             return
 
-        name, enabled, filepath, source, icon, comment = model[treeiter]
+        name, enabled, filepath, source, icon, comment = model[treeiter][:6]
 
-        if source == "system":
-            return
-        if name == "(empty)":
+        entry = self.repo.for_path(filepath)
+        if entry is None:
             return
 
-        delete_autostart(filepath)
+        batch = self.repo.batch()
+        batch.delete(entry)
+        self.commit_batch(batch)
         self.refresh_autostart()
 
     def on_toggle_autostart(self, widget, path):
         iter = self.autostart_list.get_iter(path)
-        name, enabled, filepath, source, icon, comment = self.autostart_list[iter]
+        name, enabled, filepath, source, icon, comment = self.autostart_list[iter][:6]
 
-        if source == "system":
+        entry = self.repo.for_path(filepath)
+        if entry is None:
             return
 
         new_val = not enabled
-        self.autostart_list[iter][1] = new_val
-        set_enabled(filepath, new_val)
+        batch = self.repo.batch()
+        batch.set_enabled(entry, new_val)
+        if self.commit_batch(batch):
+            self.autostart_list[iter][1] = new_val
 
     def on_search(self, entry):
         text = entry.get_text().lower()
@@ -794,23 +664,8 @@ class ToastWindow(Gtk.Window):
         for row in toast_filter(self._autostart_original, text, [0]):
            self.autostart_list.append(row)
 
-        # Background process filter
-        self.process_list.clear()
-
-        rows = scan_processes()
-        for pid, comm, cpu, mem, args, _, _ in rows:
-            if text in pid.lower() or text in comm.lower() or text in args.lower():
-
-                icon_name = comm.lower()
-                try:
-                    theme = Gtk.IconTheme.get_default()
-                    if not theme.has_icon(icon_name):
-                        icon_name = "application-x-executable"
-                except:
-                    icon_name = "application-x-executable"
-
-            # Append INSIDE the IF and INSIDE THE LOOP
-            self.process_list.append([pid, comm, cpu, mem, args, icon_name])
+        # Background process filter (last sample, no rescan)
+        self.show_processes(filter_processes(self.snapshot.processes, text))
 
 
     def on_resize_keep_split(self, widget, allocation):
@@ -0,0 +1,3 @@
+# Import from the submodules (toastcore.sampler, toastcore.autostart, ...).
+# Nothing is re-exported here: the headless CLI imports this package first
+# and should only pay for the modules its command uses.
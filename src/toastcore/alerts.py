@@ -0,0 +1,164 @@
+from collections import deque, namedtuple
+
+METRICS = ("cpu", "rss_growth")
+# Apps tracked per rule; further apps are ignored until a slot frees up, so
+# memory and per-tick work stay bounded however many processes there are.
+MAX_TRACKED = 256
+DEFAULT_CLEAR = 0.8
+
+# settings.json:
+#   "alerts": [
+#     {"metric": "cpu", "threshold": 80, "window": 30},
+#     {"metric": "rss_growth", "threshold": 500, "window": 600, "app": "firefox"}
+#   ]
+# cpu: an app's summed CPU% averaged above threshold over the whole window
+# (seconds). rss_growth: an app's summed RSS grew by more than threshold MB
+# within window seconds. "app" limits a rule to one comm (case-insensitive);
+# "clear" is the fraction of the threshold the value must fall below before
+# the alert can fire again (hysteresis, default 0.8).
+
+
+class Alert(namedtuple("Alert", ("rule", "app", "value", "mean", "time"))):
+    __slots__ = ()
+
+    def title(self):
+        if self.rule.metric == "cpu":
+            return f"{self.app} is using {self.value:.0f}% CPU"
+        return f"{self.app} grew by {self.value:.0f} MB"
+
+    def body(self):
+        window = self.rule.window
+        span = f"{window / 60:g} minutes" if window >= 120 else f"{window:g} seconds"
+        if self.rule.metric == "cpu":
+            return f"Above {self.rule.threshold:g}% for {span} (average {self.mean:.0f}%)."
+        return f"More than {self.rule.threshold:g} MB within {span}."
+
+
+class AlertRule(namedtuple("AlertRule", ("metric", "threshold", "window", "app", "clear"))):
+    __slots__ = ()
+
+    @classmethod
+    def parse(cls, data):
+        metric = data.get("metric")
+        if metric not in METRICS:
+            raise ValueError(f"unknown metric {metric!r}")
+        threshold = float(data["threshold"])
+        window = float(data["window"])
+        if window <= 0:
+            raise ValueError("window must be positive")
+        app = data.get("app")
+        return cls(metric, threshold, window, app.lower() if app else None,
+                   threshold * float(data.get("clear", DEFAULT_CLEAR)))
+
+
+class Window:
+    # Sliding time window over one app's values with O(1) amortised push:
+    # a running sum for the mean and monotonic deques for min and max.
+    __slots__ = ("span", "values", "total", "mins", "maxs", "first", "firing")
+
+    def __init__(self, span):
+        self.span = span
+        self.values = deque()
+        self.total = 0.0
+        self.mins = deque()
+        self.maxs = deque()
+        self.first = None
+        self.firing = False
+
+    def push(self, t, value):
+        if self.first is None:
+            self.first = t
+        self.values.append((t, value))
+        self.total += value
+        mins, maxs = self.mins, self.maxs
+        while mins and mins[-1][1] >= value:
+            mins.pop()
+        mins.append((t, value))
+        while maxs and maxs[-1][1] <= value:
+            maxs.pop()
+        maxs.append((t, value))
+        cutoff = t - self.span
+        values = self.values
+        while values[0][0] < cutoff:
+            self.total -= values.popleft()[1]
+        while mins[0][0] < cutoff:
+            mins.popleft()
+        while maxs[0][0] < cutoff:
+            maxs.popleft()
+
+    def full(self, t):
+        # True once the window has seen a whole span of samples.
+        return t - self.first >= self.span
+
+    def mean(self):
+        return self.total / len(self.values)
+
+    def min(self):
+        return self.mins[0][1]
+
+    def max(self):
+        return self.maxs[0][1]
+
+
+class AlertEngine:
+    # Fed one Snapshot per tick. Per-app values are summed in a single pass
+    # over the processes; each rule then does O(1) amortised work per app.
+
+    def __init__(self, rules=()):
+        self.rules = []
+        self.errors = []
+        for n, data in enumerate(rules):
+            try:
+                self.rules.append(AlertRule.parse(data))
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                self.errors.append((f"alert {n + 1}", e))
+        self.windows = [{} for _ in self.rules]
+        self.last_time = None
+
+    def aggregate(self, processes):
+        cpu, rss = {}, {}
+        for p in processes:
+            name = p.comm.lower()
+            cpu[name] = cpu.get(name, 0.0) + p.cpu
+            rss[name] = rss.get(name, 0) + p.rss
+        return cpu, rss
+
+    def feed(self, snapshot):
+        # Returns the Alerts that started firing with this snapshot.
+        if not self.rules or snapshot.time == self.last_time or not snapshot.interval:
+            return []
+        self.last_time = t = snapshot.time
+        cpu, rss = self.aggregate(snapshot.processes)
+        fired = []
+        for rule, windows in zip(self.rules, self.windows):
+            if rule.metric == "cpu":
+                values = cpu
+            else:
+                values = {name: kb / 1024 for name, kb in rss.items()}
+            if rule.app is not None:
+                values = {rule.app: values[rule.app]} if rule.app in values else {}
+            for name in [n for n in windows if n not in values]:
+                del windows[name]
+            for name, value in values.items():
+                window = windows.get(name)
+                if window is None:
+                    # CPU windows are only opened once an app crosses the
+                    # threshold, so idle apps cost nothing.
+                    if rule.metric == "cpu" and value <= rule.threshold or len(windows) >= MAX_TRACKED:
+                        continue
+                    window = windows[name] = Window(rule.window)
+                window.push(t, value)
+                if rule.metric == "cpu":
+                    level = window.mean() if window.full(t) else 0.0
+                else:
+                    level = value - window.min()
+                if window.firing:
+                    if level < rule.clear:
+                        window.firing = False
+                elif level > rule.threshold:
+                    window.firing = True
+                    fired.append(Alert(rule, name, value if rule.metric == "cpu" else level, window.mean(), t))
+                if rule.metric == "cpu" and not window.firing and window.max() <= rule.threshold:
+                    # Nothing above the threshold for a whole window.
+                    del windows[name]
+        return fired
@@ -0,0 +1,248 @@
+import os
+from pathlib import Path
+
+from .desktop import resolve_overrides
+from .index import DesktopIndex
+from .paths import AUTOSTART_USER
+from .processes import impact_percent, usage_by_comm
+
+
+# ---------- Key editing ----------
+def set_keys(text, updates):
+    # Set (or, with None, drop) keys inside [Desktop Entry] only, keeping every
+    # other line as-is. Missing keys are appended to the end of that group.
+    # Localized variants of an updated key (Name[de]=...) are dropped: the
+    # parser prefers them, so an edited Name would not show in that locale.
+    out = []
+    pending = dict(updates)
+    in_entry = False
+    seen_entry = False
+
+    def flush():
+        if out and not out[-1].endswith("\n"):
+            out[-1] += "\n"
+        tail = []
+        while out and not out[-1].strip():
+            tail.append(out.pop())
+        for key, value in pending.items():
+            if value is not None:
+                out.append(f"{key}={value}\n")
+        pending.clear()
+        out.extend(tail)
+
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        if stripped.startswith("["):
+            if in_entry:
+                flush()
+            in_entry = stripped == "[Desktop Entry]"
+            seen_entry = seen_entry or in_entry
+        elif in_entry and "=" in line and not stripped.startswith("#"):
+            key = line.split("=", 1)[0].strip()
+            if key.endswith("]") and key.split("[", 1)[0] in updates:
+                continue
+            if key in updates:
+                if key in pending and pending[key] is not None:
+                    out.append(f"{key}={pending[key]}\n")
+                pending.pop(key, None)
+                continue
+        out.append(line)
+
+    if in_entry:
+        flush()
+    elif not seen_entry:
+        if out and not out[-1].endswith("\n"):
+            out[-1] += "\n"
+        out.append("[Desktop Entry]\n")
+        flush()
+    return "".join(out)
+
+
+def render_entry(name, cmd, comment="", icon=""):
+    lines = [
+        "[Desktop Entry]\n",
+        "Type=Application\n",
+        f"Name={name}\n",
+        f"Exec={cmd}\n",
+    ]
+    if comment:
+        lines.append(f"Comment={comment}\n")
+    if icon:
+        lines.append(f"Icon={icon}\n")
+    lines.append("Hidden=false\n")
+    lines.append("X-GNOME-Autostart-enabled=true\n")
+    return "".join(lines)
+
+
+def enabled_keys(enabled):
+    return {
+        "Hidden": "false" if enabled else "true",
+        "X-GNOME-Autostart-enabled": "true" if enabled else "false",
+    }
+
+
+# ---------- Atomic writes ----------
+def write_atomic(path, text, fsync=True):
+    path = Path(path)
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except OSError:
+        mode = 0o644
+    # Imported here: tempfile is only needed once something is saved, not on
+    # the headless startup path.
+    import tempfile
+
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        os.fchmod(fd, mode)
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def fsync_dir(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+# ---------- Batched changes ----------
+class AutostartBatch:
+    # Collects changes to autostart entries and applies them in one go: every
+    # file goes through write-temp + os.replace, and each touched directory is
+    # fsynced once at the end. System entries are never written in place; the
+    # change lands in a user shadow file with the same basename instead.
+
+    def __init__(self, user_dir=None):
+        self.user_dir = Path(user_dir or AUTOSTART_USER)
+        self.ops = {}
+
+    def __len__(self):
+        return len(self.ops)
+
+    def writable_path(self, entry):
+        if entry.source == "user":
+            return entry.path
+        return str(self.user_dir / entry.id)
+
+    def read(self, entry):
+        target = self.writable_path(entry)
+        if target in self.ops:
+            return self.ops[target] or ""
+        for path in (target, entry.path):
+            try:
+                with open(path, "r", errors="ignore") as f:
+                    return f.read()
+            except OSError:
+                continue
+        return ""
+
+    def write(self, path, text):
+        self.ops[str(path)] = text
+
+    def remove(self, path):
+        self.ops[str(path)] = None
+
+    def update(self, entry, updates):
+        self.write(self.writable_path(entry), set_keys(self.read(entry), updates))
+
+    def set_enabled(self, entry, enabled):
+        self.update(entry, enabled_keys(enabled))
+
+    def delete(self, entry):
+        if entry.source == "user":
+            self.remove(entry.path)
+        else:
+            self.update(entry, {"Hidden": "true"})
+
+    def commit(self):
+        # Returns (changed_paths, [(path, OSError), ...]).
+        changed = []
+        errors = []
+        dirs = set()
+        ops, self.ops = self.ops, {}
+        for path, text in ops.items():
+            directory = os.path.dirname(path)
+            try:
+                if text is None:
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        continue
+                else:
+                    os.makedirs(directory, exist_ok=True)
+                    write_atomic(path, text, fsync=True)
+            except OSError as e:
+                errors.append((path, e))
+                continue
+            changed.append(path)
+            dirs.add(directory)
+        for directory in dirs:
+            fsync_dir(directory)
+        return changed, errors
+
+
+# ---------- Repository ----------
+class AutostartRepository:
+    # The effective (shadow-resolved) autostart entries, keyed by desktop id.
+
+    def __init__(self, index=None, user_dir=None):
+        self.index = index if index is not None else DesktopIndex()
+        self.user_dir = user_dir
+        self.entries = {}
+
+    def __iter__(self):
+        return iter(self.entries.values())
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, entry_id):
+        return self.entries.get(entry_id)
+
+    def for_path(self, path):
+        return self.entries.get(os.path.basename(path))
+
+    def refresh(self):
+        effective = resolve_overrides(self.index.scan())
+        self.entries = {entry.id: entry for entry in effective}
+        return effective
+
+    def update(self, paths):
+        # Re-resolve only the ids behind the given paths; {id: entry or None}.
+        updated = self.index.update_ids({os.path.basename(str(p)) for p in paths})
+        for entry_id, entry in updated.items():
+            if entry is None:
+                self.entries.pop(entry_id, None)
+            else:
+                self.entries[entry_id] = entry
+        return updated
+
+    def batch(self):
+        return AutostartBatch(self.user_dir)
+
+    def impact(self, processes):
+        # {id: (score, impact %)} for the current entries against a process list.
+        usage = usage_by_comm(processes)
+        total = sum(usage.values()) or 1.0
+        result = {}
+        for entry_id, entry in self.entries.items():
+            score = usage.get(entry.name.lower(), 0.0)
+            result[entry_id] = (score, impact_percent(score, total))
+        return result
@@ -0,0 +1,272 @@
+import json
+import math
+import os
+import re
+import time
+from collections import namedtuple
+
+from .autostart import write_atomic
+from .paths import BASELINE_DIR
+from .sampler import read_io, read_pss
+from .users import can_inspect
+
+BASELINE_WINDOW = 300.0
+# Processes that started this soon after the session's first process count
+# towards an app's login cost.
+LOGIN_WINDOW = 120.0
+# Welch's t at or beyond which a change is reported as significant (about 95%
+# for the tick counts of a few-minute window), and the fewest ticks a side
+# needs before any verdict.
+SIGNIFICANT_T = 2.0
+MIN_TICKS = 5
+# Smallest change worth reporting as significant, per metric (CPU %, PSS kB,
+# I/O bytes/s): a stable PSS makes even a few hundred kB "significant".
+MIN_EFFECT = (1.0, 5 * 1024, 10 * 1024)
+# Per app: sum and sum of squares over ticks of CPU %, PSS kB and I/O bytes/s,
+# then login CPU seconds. Ticks an app had no process count as zero.
+FIELDS = ("cpu", "cpu_sq", "pss", "pss_sq", "io", "io_sq", "login")
+
+
+class BaselineError(ValueError):
+    pass
+
+
+# ---------- Capture ----------
+class BaselineCapture:
+    # Folds the snapshots the window already samples into per-app sums over
+    # `duration` seconds; nothing is sampled on its own. PSS and I/O come from
+    # smaps_rollup and /proc/<pid>/io, read only while a capture runs. CPU and
+    # I/O need a previous sample, so the first tick of a fresh sampler (and
+    # each process's first tick, for I/O) only sets the starting point.
+
+    def __init__(self, name, duration=BASELINE_WINDOW, proc_root="/proc"):
+        self.name = check_name(name)
+        self.duration = duration
+        self.proc_root = proc_root
+        self.hz = os.sysconf("SC_CLK_TCK")
+        self.started = None
+        self.last_time = None
+        self.ticks = 0
+        self.apps = {}
+        self.total = [0.0] * (len(FIELDS) - 1)
+        self.io_prev = {}
+        self.session_start = None
+        self.login = {}
+
+    def remaining(self, now=None):
+        if self.started is None:
+            return self.duration
+        return max(self.duration - ((now or time.time()) - self.started), 0.0)
+
+    def done(self):
+        return self.started is not None and self.remaining(self.last_time) <= 0
+
+    def feed(self, snapshot):
+        # Returns True once the window is complete.
+        if self.done():
+            return True
+        if self.started is None:
+            self.started = snapshot.time
+        self.last_time = snapshot.time
+        interval = snapshot.interval
+        proc_root = self.proc_root
+        hz = self.hz
+        if self.session_start is None and snapshot.processes:
+            self.session_start = min(p.starttime for p in snapshot.processes) / hz
+        login_until = (self.session_start or 0.0) + LOGIN_WINDOW
+        io_prev = self.io_prev
+        io_now = {}
+        tick = {}
+        euid = os.geteuid()
+        for p in snapshot.processes:
+            # Other users' processes count with RSS and no I/O.
+            readable = can_inspect(p.uid, euid)
+            pss = read_pss(proc_root, p.pid) if readable else None
+            io = sum(read_io(proc_root, p.pid)) if readable else 0
+            io_now[p.key] = io
+            last_io = io_prev.get(p.key)
+            app = tick.get(p.comm)
+            if app is None:
+                app = tick[p.comm] = [0.0, 0, 0.0]
+            app[0] += p.cpu
+            app[1] += p.rss if pss is None else pss
+            if last_io is not None and interval > 0:
+                app[2] += max(io - last_io, 0) / interval
+            if p.starttime / hz <= login_until:
+                # Latest CPU time of every login-time process, so one that
+                # exits later keeps what it used.
+                self.login[p.key] = (p.comm, p.cpu_time)
+        self.io_prev = io_now
+        if interval <= 0:
+            # First sample: CPU% is a lifetime average, not this window's.
+            return False
+        self.ticks += 1
+        totals = [0.0, 0.0, 0.0]
+        apps = self.apps
+        for comm, values in tick.items():
+            sums = apps.get(comm)
+            if sums is None:
+                sums = apps[comm] = [0.0] * (len(FIELDS) - 1)
+            for n, value in enumerate(values):
+                sums[2 * n] += value
+                sums[2 * n + 1] += value * value
+                totals[n] += value
+        for n, value in enumerate(totals):
+            self.total[2 * n] += value
+            self.total[2 * n + 1] += value * value
+        return self.done()
+
+    def result(self):
+        # The baseline document saved under BASELINE_DIR.
+        login = {}
+        for comm, cpu_time in self.login.values():
+            login[comm] = login.get(comm, 0.0) + cpu_time
+        apps = {}
+        for comm in set(self.apps) | set(login):
+            sums = self.apps.get(comm, [0.0] * (len(FIELDS) - 1))
+            apps[comm] = [round(v, 3) for v in sums] + [round(login.get(comm, 0.0), 2)]
+        session_age = (self.started or 0.0) - boot_time(self.proc_root) - (self.session_start or 0.0)
+        return {
+            "name": self.name,
+            "time": self.started,
+            "duration": round((self.last_time or 0.0) - (self.started or 0.0), 1),
+            "ticks": self.ticks,
+            "session_age": round(session_age, 1),
+            "apps": apps,
+            "total": [round(v, 3) for v in self.total] + [round(sum(login.values()), 2)],
+        }
+
+
+def boot_time(proc_root="/proc"):
+    # Wall-clock boot time, to turn starttime into a session age.
+    try:
+        with open(f"{proc_root}/stat", "rb") as f:
+            for line in f:
+                if line.startswith(b"btime "):
+                    return float(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0.0
+
+
+# ---------- Storage ----------
+def check_name(name):
+    name = name.strip()
+    if not re.fullmatch(r"[\w.-]{1,64}", name) or name.startswith("."):
+        raise BaselineError("use 1-64 letters, digits, '.', '_' or '-'")
+    return name
+
+
+def baseline_path(name, directory=BASELINE_DIR):
+    return os.path.join(str(directory), check_name(name) + ".json")
+
+
+def save_baseline(baseline, directory=BASELINE_DIR):
+    os.makedirs(str(directory), mode=0o700, exist_ok=True)
+    write_atomic(baseline_path(baseline["name"], directory), json.dumps(baseline, separators=(",", ":")))
+
+
+def load_baseline(name, directory=BASELINE_DIR):
+    try:
+        with open(baseline_path(name, directory), "r") as f:
+            baseline = json.load(f)
+        if not isinstance(baseline.get("apps"), dict) or len(baseline.get("total", ())) != len(FIELDS):
+            raise BaselineError("not a baseline")
+    except (ValueError, AttributeError) as e:
+        raise BaselineError(f"{name}: {e}") from e
+    return baseline
+
+
+def list_baselines(directory=BASELINE_DIR):
+    # [(name, capture time)], newest first.
+    found = []
+    try:
+        names = os.listdir(str(directory))
+    except OSError:
+        return found
+    for filename in names:
+        if not filename.endswith(".json"):
+            continue
+        try:
+            found.append((filename[:-5], os.stat(os.path.join(str(directory), filename)).st_mtime))
+        except OSError:
+            continue
+    found.sort(key=lambda b: -b[1])
+    return found
+
+
+# ---------- Comparison ----------
+class Change(namedtuple("Change", ("before", "after", "t", "significant"))):
+    # Means per tick (login: plain totals) and Welch's t, None when there is
+    # nothing to test.
+    __slots__ = ()
+
+    @property
+    def delta(self):
+        return self.after - self.before
+
+
+class AppComparison(namedtuple("AppComparison", ("app", "cpu", "pss", "io", "login"))):
+    __slots__ = ()
+
+
+def _stats(sums, n, field):
+    # (mean, variance) of one metric over n ticks from its sum and sum of squares.
+    if n <= 0:
+        return 0.0, 0.0
+    total, squares = sums[2 * field], sums[2 * field + 1]
+    mean = total / n
+    var = (squares - total * total / n) / (n - 1) if n > 1 else 0.0
+    return mean, max(var, 0.0)
+
+
+def welch_t(before, after, n_before, n_after):
+    if n_before < MIN_TICKS or n_after < MIN_TICKS:
+        return None
+    se = math.sqrt(before[1] / n_before + after[1] / n_after)
+    diff = after[0] - before[0]
+    if se == 0:
+        return 0.0 if diff == 0 else math.copysign(math.inf, diff)
+    return diff / se
+
+
+def _compare(app, before, after, n_before, n_after):
+    changes = []
+    for field in range(3):
+        b = _stats(before, n_before, field)
+        a = _stats(after, n_after, field)
+        t = welch_t(b, a, n_before, n_after)
+        significant = t is not None and abs(t) >= SIGNIFICANT_T and abs(a[0] - b[0]) >= MIN_EFFECT[field]
+        changes.append(Change(b[0], a[0], t, significant))
+    changes.append(Change(before[-1], after[-1], None, False))
+    return AppComparison(app, *changes)
+
+
+def compare(before, after):
+    # ([AppComparison per app], AppComparison of the totals), apps ordered by
+    # the size of their CPU change.
+    empty = [0.0] * len(FIELDS)
+    nb, na = before["ticks"], after["ticks"]
+    apps = [_compare(app, before["apps"].get(app, empty), after["apps"].get(app, empty), nb, na)
+            for app in set(before["apps"]) | set(after["apps"])]
+    apps.sort(key=lambda c: (-abs(c.cpu.delta), -abs(c.pss.delta)))
+    return apps, _compare("Total", before["total"], after["total"], nb, na)
+
+
+def format_change(change, scale=1.0):
+    mark = " *" if change.significant else ""
+    return f"{change.before / scale:.1f} → {change.after / scale:.1f} ({change.delta / scale:+.1f}){mark}"
+
+
+def format_comparison(before, after, limit=20):
+    # Plain-text diff for the CLI; * marks a significant change.
+    apps, total = compare(before, after)
+    lines = [f"{before['name']} ({before['ticks']} ticks) → {after['name']} ({after['ticks']} ticks)"]
+    header = f"{'App':<20} {'CPU %':<24} {'PSS MB':<26} {'I/O KB/s':<24} Login CPU s"
+    lines.append(header)
+    for c in apps[:limit] + [total]:
+        lines.append(f"{c.app[:20]:<20} {format_change(c.cpu):<24} {format_change(c.pss, scale=1024):<26} "
+                     f"{format_change(c.io, scale=1024):<24} {format_change(c.login)}")
+    lines.append(f"* significant: Welch's |t| >= {SIGNIFICANT_T}; session age {before['session_age']:.0f}s "
+                 f"→ {after['session_age']:.0f}s at capture")
+    return "\n".join(lines)
@@ -0,0 +1,383 @@
+import argparse
+import json
+import sys
+import time
+
+from .filtering import filter_processes
+from .paths import COLLECTOR_SOCKET, FROZEN_FILE
+from .sampler import Sampler
+from .users import SCOPE_USER, SCOPES, USER_NAMES
+
+# Everything beyond sampling (autostart, daemon, exporter, focus, trace,
+# baseline) is imported by the command that needs it, so `top` and `watch`
+# start without loading http.server and friends.
+
+COMMANDS = ("list-autostart", "top", "watch", "collector", "exporter", "thaw", "record", "replay", "baseline")
+
+
+# ---------- Records ----------
+def process_record(p):
+    return {
+        "pid": p.pid,
+        "ppid": p.ppid,
+        "uid": p.uid,
+        "user": USER_NAMES.name(p.uid),
+        "comm": p.comm,
+        "state": p.state,
+        "cpu": p.cpu,
+        "mem": p.mem,
+        "rss_kb": p.rss,
+        "cpu_time": round(p.cpu_time, 2),
+        "threads": p.threads,
+        "args": p.args,
+    }
+
+
+def autostart_records(repo, processes):
+    from .desktop import current_desktops
+
+    impact = repo.impact(processes)
+    desktops = current_desktops()
+    which_cache = {}
+    records = []
+    for entry in repo:
+        score, percent = impact[entry.id]
+        records.append({
+            "id": entry.id,
+            "name": entry.name,
+            "enabled": entry.enabled,
+            "source": entry.source,
+            "path": entry.path,
+            "overrides": entry.overrides,
+            "exec": entry.exec,
+            "comment": entry.comment,
+            "icon": entry.icon,
+            "inactive_reason": entry.inactive_reason(desktops, which_cache),
+            "score": score,
+            "impact": percent,
+        })
+    records.sort(key=lambda r: -r["score"])
+    return records
+
+
+def process_sample(sampler, args):
+    return snapshot_doc(sampler.sample(), args)
+
+
+def snapshot_doc(snapshot, args):
+    processes = filter_processes(snapshot.processes, args.filter)
+    if args.limit:
+        processes = processes[:args.limit]
+    return {
+        "time": snapshot.time,
+        "interval": round(snapshot.interval, 3),
+        "processes": [process_record(p) for p in processes],
+    }
+
+
+def add_events(doc, args, started, exited):
+    # watch --events: processes that appeared / went away since the last line;
+    # exited ones carry their last sampled values.
+    if args.events:
+        doc["started"] = [process_record(p) for p in filter_processes(started, args.filter)]
+        doc["exited"] = [process_record(p) for p in filter_processes(exited, args.filter)]
+    return doc
+
+
+# ---------- Output ----------
+def emit(doc, fmt, items_key=None):
+    out = sys.stdout
+    if fmt == "ndjson" and items_key:
+        for item in doc[items_key]:
+            out.write(json.dumps(item, separators=(",", ":")) + "\n")
+    elif fmt == "ndjson":
+        out.write(json.dumps(doc, separators=(",", ":")) + "\n")
+    else:
+        json.dump(doc, out, indent=2)
+        out.write("\n")
+    out.flush()
+
+
+# ---------- Commands ----------
+def cmd_list_autostart(args):
+    from .autostart import AutostartRepository
+    from .filtering import toast_filter
+
+    repo = AutostartRepository()
+    repo.refresh()
+    processes = Sampler().sample().processes if args.impact else ()
+    records = autostart_records(repo, processes)
+    if args.filter:
+        records = toast_filter(records, args.filter, ["name", "id", "exec"])
+    emit({"time": time.time(), "entries": records}, args.format, "entries")
+    return 0
+
+
+def cmd_top(args):
+    emit(process_sample(Sampler(scope=args.scope), args), args.format, "processes")
+    return 0
+
+
+def watch_collector(client, args):
+    # The daemon paces the stream; every snapshot/diff becomes one line.
+    client.subscribe(max(args.interval, 0.25))
+    ticks = 0
+    while True:
+        snapshot = client.wait()
+        if snapshot is None:
+            continue
+        emit(add_events(snapshot_doc(snapshot, args), args, client.started, client.exited), args.format)
+        ticks += 1
+        if args.count and ticks >= args.count:
+            return 0
+
+
+def cmd_watch(args):
+    # One NDJSON line per tick. A running collector daemon is used when
+    # available; otherwise ticks are sampled here on a fixed grid so slow
+    # samples do not make the interval drift.
+    # The collector only samples its own user's processes.
+    if args.collector and args.scope == SCOPE_USER:
+        from .daemon import CollectorClient
+
+        client = CollectorClient()
+        if client.connect():
+            try:
+                return watch_collector(client, args)
+            except ConnectionError:
+                pass
+            finally:
+                client.close()
+    interval = max(args.interval, 0.1)
+    sampler = Sampler(scope=args.scope)
+    next_tick = time.monotonic()
+    ticks = 0
+    while True:
+        doc = process_sample(sampler, args)
+        if ticks:
+            add_events(doc, args, sampler.started, sampler.exited)
+        emit(doc, args.format)
+        ticks += 1
+        if args.count and ticks >= args.count:
+            return 0
+        next_tick += interval
+        delay = next_tick - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            next_tick = time.monotonic()
+
+
+def cmd_collector(args):
+    from .daemon import CollectorRunning, run_collector
+
+    try:
+        return run_collector(args.socket, idle_exit=args.idle_exit)
+    except CollectorRunning as e:
+        print(f"simplytoast: {e}", file=sys.stderr)
+        return 1
+
+
+def cmd_exporter(args):
+    from .exporter import DEFAULT_INTERVAL, DEFAULT_LISTEN, DEFAULT_TOP, MetricsExporter, serve_metrics
+
+    exporter = MetricsExporter(top_n=DEFAULT_TOP if args.top is None else args.top)
+    interval = DEFAULT_INTERVAL if args.interval is None else args.interval
+    serve_metrics(exporter, max(interval, 1.0), args.listen or DEFAULT_LISTEN, args.socket)
+    return 0
+
+
+def cmd_thaw(args):
+    # Without --wait-fd this resumes right away, e.g. after a crash.
+    from .focus import FocusMode, wait_and_thaw
+
+    if args.wait_fd is None:
+        focus = FocusMode(args.file)
+        focus.adopt(everything=True)
+        errors = focus.resume_all()
+    else:
+        errors = wait_and_thaw(args.wait_fd, args.file, args.owner)
+    for label, e in errors:
+        print(f"simplytoast: {label}: {e.strerror or e}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def cmd_record(args):
+    # Same fixed grid as watch; prints the trace size when stopped.
+    from .system import SystemSampler
+    from .trace import TraceWriter
+
+    interval = max(args.interval, 0.1)
+    sampler = Sampler(scope=args.scope)
+    system = SystemSampler()
+    try:
+        writer = TraceWriter(args.file)
+    except OSError as e:
+        print(f"simplytoast: {args.file}: {e.strerror or e}", file=sys.stderr)
+        return 1
+    next_tick = time.monotonic()
+    try:
+        while True:
+            writer.write(sampler.sample(), system.sample())
+            if args.count and writer.records >= args.count:
+                break
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        print(f"simplytoast: {writer.records} snapshots, {writer.bytes} bytes", file=sys.stderr)
+    return 0
+
+
+def cmd_replay(args):
+    # A recorded trace as watch output; --speed 0 dumps it without pausing.
+    from .trace import TraceError, TraceReader, changes
+
+    try:
+        reader = TraceReader(args.file)
+    except (OSError, TraceError) as e:
+        print(f"simplytoast: {args.file}: {getattr(e, 'strerror', None) or e}", file=sys.stderr)
+        return 1
+    previous = None
+    try:
+        for i in range(len(reader)):
+            snapshot, _ = reader.frame(i)
+            doc = snapshot_doc(snapshot, args)
+            if previous is not None:
+                add_events(doc, args, *changes(previous, snapshot))
+            if args.speed > 0 and previous is not None:
+                time.sleep(max(snapshot.time - previous.time, 0) / args.speed)
+            emit(doc, args.format)
+            previous = snapshot
+    except TraceError as e:
+        print(f"simplytoast: {args.file}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        reader.close()
+    return 0
+
+
+def cmd_baseline(args):
+    from .baseline import (BASELINE_WINDOW, BaselineCapture, BaselineError, format_comparison, list_baselines,
+                           load_baseline, save_baseline)
+
+    wanted = {"capture": 1, "list": 0, "diff": 2}[args.action]
+    if len(args.names) != wanted:
+        print(f"simplytoast: baseline {args.action} takes {wanted} name{'s' if wanted != 1 else ''}", file=sys.stderr)
+        return 2
+    try:
+        if args.action == "list":
+            for name, mtime in list_baselines():
+                print(f"{name}\t{time.strftime('%Y-%m-%d %H:%M', time.localtime(mtime))}")
+        elif args.action == "diff":
+            print(format_comparison(load_baseline(args.names[0]), load_baseline(args.names[1]), args.limit))
+        else:
+            capture = BaselineCapture(args.names[0], BASELINE_WINDOW if args.window is None else args.window)
+            sampler = Sampler()
+            interval = max(args.interval, 0.5)
+            while not capture.feed(sampler.sample()):
+                time.sleep(interval)
+            save_baseline(capture.result())
+            print(f"simplytoast: baseline {capture.name}: {capture.ticks} ticks", file=sys.stderr)
+    except OSError as e:
+        print(f"simplytoast: {e.filename or 'baseline'}: {e.strerror or e}", file=sys.stderr)
+        return 1
+    except BaselineError as e:
+        print(f"simplytoast: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="simplytoast", description="SimplyToast headless mode")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("list-autostart", help="effective autostart entries with impact")
+    p.add_argument("--format", choices=("json", "ndjson"), default="json")
+    p.add_argument("--filter", default="")
+    p.add_argument("--no-impact", dest="impact", action="store_false",
+                   help="skip the process scan used for Impact %%")
+    p.set_defaults(func=cmd_list_autostart)
+
+    for name, func, fmt in (("top", cmd_top, "json"), ("watch", cmd_watch, "ndjson")):
+        p = sub.add_parser(name, help="process sample" if name == "top" else "stream process samples")
+        p.add_argument("--format", choices=("json", "ndjson"), default=fmt)
+        p.add_argument("--filter", default="")
+        p.add_argument("-n", "--limit", type=int, default=0)
+        p.add_argument("--scope", choices=SCOPES, default=SCOPE_USER,
+                       help="my processes, all users' or system services' (default %(default)s)")
+        if name == "watch":
+            p.add_argument("--interval", type=float, default=3.0)
+            p.add_argument("--count", type=int, default=0)
+            p.add_argument("--no-collector", dest="collector", action="store_false",
+                           help="always sample in-process, even if a collector is running")
+            p.add_argument("--events", action="store_true",
+                           help="add started/exited processes since the previous line")
+        p.set_defaults(func=func)
+
+    p = sub.add_parser("collector", help="run the sampling daemon on a Unix socket")
+    p.add_argument("--socket", default=str(COLLECTOR_SOCKET))
+    p.add_argument("--idle-exit", type=float, default=0,
+                   help="exit after this many seconds without clients (0: never)")
+    p.set_defaults(func=cmd_collector)
+
+    p = sub.add_parser("exporter", help="serve OpenMetrics/Prometheus /metrics")
+    p.add_argument("--listen", default=None, help="HOST:PORT (default 127.0.0.1:9177)")
+    p.add_argument("--socket", default=None, help="serve on this Unix socket instead")
+    p.add_argument("--interval", type=float, default=None, help="seconds between samples (default 15)")
+    p.add_argument("--top", type=int, default=None, help="apps/entries with their own label (default 20)")
+    p.set_defaults(func=cmd_exporter)
+
+    p = sub.add_parser("thaw", help="resume every process frozen by focus mode")
+    p.add_argument("--file", default=str(FROZEN_FILE), help=argparse.SUPPRESS)
+    p.add_argument("--wait-fd", type=int, default=None, help=argparse.SUPPRESS)
+    p.add_argument("--owner", type=int, default=None, help=argparse.SUPPRESS)
+    p.set_defaults(func=cmd_thaw)
+
+    p = sub.add_parser("record", help="record process samples to a trace file")
+    p.add_argument("file")
+    p.add_argument("--interval", type=float, default=3.0)
+    p.add_argument("--count", type=int, default=0)
+    p.add_argument("--scope", choices=SCOPES, default=SCOPE_USER)
+    p.set_defaults(func=cmd_record)
+
+    p = sub.add_parser("replay", help="print a recorded trace like watch does")
+    p.add_argument("file")
+    p.add_argument("--format", choices=("json", "ndjson"), default="ndjson")
+    p.add_argument("--filter", default="")
+    p.add_argument("-n", "--limit", type=int, default=0)
+    p.add_argument("--events", action="store_true",
+                   help="add started/exited processes since the previous line")
+    p.add_argument("--speed", type=float, default=0,
+                   help="play back at this multiple of real time (0: as fast as possible)")
+    p.set_defaults(func=cmd_replay)
+
+    p = sub.add_parser("baseline", help="capture, list or compare per-app baselines")
+    p.add_argument("action", choices=("capture", "list", "diff"))
+    p.add_argument("names", nargs="*", metavar="NAME")
+    p.add_argument("--window", type=float, default=None, help="capture length in seconds (default 300)")
+    p.add_argument("--interval", type=float, default=3.0)
+    p.add_argument("-n", "--limit", type=int, default=20, help="apps shown by diff")
+    p.set_defaults(func=cmd_baseline)
+    return parser
+
+
+def run(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # Reader went away (e.g. `| head`); silence the flush-at-exit error too.
+        try:
+            sys.stdout = open("/dev/null", "w")
+        except OSError:
+            pass
+        return 0
@@ -0,0 +1,413 @@
+import errno
+import os
+import platform
+from collections import namedtuple
+
+from .sampler import parse_stat, read_file
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+CPU_PERIOD_US = 100000
+
+# ---------- I/O priority ----------
+# No Python wrapper exists for ioprio_get/ioprio_set, so they go through
+# syscall(2). (ioprio_set, ioprio_get) per architecture (asm/unistd.h).
+IOPRIO_SYSCALLS = {
+    "x86_64": (251, 252),
+    "i386": (289, 290),
+    "i686": (289, 290),
+    "aarch64": (30, 31),
+    "riscv64": (30, 31),
+    "armv7l": (314, 315),
+    "ppc64le": (273, 274),
+    "s390x": (282, 283),
+}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_CLASSES = {"none": 0, "realtime": 1, "best-effort": 2, "idle": 3}
+IOPRIO_NAMES = {v: k for k, v in IOPRIO_CLASSES.items()}
+
+_syscall = None
+
+
+def _ioprio_syscall(which):
+    global _syscall
+    numbers = IOPRIO_SYSCALLS.get(platform.machine())
+    if numbers is None:
+        raise OSError(errno.ENOSYS, "ioprio syscalls unknown on this architecture")
+    if _syscall is None:
+        import ctypes
+        _syscall = ctypes.CDLL(None, use_errno=True).syscall
+    return _syscall, numbers[which]
+
+
+def get_ionice(pid):
+    # (class name, level 0-7).
+    syscall, number = _ioprio_syscall(1)
+    value = syscall(number, IOPRIO_WHO_PROCESS, pid)
+    if value < 0:
+        import ctypes
+        e = ctypes.get_errno()
+        raise OSError(e, os.strerror(e))
+    return IOPRIO_NAMES.get(value >> IOPRIO_CLASS_SHIFT, "none"), value & 0xff
+
+
+def set_ionice(pid, cls, level=4):
+    syscall, number = _ioprio_syscall(0)
+    value = (IOPRIO_CLASSES[cls] << IOPRIO_CLASS_SHIFT) | (level if cls in ("realtime", "best-effort") else 0)
+    if syscall(number, IOPRIO_WHO_PROCESS, pid, value) < 0:
+        import ctypes
+        e = ctypes.get_errno()
+        raise OSError(e, os.strerror(e))
+
+
+# ---------- Nice / affinity ----------
+def get_nice(pid):
+    return os.getpriority(os.PRIO_PROCESS, pid)
+
+
+def set_nice(pid, value):
+    # Without CAP_SYS_NICE (or RLIMIT_NICE) a process can only be made nicer.
+    os.setpriority(os.PRIO_PROCESS, pid, value)
+
+
+CAP_SYS_NICE = 23
+
+
+def has_cap_sys_nice(proc_root="/proc"):
+    try:
+        with open(f"{proc_root}/self/status", "r") as f:
+            for line in f:
+                if line.startswith("CapEff:"):
+                    return bool(int(line.split()[1], 16) >> CAP_SYS_NICE & 1)
+    except (OSError, ValueError, IndexError):
+        pass
+    return os.geteuid() == 0
+
+
+def nice_floor(pid, proc_root="/proc"):
+    # Lowest nice value we may give pid: -20 with CAP_SYS_NICE, otherwise
+    # 20 - its RLIMIT_NICE (0, the usual limit, allows nothing below 20).
+    if has_cap_sys_nice(proc_root):
+        return -20
+    import resource
+
+    try:
+        limit = resource.prlimit(pid, resource.RLIMIT_NICE)[0]
+    except (OSError, ValueError):
+        limit = 0
+    if limit == resource.RLIM_INFINITY:
+        return -20
+    return max(20 - limit, -20)
+
+
+def task_ids(pid, proc_root="/proc"):
+    try:
+        return [int(t) for t in os.listdir(f"{proc_root}/{pid}/task")]
+    except OSError:
+        return [pid]
+
+
+def get_affinity(pid):
+    return sorted(os.sched_getaffinity(pid))
+
+
+def set_affinity(pid, cpus, proc_root="/proc"):
+    # sched_setaffinity is per thread; apply it to every thread of the process.
+    for tid in task_ids(pid, proc_root):
+        try:
+            os.sched_setaffinity(tid, cpus)
+        except ProcessLookupError:
+            continue
+
+
+# ---------- cgroup v2 ----------
+def process_cgroup(pid, proc_root="/proc", cgroup_root=CGROUP_ROOT):
+    # The unified-hierarchy cgroup directory of a process, or None on v1-only
+    # systems and for processes we cannot inspect.
+    try:
+        with open(f"{proc_root}/{pid}/cgroup", "r") as f:
+            for line in f:
+                if line.startswith("0::"):
+                    path = line[3:].strip()
+                    return os.path.normpath(os.path.join(cgroup_root, path.lstrip("/"))) if path else None
+    except OSError:
+        pass
+    return None
+
+
+def cgroup_app_id(path):
+    # Desktop app id from a systemd unit name, e.g.
+    # app-gnome-org.gnome.Nautilus-1234.scope or app-gnome-org.gnome.Nautilus@ab12.service
+    # -> org.gnome.Nautilus.
+    unit = os.path.basename(path or "")
+    if not unit.startswith("app-"):
+        return ""
+    unit = unit.rsplit(".", 1)[0].split("@", 1)[0]
+    parts = unit.split("-")[1:]
+    if len(parts) > 1 and parts[0] in ("gnome", "kde", "flatpak", "snap", "dbus"):
+        parts = parts[1:]
+    if len(parts) > 1 and parts[-1].isdigit():
+        parts = parts[:-1]
+    return "-".join(parts).replace("\\x2d", "-")
+
+
+def read_cgroup_file(path, name):
+    try:
+        with open(os.path.join(path, name), "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def enable_controllers(path, controllers):
+    # Controllers show up in a cgroup only if its parent delegates them; try
+    # turning them on in the parent (we own it inside user@UID.service).
+    parent = os.path.dirname(path)
+    available = (read_cgroup_file(parent, "cgroup.controllers") or "").split()
+    enabled = (read_cgroup_file(parent, "cgroup.subtree_control") or "").split()
+    wanted = [c for c in controllers if c in available and c not in enabled]
+    if wanted:
+        with open(os.path.join(parent, "cgroup.subtree_control"), "w") as f:
+            f.write(" ".join("+" + c for c in wanted))
+
+
+def write_cgroup_file(path, name, value, controller):
+    target = os.path.join(path, name)
+    if not os.path.exists(target):
+        enable_controllers(path, (controller,))
+    if not os.path.exists(target):
+        raise OSError(errno.ENOTSUP, f"{controller} controller not delegated to {path}")
+    with open(target, "w") as f:
+        f.write(value)
+
+
+def cpu_max_value(percent):
+    # percent of one CPU; None removes the limit.
+    if percent is None:
+        return f"max {CPU_PERIOD_US}"
+    return f"{max(int(CPU_PERIOD_US * percent / 100), 1000)} {CPU_PERIOD_US}"
+
+
+def format_bytes(value):
+    for unit, size in (("G", 1 << 30), ("M", 1 << 20), ("K", 1 << 10)):
+        if value >= size and value % size == 0:
+            return f"{value // size}{unit}"
+    return str(value)
+
+
+# ---------- Throttles ----------
+class Throttle(namedtuple("Throttle", ("kind", "target", "label", "original", "value"))):
+    # kind: nice / ionice / affinity (target is (pid, starttime)) or cpu.max /
+    # memory.high (target is a cgroup dir). original is what revert() restores;
+    # None for a nice change we are not allowed to undo.
+    __slots__ = ()
+
+    @property
+    def revertible(self):
+        return self.original is not None
+
+    def describe(self):
+        if self.kind == "nice":
+            return f"nice {self.value}"
+        if self.kind == "ionice":
+            return f"io {self.value[0]}" + (f" {self.value[1]}" if self.value[0] != "idle" else "")
+        if self.kind == "affinity":
+            return "cpus " + ",".join(str(c) for c in self.value)
+        if self.kind == "cpu.max":
+            quota, period = self.value.split()
+            return f"cpu {int(quota) * 100 // int(period)}%"
+        return f"mem {self.value}"
+
+
+class ThrottleSet:
+    # Applies controls to ProcessSamples and remembers the previous value of
+    # everything it changed, so each throttle can be listed and reverted.
+    # Methods return [(label, OSError), ...] like AutostartBatch.commit().
+
+    def __init__(self, proc_root="/proc", cgroup_root=CGROUP_ROOT):
+        self.proc_root = proc_root
+        self.cgroup_root = cgroup_root
+        self.active = {}
+        self.cgroup_cache = {}
+
+    def _record(self, kind, target, label, original, value):
+        key = (kind, target)
+        previous = self.active.get(key)
+        if previous is not None:
+            original = previous.original
+        self.active[key] = Throttle(kind, target, label, original, value)
+
+    def nice_revertible(self, processes, value):
+        # Whether renice(processes, value) could be undone: raising nice is
+        # one-way without CAP_SYS_NICE or a matching RLIMIT_NICE.
+        for p in processes:
+            try:
+                original = get_nice(p.pid)
+            except OSError:
+                continue
+            if original < value and original < nice_floor(p.pid, self.proc_root):
+                return False
+        return True
+
+    def renice(self, processes, value):
+        errors = []
+        for p in processes:
+            label = f"{p.comm} ({p.pid})"
+            try:
+                original = get_nice(p.pid)
+                set_nice(p.pid, value)
+            except OSError as e:
+                errors.append((label, e))
+                continue
+            if original < value and original < nice_floor(p.pid, self.proc_root):
+                original = None
+            self._record("nice", p.key, label, original, value)
+        return errors
+
+    def ionice(self, processes, cls, level=4):
+        errors = []
+        for p in processes:
+            label = f"{p.comm} ({p.pid})"
+            try:
+                original = get_ionice(p.pid)
+                set_ionice(p.pid, cls, level)
+            except OSError as e:
+                errors.append((label, e))
+                continue
+            self._record("ionice", p.key, label, original, (cls, level))
+        return errors
+
+    def pin(self, processes, cpus):
+        errors = []
+        cpus = sorted(cpus)
+        for p in processes:
+            label = f"{p.comm} ({p.pid})"
+            try:
+                original = get_affinity(p.pid)
+                set_affinity(p.pid, cpus, self.proc_root)
+            except OSError as e:
+                errors.append((label, e))
+                continue
+            self._record("affinity", p.key, label, original, cpus)
+        return errors
+
+    def cgroups(self, processes):
+        # {cgroup dir: [processes]}; a limit always covers the whole cgroup.
+        groups = {}
+        for p in processes:
+            path = process_cgroup(p.pid, self.proc_root, self.cgroup_root)
+            if path is not None:
+                groups.setdefault(path, []).append(p)
+        return groups
+
+    def foreign_members(self, path, pids):
+        # Processes in cgroup `path` that are neither one of pids nor
+        # descended from one, e.g. the shell of the terminal scope an app was
+        # started from.
+        members = read_cgroup_file(path, "cgroup.procs")
+        if members is None:
+            return []
+        pids = set(pids)
+        foreign = []
+        for member in members.split():
+            pid = int(member)
+            # Walk up the parents; 1 (or a loop past 64 levels) ends it.
+            for _ in range(64):
+                if pid in pids or pid <= 1:
+                    break
+                try:
+                    pid = parse_stat(read_file(f"{self.proc_root}/{pid}/stat"))[2]
+                except (OSError, ValueError, IndexError):
+                    break
+            if pid not in pids:
+                foreign.append(int(member))
+        return foreign
+
+    def _limit(self, processes, kind, controller, value):
+        # A cgroup limit covers the whole scope, so it is refused when the
+        # scope also holds processes outside the selected ones (a terminal or
+        # session scope). A scope already limited this way is updated anyway.
+        errors = []
+        for path, members in self.cgroups(processes).items():
+            label = os.path.basename(path)
+            if path == self.cgroup_root:
+                errors.append((label, OSError(errno.EPERM, "process is in the root cgroup")))
+                continue
+            if (kind, path) not in self.active:
+                foreign = self.foreign_members(path, [p.pid for p in members])
+                if foreign:
+                    errors.append((label, OSError(errno.EBUSY, f"{path} also holds {len(foreign)} other "
+                                                               f"process(es); not limiting the whole scope")))
+                    continue
+            try:
+                original = read_cgroup_file(path, kind) or (cpu_max_value(None) if kind == "cpu.max" else "max")
+                write_cgroup_file(path, kind, value, controller)
+            except OSError as e:
+                errors.append((label, e))
+                continue
+            self._record(kind, path, label, original, value)
+        return errors
+
+    def limit_cpu(self, processes, percent):
+        return self._limit(processes, "cpu.max", "cpu", cpu_max_value(percent))
+
+    def limit_memory(self, processes, limit_bytes):
+        return self._limit(processes, "memory.high", "memory", format_bytes(limit_bytes))
+
+    def revert(self, key):
+        # The throttle stays listed until its revert succeeds (or its process
+        # is gone), so a failed revert can be retried.
+        throttle = self.active.get(key)
+        if throttle is None:
+            return []
+        if not throttle.revertible:
+            return [(throttle.label, OSError(errno.EPERM, "lowering nice again needs CAP_SYS_NICE"))]
+        pid = throttle.target[0] if isinstance(throttle.target, tuple) else None
+        try:
+            if throttle.kind == "nice":
+                set_nice(pid, throttle.original)
+            elif throttle.kind == "ionice":
+                set_ionice(pid, *throttle.original)
+            elif throttle.kind == "affinity":
+                set_affinity(pid, throttle.original, self.proc_root)
+            elif throttle.kind == "cpu.max":
+                write_cgroup_file(throttle.target, "cpu.max", throttle.original, "cpu")
+            else:
+                write_cgroup_file(throttle.target, "memory.high", throttle.original, "memory")
+        except ProcessLookupError:
+            pass
+        except OSError as e:
+            return [(throttle.label, e)]
+        del self.active[key]
+        return []
+
+    def revert_all(self, keys=None):
+        # Skips the throttles that cannot be reverted.
+        errors = []
+        for key in list(self.active if keys is None else keys):
+            throttle = self.active.get(key)
+            if throttle is not None and throttle.revertible:
+                errors.extend(self.revert(key))
+        return errors
+
+    def for_process(self, p, cgroup=None):
+        # Active throttles that affect p: its own, plus limits on its cgroup.
+        found = [t for (kind, target), t in self.active.items() if target == p.key]
+        if cgroup is None and any(isinstance(k[1], str) for k in self.active):
+            cgroup = self.cgroup_cache.get(p.key)
+            if cgroup is None:
+                cgroup = self.cgroup_cache[p.key] = process_cgroup(p.pid, self.proc_root, self.cgroup_root)
+        if cgroup is not None:
+            found.extend(t for (kind, target), t in self.active.items() if target == cgroup)
+        return found
+
+    def prune(self, alive):
+        # Forget per-process throttles whose (pid, starttime) is gone, and
+        # cgroup limits whose scope has been removed (a later scope may reuse
+        # the path).
+        for key in [k for k in self.active if isinstance(k[1], tuple) and k[1] not in alive]:
+            del self.active[key]
+        for key in [k for k in self.active if isinstance(k[1], str) and not os.path.isdir(k[1])]:
+            del self.active[key]
+        for key in [k for k in self.cgroup_cache if k not in alive]:
+            del self.cgroup_cache[key]
@@ -0,0 +1,496 @@
+import os
+import selectors
+import signal
+import socket
+import time
+from collections import deque
+
+from .paths import COLLECTOR_SOCKET
+from .rules import RuleEngine, report
+from .sampler import Sampler
+from .snapshot import ProcessSample, Snapshot
+from .wire import WireError, frame, read_frames
+
+PROTOCOL_VERSION = 1
+MIN_INTERVAL = 0.25
+HISTORY_LEN = 1200
+MAX_OUTBUF = 8 * 1024 * 1024
+RECV_SIZE = 65536
+
+
+class CollectorRunning(RuntimeError):
+    pass
+
+
+# ---------- Protocol ----------
+# Every message is one framed map (see wire.py). The server greets with
+#   {"type": "hello", "version", "pid", "fields"}
+# and then answers client ops:
+#   {"op": "subscribe", "interval": seconds}  -> snapshot, then a diff every interval
+#   {"op": "unsubscribe"}
+#   {"op": "snapshot"}                        -> one full snapshot
+#   {"op": "history"}                         -> {"type": "history", "items": [...]}
+#   {"op": "ping"}                            -> {"type": "pong"}
+# Process rows are lists in ProcessSample field order. A diff carries the
+# rows that changed since what *that* client last received, plus the
+# [pid, starttime] keys that went away.
+
+def _header(kind, seq, snapshot):
+    return {
+        "type": kind,
+        "seq": seq,
+        "time": snapshot.time,
+        "interval": snapshot.interval,
+        "mem_total": snapshot.mem_total,
+    }
+
+
+class _Client:
+    __slots__ = ("sock", "inbuf", "outbuf", "interval", "due", "sent")
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbuf = bytearray()
+        self.outbuf = bytearray()
+        self.interval = None
+        self.due = 0.0
+        self.sent = None
+
+
+# ---------- Server ----------
+class Collector:
+    # Single-threaded sampler daemon on a Unix socket. /proc is only walked
+    # while someone is subscribed, at the fastest interval any subscriber asked
+    # for; each subscriber gets diffs at its own rate, computed against the
+    # rows it was last sent, so a slow window and a fast CLI can share one
+    # sampler. A client whose unsent output exceeds MAX_OUTBUF is dropped.
+
+    def __init__(self, path=COLLECTOR_SOCKET, sampler=None, idle_exit=0):
+        self.path = str(path)
+        self.sampler = sampler or Sampler()
+        self.rules = RuleEngine(proc_root=self.sampler.proc_root)
+        self.idle_exit = idle_exit
+        self.history = deque(maxlen=HISTORY_LEN)
+        self.snapshot = None
+        self.seq = 0
+        self.clients = {}
+        self.listener = None
+        self.selector = None
+        self.running = False
+        # Self-pipe so a signal handler can wake select() up.
+        self.wakeup_r, self.wakeup_w = socket.socketpair()
+        self.wakeup_r.setblocking(False)
+        self.wakeup_w.setblocking(False)
+
+    # Socket setup
+    def bind(self):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise CollectorRunning(f"collector already listening on {self.path}")
+            finally:
+                probe.close()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            sock.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        sock.listen(16)
+        sock.setblocking(False)
+        self.listener = sock
+
+    def close(self):
+        for client in list(self.clients.values()):
+            self.drop(client)
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        if self.selector is not None:
+            self.selector.close()
+            self.selector = None
+        self.wakeup_r.close()
+        self.wakeup_w.close()
+
+    def stop(self, *args):
+        self.running = False
+        try:
+            self.wakeup_w.send(b"\0")
+        except OSError:
+            pass
+
+    # Sampling
+    def sample(self):
+        snapshot = self.sampler.sample()
+        report(self.rules.apply(self.sampler.started))
+        self.snapshot = snapshot
+        self.seq += 1
+        self.history.append((
+            snapshot.time,
+            len(snapshot.processes),
+            round(sum(p.cpu for p in snapshot.processes), 1),
+            sum(p.rss for p in snapshot.processes),
+        ))
+        return snapshot
+
+    def fresh_snapshot(self, max_age):
+        if self.snapshot is None or time.time() - self.snapshot.time >= max_age:
+            self.sample()
+        return self.snapshot
+
+    # Messages
+    def send(self, client, message):
+        client.outbuf += frame(message)
+        if len(client.outbuf) > MAX_OUTBUF:
+            self.drop(client)
+            return
+        self.flush(client)
+
+    def send_snapshot(self, client):
+        snapshot = self.snapshot
+        message = _header("snapshot", self.seq, snapshot)
+        message["processes"] = [list(p) for p in snapshot.processes]
+        if client.interval:
+            client.sent = {p.key: p for p in snapshot.processes}
+        self.send(client, message)
+
+    def send_diff(self, client):
+        snapshot = self.snapshot
+        sent = client.sent
+        current = {}
+        upsert = []
+        for p in snapshot.processes:
+            key = p.key
+            current[key] = p
+            if sent.get(key) != p:
+                upsert.append(list(p))
+        remove = [list(key) for key in sent if key not in current]
+        client.sent = current
+        message = _header("diff", self.seq, snapshot)
+        message["upsert"] = upsert
+        message["remove"] = remove
+        self.send(client, message)
+
+    def handle(self, client, message):
+        op = message.get("op") if isinstance(message, dict) else None
+        if op == "subscribe":
+            try:
+                interval = max(float(message.get("interval", 3.0)), MIN_INTERVAL)
+            except (TypeError, ValueError):
+                interval = 3.0
+            client.interval = interval
+            client.due = time.monotonic() + interval
+            self.fresh_snapshot(interval)
+            self.send_snapshot(client)
+        elif op == "unsubscribe":
+            client.interval = None
+            client.sent = None
+        elif op == "snapshot":
+            self.fresh_snapshot(MIN_INTERVAL)
+            self.send_snapshot(client)
+        elif op == "history":
+            self.send(client, {"type": "history", "items": [list(h) for h in self.history]})
+        elif op == "ping":
+            self.send(client, {"type": "pong", "seq": self.seq})
+        else:
+            self.send(client, {"type": "error", "message": f"unknown op {op!r}"})
+
+    # Connection handling
+    def accept(self):
+        try:
+            sock, _ = self.listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        sock.setblocking(False)
+        client = _Client(sock)
+        self.clients[sock.fileno()] = client
+        self.selector.register(sock, selectors.EVENT_READ, client)
+        self.send(client, {
+            "type": "hello",
+            "version": PROTOCOL_VERSION,
+            "pid": os.getpid(),
+            "fields": list(ProcessSample._fields),
+        })
+
+    def drop(self, client):
+        fd = client.sock.fileno()
+        if self.clients.pop(fd, None) is None:
+            return
+        try:
+            self.selector.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        client.sock.close()
+
+    def flush(self, client):
+        if client.outbuf:
+            try:
+                n = client.sock.send(client.outbuf)
+            except (BlockingIOError, InterruptedError):
+                n = 0
+            except OSError:
+                self.drop(client)
+                return
+            del client.outbuf[:n]
+        if client.sock.fileno() in self.clients:
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.outbuf else 0)
+            self.selector.modify(client.sock, events, client)
+
+    def receive(self, client):
+        try:
+            data = client.sock.recv(RECV_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.drop(client)
+            return
+        client.inbuf += data
+        try:
+            messages = read_frames(client.inbuf)
+        except WireError:
+            self.drop(client)
+            return
+        for message in messages:
+            if client.sock.fileno() not in self.clients:
+                return
+            self.handle(client, message)
+
+    def tick(self):
+        now = time.monotonic()
+        due = [c for c in self.clients.values() if c.interval and c.due <= now]
+        if not due:
+            return
+        self.sample()
+        for client in due:
+            # Stay on each client's grid; skip missed ticks rather than bursting.
+            client.due += client.interval
+            if client.due <= now:
+                client.due = now + client.interval
+            if client.sent is None:
+                self.send_snapshot(client)
+            else:
+                self.send_diff(client)
+
+    def next_timeout(self, idle_since):
+        dues = [c.due for c in self.clients.values() if c.interval]
+        if dues:
+            return max(min(dues) - time.monotonic(), 0.0)
+        if self.idle_exit and not self.clients:
+            return max(idle_since + self.idle_exit - time.monotonic(), 0.0)
+        return None
+
+    def serve_forever(self):
+        if self.listener is None:
+            self.bind()
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listener, selectors.EVENT_READ, None)
+        self.selector.register(self.wakeup_r, selectors.EVENT_READ, self.wakeup_r)
+        self.running = True
+        idle_since = time.monotonic()
+        try:
+            while self.running:
+                for key, events in self.selector.select(self.next_timeout(idle_since)):
+                    client = key.data
+                    if client is None:
+                        self.accept()
+                        continue
+                    if client is self.wakeup_r:
+                        try:
+                            self.wakeup_r.recv(64)
+                        except OSError:
+                            pass
+                        continue
+                    if events & selectors.EVENT_WRITE:
+                        self.flush(client)
+                    if events & selectors.EVENT_READ and client.sock.fileno() in self.clients:
+                        self.receive(client)
+                self.tick()
+                if self.clients:
+                    idle_since = time.monotonic()
+                elif self.idle_exit and time.monotonic() - idle_since >= self.idle_exit:
+                    break
+        finally:
+            self.close()
+
+
+def run_collector(path=COLLECTOR_SOCKET, idle_exit=0):
+    collector = Collector(path, idle_exit=idle_exit)
+    collector.bind()
+    signal.signal(signal.SIGTERM, collector.stop)
+    signal.signal(signal.SIGINT, collector.stop)
+    collector.serve_forever()
+    return 0
+
+
+# ---------- Client ----------
+class CollectorClient:
+    # Keeps a local mirror of the daemon's process table and rebuilds a
+    # Snapshot from each snapshot/diff message. Non-blocking after connect(),
+    # so fileno() can be handed to a main loop (GLib.io_add_watch, select).
+
+    def __init__(self, path=COLLECTOR_SOCKET):
+        self.path = str(path)
+        self.sock = None
+        self.inbuf = bytearray()
+        self.processes = {}
+        self.seq = 0
+        self.latest = None
+        self.history = None
+        self.server_pid = None
+        # Processes added / removed by the messages of the last read/wait call.
+        self.started = []
+        self.exited = []
+
+    def connect(self, timeout=0.5):
+        # True if a compatible daemon answered; never raises for "not running".
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(self.path)
+            self.sock = sock
+            hello = self.wait_for("hello", timeout)
+        except (OSError, WireError):
+            sock.close()
+            self.sock = None
+            return False
+        if (hello is None or hello.get("version") != PROTOCOL_VERSION
+                or hello.get("fields") != list(ProcessSample._fields)):
+            self.close()
+            return False
+        self.server_pid = hello.get("pid")
+        sock.setblocking(False)
+        return True
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def request(self, message):
+        self.sock.setblocking(True)
+        try:
+            self.sock.sendall(frame(message))
+        finally:
+            self.sock.setblocking(False)
+
+    def subscribe(self, interval):
+        self.request({"op": "subscribe", "interval": float(interval)})
+
+    def request_snapshot(self):
+        self.request({"op": "snapshot"})
+
+    def apply(self, message):
+        kind = message.get("type")
+        if kind == "snapshot":
+            old = self.processes
+            self.processes = {(row[0], row[1]): ProcessSample(*row) for row in message["processes"]}
+            if old:
+                # A resync; the first snapshot after connecting is no event.
+                self.started.extend(p for key, p in self.processes.items() if key not in old)
+                self.exited.extend(p for key, p in old.items() if key not in self.processes)
+        elif kind == "diff":
+            processes = self.processes
+            for pid, starttime in message["remove"]:
+                gone = processes.pop((pid, starttime), None)
+                if gone is not None:
+                    self.exited.append(gone)
+            for row in message["upsert"]:
+                key = (row[0], row[1])
+                new = key not in processes
+                proc = processes[key] = ProcessSample(*row)
+                if new:
+                    self.started.append(proc)
+        elif kind == "history":
+            self.history = message["items"]
+            return None
+        else:
+            return None
+        self.seq = message["seq"]
+        ordered = sorted(self.processes.values(), key=lambda p: (-p.cpu, -p.mem))
+        self.latest = Snapshot(message["time"], message["interval"], tuple(ordered), message["mem_total"])
+        return self.latest
+
+    def read(self):
+        # Drain whatever is available; returns the newest Snapshot or None.
+        # Raises ConnectionError once the daemon has gone away.
+        snapshot = None
+        self.started = []
+        self.exited = []
+        while True:
+            try:
+                data = self.sock.recv(RECV_SIZE)
+            except (BlockingIOError, InterruptedError):
+                break
+            if not data:
+                raise ConnectionError("collector closed the connection")
+            self.inbuf += data
+        for message in read_frames(self.inbuf):
+            if isinstance(message, dict):
+                snapshot = self.apply(message) or snapshot
+        return snapshot
+
+    def recv_blocking(self, deadline):
+        # One blocking recv bounded by deadline; False on timeout.
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            return False
+        self.sock.settimeout(remaining)
+        try:
+            data = self.sock.recv(RECV_SIZE)
+        except socket.timeout:
+            return False
+        finally:
+            self.sock.setblocking(False)
+        if not data:
+            raise ConnectionError("collector closed the connection")
+        self.inbuf += data
+        return True
+
+    def wait_for(self, kind, timeout=None):
+        # Blocking read until a message of the given type arrives; anything
+        # received alongside it is still applied.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.started = []
+        self.exited = []
+        while True:
+            found = None
+            for message in read_frames(self.inbuf):
+                if not isinstance(message, dict):
+                    continue
+                self.apply(message)
+                if found is None and message.get("type") == kind:
+                    found = message
+            if found is not None:
+                return found
+            if not self.recv_blocking(deadline):
+                return None
+
+    def wait(self, timeout=None):
+        # Blocking read of the next snapshot or diff; returns the new Snapshot.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.started = []
+        self.exited = []
+        while True:
+            snapshot = None
+            for message in read_frames(self.inbuf):
+                if isinstance(message, dict):
+                    snapshot = self.apply(message) or snapshot
+            if snapshot is not None:
+                return snapshot
+            if not self.recv_blocking(deadline):
+                return None
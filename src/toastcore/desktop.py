@@ -0,0 +1,215 @@
+import os
+
+# ---------- Desktop entry record ----------
+# Persisted field order (see DesktopIndex); path/id/source are not part of it.
+FIELDS = (
+    "type", "name", "comment", "icon", "exec", "try_exec", "hidden",
+    "autostart_enabled", "only_show_in", "not_show_in", "terminal",
+)
+
+KEYS = {
+    "Type": "type",
+    "Name": "name",
+    "Comment": "comment",
+    "Icon": "icon",
+    "Exec": "exec",
+    "TryExec": "try_exec",
+    "Hidden": "hidden",
+    "X-GNOME-Autostart-enabled": "autostart_enabled",
+    "OnlyShowIn": "only_show_in",
+    "NotShowIn": "not_show_in",
+    "Terminal": "terminal",
+}
+LOCALIZED = ("Name", "Comment")
+ESCAPES = {"s": " ", "n": "\n", "t": "\t", "r": "\r", "\\": "\\", ";": ";"}
+
+
+class DesktopEntry:
+    __slots__ = ("id", "path", "source", "overrides") + FIELDS
+
+    def __init__(self, path, source=None, values=None):
+        path = str(path)
+        self.path = path
+        self.id = os.path.basename(path)
+        self.source = source
+        self.overrides = None
+        if values is None:
+            values = ("Application", self.id[:-8] if self.id.endswith(".desktop") else self.id,
+                      "", "", "", "", False, True, (), (), False)
+        (self.type, self.name, self.comment, self.icon, self.exec, self.try_exec,
+         self.hidden, self.autostart_enabled, only, not_in, self.terminal) = values
+        self.only_show_in = tuple(only)
+        self.not_show_in = tuple(not_in)
+
+    def values(self):
+        return [getattr(self, field) for field in FIELDS]
+
+    @property
+    def enabled(self):
+        return not self.hidden and self.autostart_enabled
+
+    def inactive_reason(self, desktops=None, which_cache=None):
+        # Why this entry would not be launched at login even if enabled ("" if it would).
+        if self.type != "Application":
+            return f"Type={self.type}"
+        if desktops is None:
+            desktops = current_desktops()
+        if self.only_show_in and not any(d in self.only_show_in for d in desktops):
+            return "OnlyShowIn=" + ";".join(self.only_show_in)
+        if self.not_show_in and any(d in self.not_show_in for d in desktops):
+            return "NotShowIn=" + ";".join(self.not_show_in)
+        if self.try_exec and not try_exec_available(self.try_exec, which_cache):
+            return f"TryExec={self.try_exec} not found"
+        return ""
+
+
+# ---------- Parsing ----------
+def locale_keys(value=None):
+    # Locale match order from the Desktop Entry spec: lang_COUNTRY@MODIFIER,
+    # lang_COUNTRY, lang@MODIFIER, lang.
+    if value is None:
+        value = os.environ.get("LC_ALL") or os.environ.get("LC_MESSAGES") or os.environ.get("LANG") or ""
+    if value in ("", "C", "POSIX") or value.startswith("C."):
+        return ()
+    lang, _, modifier = value.partition("@")
+    lang = lang.split(".", 1)[0]
+    lang, _, country = lang.partition("_")
+    keys = []
+    if country and modifier:
+        keys.append(f"{lang}_{country}@{modifier}")
+    if country:
+        keys.append(f"{lang}_{country}")
+    if modifier:
+        keys.append(f"{lang}@{modifier}")
+    keys.append(lang)
+    return tuple(keys)
+
+
+LOCALES = locale_keys()
+
+
+def current_desktops():
+    return tuple(d for d in (os.environ.get("XDG_CURRENT_DESKTOP") or "").split(":") if d)
+
+
+def try_exec_available(program, cache=None):
+    if cache is not None and program in cache:
+        return cache[program]
+    if os.path.isabs(program):
+        found = os.access(program, os.X_OK)
+    else:
+        import shutil
+        found = shutil.which(program) is not None
+    if cache is not None:
+        cache[program] = found
+    return found
+
+
+def _unescape(value):
+    if "\\" not in value:
+        return value
+    out = []
+    i = 0
+    n = len(value)
+    while i < n:
+        c = value[i]
+        if c == "\\" and i + 1 < n:
+            out.append(ESCAPES.get(value[i + 1], "\\" + value[i + 1]))
+            i += 2
+        else:
+            out.append(c)
+            i += 1
+    return "".join(out)
+
+
+def _bool(value, default):
+    value = value.lower()
+    if value in ("true", "1"):
+        return True
+    if value in ("false", "0"):
+        return False
+    return default
+
+
+def _list(value):
+    return tuple(part for part in value.split(";") if part)
+
+
+def parse_desktop_file(filepath, locales=None, source=None):
+    # Single pass over the [Desktop Entry] group only; other groups (actions,
+    # vendor extensions) are never tokenised and parsing stops at the next one.
+    if locales is None:
+        locales = LOCALES
+    entry = DesktopEntry(filepath, source)
+    try:
+        with open(filepath, "rb") as f:
+            text = f.read().decode("utf-8", "replace")
+    except OSError:
+        return entry
+
+    raw = {}
+    localized = {}
+    in_entry = False
+    for line in text.split("\n"):
+        if not line or line[0] == "#":
+            continue
+        if line[0] == "[":
+            if in_entry:
+                break
+            in_entry = line.rstrip() == "[Desktop Entry]"
+            continue
+        if not in_entry:
+            continue
+        key, sep, value = line.partition("=")
+        if not sep:
+            continue
+        key = key.rstrip()
+        bracket = key.find("[")
+        if bracket != -1:
+            base = key[:bracket]
+            if base not in LOCALIZED or not locales:
+                continue
+            try:
+                rank = locales.index(key[bracket + 1:-1])
+            except ValueError:
+                continue
+            prev = localized.get(base)
+            if prev is None or rank < prev[0]:
+                localized[base] = (rank, value.strip())
+        elif key in KEYS and key not in raw:
+            raw[key] = value.strip()
+
+    for base, (_, value) in localized.items():
+        raw[base] = value
+
+    for key, value in raw.items():
+        field = KEYS[key]
+        if field in ("hidden", "terminal"):
+            setattr(entry, field, _bool(value, False))
+        elif field == "autostart_enabled":
+            entry.autostart_enabled = _bool(value, True)
+        elif field in ("only_show_in", "not_show_in"):
+            setattr(entry, field, _list(value))
+        elif field == "name":
+            if value:
+                entry.name = _unescape(value)
+        else:
+            setattr(entry, field, _unescape(value))
+    return entry
+
+
+# ---------- XDG shadowing ----------
+def resolve_overrides(entries):
+    # entries must be in directory priority order (user first, then
+    # $XDG_CONFIG_DIRS). The first file with a given basename wins; later
+    # ones are recorded on the winner as .overrides and dropped.
+    effective = {}
+    result = []
+    for entry in entries:
+        winner = effective.get(entry.id)
+        if winner is None:
+            effective[entry.id] = entry
+            result.append(entry)
+        elif winner.overrides is None:
+            winner.overrides = entry.path
+    return result
@@ -0,0 +1,238 @@
+import os
+import threading
+import time
+
+from .control import process_cgroup
+from .sampler import parse_stat, read_file
+from .users import can_inspect
+
+DETAIL_TTL = 2.0
+DETAIL_CACHE_SIZE = 16
+MAX_FDS = 200
+MAX_THREADS = 100
+
+
+class Cancelled(Exception):
+    pass
+
+
+# ---------- Readers ----------
+# Each returns what it could read; a process we may not inspect (or one that
+# exits half way) yields partial details rather than an error.
+def read_fds(proc_root, pid):
+    # (count, [(fd, target), ...] capped at MAX_FDS)
+    try:
+        names = os.listdir(f"{proc_root}/{pid}/fd")
+    except OSError:
+        return None, []
+    fds = []
+    for name in sorted(names, key=int)[:MAX_FDS]:
+        try:
+            fds.append((int(name), os.readlink(f"{proc_root}/{pid}/fd/{name}")))
+        except OSError:
+            continue
+    return len(names), fds
+
+
+def read_maps_summary(proc_root, pid):
+    # {kind: (mappings, kB)} where kind is file / anon / heap / stack / other.
+    try:
+        data = read_file(f"{proc_root}/{pid}/maps", 65536)
+    except OSError:
+        return {}
+    summary = {}
+    for line in data.splitlines():
+        parts = line.split(None, 5)
+        if len(parts) < 5:
+            continue
+        start, _, end = parts[0].partition(b"-")
+        size = (int(end, 16) - int(start, 16)) // 1024
+        path = parts[5].strip() if len(parts) > 5 else b""
+        if path.startswith(b"/"):
+            kind = "file"
+        elif not path:
+            kind = "anon"
+        elif path == b"[heap]":
+            kind = "heap"
+        elif path.startswith(b"[stack"):
+            kind = "stack"
+        else:
+            kind = "other"
+        count, kb = summary.get(kind, (0, 0))
+        summary[kind] = (count + 1, kb + size)
+    return summary
+
+
+def read_threads(proc_root, pid):
+    # {tid: (comm, state, cpu seconds)}
+    hz = os.sysconf("SC_CLK_TCK")
+    threads = {}
+    try:
+        tids = sorted(int(t) for t in os.listdir(f"{proc_root}/{pid}/task"))
+    except OSError:
+        return threads
+    for tid in tids[:MAX_THREADS]:
+        try:
+            comm, state, _, ticks, _, _, _ = parse_stat(read_file(f"{proc_root}/{pid}/task/{tid}/stat"))
+        except (OSError, ValueError, IndexError):
+            continue
+        threads[tid] = (comm, state, ticks / hz)
+    return threads
+
+
+def read_environ(proc_root, pid):
+    try:
+        data = read_file(f"{proc_root}/{pid}/environ", 65536)
+    except OSError:
+        return None
+    return sorted(e.decode(errors="replace") for e in data.split(b"\0") if e)
+
+
+def read_parent_chain(proc_root, ppid):
+    # [(pid, comm), ...] from the parent ppid up to init.
+    chain = []
+    seen = set()
+    while ppid > 0 and ppid not in seen:
+        seen.add(ppid)
+        try:
+            comm, _, next_ppid, _, _, _, _ = parse_stat(read_file(f"{proc_root}/{ppid}/stat"))
+        except (OSError, ValueError, IndexError):
+            break
+        chain.append((ppid, comm))
+        ppid = next_ppid
+    return chain
+
+
+# ---------- Loader ----------
+class ProcessDetails:
+    __slots__ = ("key", "time", "fd_count", "fds", "maps", "threads", "thread_cpu", "environ", "cgroup", "parents")
+
+    def __init__(self, key):
+        self.key = key
+        self.time = time.monotonic()
+        self.fd_count = None
+        self.fds = []
+        self.maps = {}
+        self.threads = {}
+        self.thread_cpu = {}
+        self.environ = None
+        self.cgroup = None
+        self.parents = []
+
+
+class DetailLoader:
+    # Loads ProcessDetails for one (pid, starttime) at a time on a worker
+    # thread. Results are cached for DETAIL_TTL; a newer request() cancels
+    # the one in flight between reads. Per-thread CPU% is the delta against
+    # the previous load of the same process.
+
+    def __init__(self, proc_root="/proc"):
+        self.proc_root = proc_root
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.generation = 0
+
+    def cached(self, key):
+        with self.lock:
+            details = self.cache.get(key)
+        if details is not None and time.monotonic() - details.time < DETAIL_TTL:
+            return details
+        return None
+
+    def request(self, key, callback):
+        # callback(details) runs on the worker thread unless the request was
+        # superseded; returns the cached details instead when they are fresh.
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+        details = self.cached(key)
+        if details is not None:
+            return details
+        threading.Thread(target=self.worker, args=(key, generation, callback), daemon=True).start()
+        return None
+
+    def cancel(self):
+        with self.lock:
+            self.generation += 1
+
+    def worker(self, key, generation, callback):
+        try:
+            details = self.load(key, generation)
+        except Cancelled:
+            return
+        if details is not None:
+            callback(details)
+
+    def check(self, generation):
+        if generation != self.generation:
+            raise Cancelled()
+
+    def load(self, key, generation=None):
+        pid, starttime = key
+        root = self.proc_root
+        generation = self.generation if generation is None else generation
+        try:
+            stat = parse_stat(read_file(f"{root}/{pid}/stat"))
+            readable = can_inspect(os.stat(f"{root}/{pid}").st_uid)
+        except (OSError, ValueError, IndexError):
+            return None
+        if stat[5] != starttime:
+            return None
+        details = ProcessDetails(key)
+        details.parents = read_parent_chain(root, stat[2])
+        details.cgroup = process_cgroup(pid, root)
+        self.check(generation)
+        details.threads = read_threads(root, pid)
+        if readable:
+            # fd, maps and environ of another user's process are not ours
+            # to read; they show as "not readable" without trying.
+            self.check(generation)
+            details.fd_count, details.fds = read_fds(root, pid)
+            self.check(generation)
+            details.maps = read_maps_summary(root, pid)
+            self.check(generation)
+            details.environ = read_environ(root, pid)
+        with self.lock:
+            previous = self.cache.get(key)
+            if previous is not None:
+                elapsed = details.time - previous.time
+                if elapsed > 0:
+                    for tid, (_, _, cpu) in details.threads.items():
+                        if tid in previous.threads:
+                            details.thread_cpu[tid] = max(cpu - previous.threads[tid][2], 0.0) / elapsed * 100
+            self.cache[key] = details
+            if len(self.cache) > DETAIL_CACHE_SIZE:
+                del self.cache[min(self.cache, key=lambda k: self.cache[k].time)]
+        self.check(generation)
+        return details
+
+
+def format_details(details):
+    # Plain-text rendering for the detail pane.
+    lines = []
+    if details.parents:
+        lines.append("Parents: " + " ← ".join(f"{comm} ({pid})" for pid, comm in details.parents))
+    lines.append(f"cgroup: {details.cgroup or 'unknown'}")
+    lines.append("")
+    lines.append(f"Threads ({len(details.threads)}):")
+    for tid, (comm, state, cpu) in sorted(details.threads.items(),
+                                         key=lambda t: -details.thread_cpu.get(t[0], 0.0)):
+        pct = details.thread_cpu.get(tid)
+        lines.append(f"  {tid:>7}  {state}  {comm:<16} {cpu:9.1f}s" + (f"  {pct:5.1f}%" if pct is not None else ""))
+    lines.append("")
+    if details.fd_count is None:
+        lines.append("Open files: not readable")
+    else:
+        lines.append(f"Open files ({details.fd_count}):")
+        lines.extend(f"  {fd:>5}  {target}" for fd, target in details.fds)
+    lines.append("")
+    lines.append("Memory maps:" if details.maps else "Memory maps: not readable")
+    for kind, (count, kb) in sorted(details.maps.items(), key=lambda m: -m[1][1]):
+        lines.append(f"  {kind:<6} {count:>5} maps  {kb / 1024:10.1f} MB")
+    lines.append("")
+    if details.environ is None:
+        lines.append("Environment: not readable")
+    else:
+        lines.append(f"Environment ({len(details.environ)}):")
+        lines.extend(f"  {e}" for e in details.environ)
+    return "\n".join(lines)
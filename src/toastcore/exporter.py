@@ -0,0 +1,269 @@
+import os
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .autostart import AutostartRepository
+from .sampler import Sampler, read_io, read_pss
+from .users import can_inspect
+
+DEFAULT_LISTEN = "127.0.0.1:9177"
+DEFAULT_INTERVAL = 15.0
+DEFAULT_TOP = 20
+OTHER_APP = "[other]"
+# An app keeps its own label until it has been out of the top N this long.
+LABEL_HOLD = 600.0
+
+OPENMETRICS_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PROMETHEUS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (family, type, help). Counter samples get a _total suffix.
+APP_FAMILIES = (
+    ("simplytoast_app_cpu_seconds", "counter", "CPU time used by the app's processes."),
+    ("simplytoast_app_pss_bytes", "gauge", "Proportional set size of the app's processes."),
+    ("simplytoast_app_io_read_bytes", "counter", "Bytes the app's processes read from storage."),
+    ("simplytoast_app_io_write_bytes", "counter", "Bytes the app's processes wrote to storage."),
+    ("simplytoast_app_processes", "gauge", "Number of live processes of the app."),
+)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+# ---------- Aggregation ----------
+class MetricsExporter:
+    # collect() samples /proc and folds processes into per-app (comm) totals;
+    # render() turns the latest generation into exposition text. Rendered text
+    # is cached per (generation, format), and render() never samples, so any
+    # number of scrapers cost one render per collect().
+    #
+    # CPU seconds and I/O bytes are counters: each tick adds the per-(pid,
+    # starttime) delta to the app, so they keep growing as processes come and
+    # go. The first tick only sets the starting point. Apps in the top N by
+    # current CPU and PSS get their own label and keep it until they have
+    # been out of the top N for LABEL_HOLD seconds; deltas of every other app
+    # go to app="[other]", itself a counter. So an app moving in or out of
+    # the top N starts or ends its own series instead of moving its total
+    # between series, and no counter ever goes down.
+
+    def __init__(self, sampler=None, repo=None, top_n=DEFAULT_TOP):
+        self.sampler = sampler or Sampler()
+        self.repo = repo if repo is not None else AutostartRepository()
+        self.top_n = top_n
+        self.prev = {}
+        self.counters = {}
+        # comm -> monotonic time it was last in the top N.
+        self.labeled = {}
+        self.other = (0.0, 0, 0)
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.state = None
+        self.cache = {}
+
+    def collect(self):
+        started = time.monotonic()
+        snapshot = self.sampler.sample()
+        proc_root = self.sampler.proc_root
+        prev = self.prev
+        first = snapshot.interval <= 0
+        current = {}
+        apps = {}
+        euid = os.geteuid()
+        for p in snapshot.processes:
+            if can_inspect(p.uid, euid):
+                pss = read_pss(proc_root, p.pid)
+                io_read, io_write = read_io(proc_root, p.pid)
+            else:
+                pss, io_read, io_write = None, 0, 0
+            current[p.key] = (p.cpu_time, io_read, io_write)
+            last = current[p.key] if first else prev.get(p.key, (0.0, 0, 0))
+            app = apps.get(p.comm)
+            if app is None:
+                app = apps[p.comm] = [0.0, 0, 0, 0, 0.0, 0]
+            app[0] += max(p.cpu_time - last[0], 0.0)
+            app[1] += max(io_read - last[1], 0)
+            app[2] += max(io_write - last[2], 0)
+            app[3] += (p.rss if pss is None else pss) * 1024
+            app[4] += p.cpu
+            app[5] += 1
+        self.prev = current
+
+        now = time.monotonic()
+        labeled = self.labeled
+
+        def rank(comm):
+            app = apps.get(comm)
+            return (-app[4], -app[3]) if app else (0.0, 0)
+
+        for comm in sorted(apps, key=rank)[:self.top_n]:
+            labeled[comm] = now
+        for comm in [c for c, seen in labeled.items() if now - seen > LABEL_HOLD]:
+            del labeled[comm]
+            self.counters.pop(comm, None)
+
+        # A labeled app's counters start when it gets its label and last as
+        # long as it keeps it, live processes or not.
+        counters = self.counters
+        other = list(self.other)
+        other_gauges = [0, 0]
+        for comm, app in apps.items():
+            if comm in labeled:
+                total = counters.get(comm, (0.0, 0, 0))
+                counters[comm] = (total[0] + app[0], total[1] + app[1], total[2] + app[2])
+            else:
+                other = [other[0] + app[0], other[1] + app[1], other[2] + app[2]]
+                other_gauges = [other_gauges[0] + app[3], other_gauges[1] + app[5]]
+        self.other = tuple(other)
+        rows = []
+        for comm in sorted(labeled, key=rank):
+            cpu, io_read, io_write = counters.get(comm, (0.0, 0, 0))
+            app = apps.get(comm)
+            rows.append((comm, (cpu, app[3] if app else 0, io_read, io_write, app[5] if app else 0)))
+        if len(apps) > len(labeled) or any(self.other):
+            rows.append((OTHER_APP, (other[0], other_gauges[0], other[1], other[2], other_gauges[1])))
+
+        self.repo.refresh()
+        impact = self.repo.impact(snapshot.processes)
+        entries = sorted(self.repo, key=lambda e: -impact[e.id][0])[:self.top_n]
+        autostart = [(e.id, e.source, e.enabled, impact[e.id][1] / 100) for e in entries]
+
+        state = {
+            "time": snapshot.time,
+            "duration": time.monotonic() - started,
+            "apps": rows,
+            "app_count": len(apps),
+            "autostart": autostart,
+            "autostart_count": len(self.repo),
+        }
+        with self.lock:
+            self.generation += 1
+            self.state = state
+            self.cache = {}
+
+    def render(self, openmetrics=True):
+        with self.lock:
+            text = self.cache.get(openmetrics)
+            if text is None:
+                text = self.cache[openmetrics] = self.render_state(self.state, openmetrics).encode()
+            return text
+
+    def render_state(self, state, openmetrics):
+        out = []
+
+        def family(name, kind, help_text):
+            declared = name if openmetrics or kind != "counter" else name + "_total"
+            out.append(f"# HELP {declared} {help_text}\n")
+            out.append(f"# TYPE {declared} {kind}\n")
+            return name + "_total" if kind == "counter" else name
+
+        if state is not None:
+            for column, (name, kind, help_text) in enumerate(APP_FAMILIES):
+                sample = family(name, kind, help_text)
+                for app, row in state["apps"]:
+                    out.append(f"{sample}{{app=\"{_escape(app)}\"}} {_number(row[column])}\n")
+
+            sample = family("simplytoast_autostart_impact_ratio", "gauge",
+                            "Share of current CPU+MEM usage attributed to the autostart entry.")
+            for entry_id, source, _, ratio in state["autostart"]:
+                out.append(f"{sample}{{entry=\"{_escape(entry_id)}\",source=\"{source}\"}} {_number(ratio)}\n")
+            sample = family("simplytoast_autostart_enabled", "gauge", "Whether the autostart entry is enabled.")
+            for entry_id, source, enabled, _ in state["autostart"]:
+                out.append(f"{sample}{{entry=\"{_escape(entry_id)}\",source=\"{source}\"}} {int(enabled)}\n")
+
+            for name, help_text, value in (
+                ("simplytoast_apps", "Distinct apps seen in the last sample.", state["app_count"]),
+                ("simplytoast_autostart_entries", "Effective autostart entries.", state["autostart_count"]),
+                ("simplytoast_sample_timestamp_seconds", "Wall clock time of the last sample.", state["time"]),
+                ("simplytoast_sample_duration_seconds", "Time spent collecting the last sample.", state["duration"]),
+            ):
+                out.append(f"# HELP {name} {help_text}\n# TYPE {name} gauge\n{name} {_number(value)}\n")
+        if openmetrics:
+            out.append("# EOF\n")
+        return "".join(out)
+
+    def run(self, interval, stop):
+        # Fixed-grid collection until the stop Event is set.
+        next_tick = time.monotonic()
+        while True:
+            next_tick += interval
+            if stop.wait(max(next_tick - time.monotonic(), 0)):
+                return
+            try:
+                self.collect()
+            except OSError:
+                pass
+            if next_tick < time.monotonic():
+                next_tick = time.monotonic()
+
+
+# ---------- HTTP ----------
+class MetricsHandler(BaseHTTPRequestHandler):
+    server_version = "SimplyToast"
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+        body = self.server.exporter.render(openmetrics)
+        self.send_response(200)
+        self.send_header("Content-Type", OPENMETRICS_TYPE if openmetrics else PROMETHEUS_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class HTTPServer6(ThreadingHTTPServer):
+    address_family = socket.AF_INET6
+
+
+def make_server(exporter, listen=DEFAULT_LISTEN, socket_path=None):
+    if socket_path:
+        socket_path = str(socket_path)
+        try:
+            os.unlink(socket_path)
+        except FileNotFoundError:
+            pass
+        server = UnixHTTPServer(socket_path, MetricsHandler)
+    else:
+        host, _, port = listen.rpartition(":")
+        host = host.strip("[]") or "127.0.0.1"
+        server_class = HTTPServer6 if ":" in host else ThreadingHTTPServer
+        server = server_class((host, int(port)), MetricsHandler)
+    server.exporter = exporter
+    return server
+
+
+def serve_metrics(exporter, interval=DEFAULT_INTERVAL, listen=DEFAULT_LISTEN, socket_path=None):
+    # Collection runs on its own thread; scrapes only ever read the cache.
+    exporter.collect()
+    server = make_server(exporter, listen, socket_path)
+    stop = threading.Event()
+    collector = threading.Thread(target=exporter.run, args=(interval, stop), daemon=True)
+    collector.start()
+    try:
+        server.serve_forever()
+    finally:
+        stop.set()
+        server.server_close()
+        if socket_path:
+            try:
+                os.unlink(socket_path)
+            except OSError:
+                pass
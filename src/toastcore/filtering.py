@@ -0,0 +1,31 @@
+# ---------- Filtering ----------
+def toast_filter(data, text, columns):
+    text = (text or "").lower()
+    if not text:
+        return list(data)
+    result = []
+    for row in data:
+        for col in columns:
+            try:
+                if text in str(row[col]).lower():
+                    result.append(row)
+                    break
+            except Exception:
+                continue
+    return result
+
+
+def filter_processes(processes, text):
+    # Same match as the Background Apps search: pid, comm or command line.
+    text = (text or "").lower()
+    if not text:
+        return list(processes)
+    return [p for p in processes
+            if text in str(p.pid) or text in p.comm.lower() or text in p.args.lower()]
+
+
+def filter_entries(entries, text):
+    text = (text or "").lower()
+    if not text:
+        return list(entries)
+    return [e for e in entries if text in e.name.lower()]
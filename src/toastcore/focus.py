@@ -0,0 +1,286 @@
+import errno
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from .autostart import write_atomic
+from .control import CGROUP_ROOT, process_cgroup, read_cgroup_file
+from .paths import FROZEN_FILE
+from .sampler import parse_stat, read_file
+
+# Passes over /proc when stopping a tree by signal: each pass stops the
+# descendants that appeared since the last one, until a pass finds none.
+FREEZE_PASSES = 8
+
+
+# ---------- Process tree ----------
+def proc_table(proc_root="/proc"):
+    # {pid: (ppid, starttime)} for every process we can see.
+    table = {}
+    for name in os.listdir(proc_root):
+        if not name.isdigit():
+            continue
+        try:
+            stat = parse_stat(read_file(f"{proc_root}/{name}/stat"))
+        except (OSError, ValueError, IndexError):
+            continue
+        table[int(name)] = (stat[2], stat[5])
+    return table
+
+
+def subtree(roots, table, skip=()):
+    # pids of roots and all their descendants; roots are (pid, starttime) and
+    # only count if the pid still belongs to that process. pids in skip are
+    # left out together with their own descendants.
+    children = {}
+    for pid, (ppid, _) in table.items():
+        children.setdefault(ppid, []).append(pid)
+    found = []
+    stack = [pid for pid, starttime in roots if table.get(pid, (0, None))[1] == starttime and pid not in skip]
+    seen = set(stack) | set(skip)
+    while stack:
+        pid = stack.pop()
+        found.append(pid)
+        for child in children.get(pid, ()):
+            if child not in seen:
+                seen.add(child)
+                stack.append(child)
+    return found
+
+
+def starttime_of(pid, proc_root="/proc"):
+    try:
+        return parse_stat(read_file(f"{proc_root}/{pid}/stat"))[5]
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def owner_alive(owner, proc_root="/proc"):
+    # owner is the [pid, starttime] a group was frozen by; None (files from
+    # before owners were recorded) counts as gone.
+    try:
+        pid, starttime = owner
+        stat = parse_stat(read_file(f"{proc_root}/{pid}/stat"))
+    except (OSError, ValueError, IndexError, TypeError):
+        return False
+    return stat[5] == starttime and stat[1] not in ("Z", "X")
+
+
+# ---------- Frozen set ----------
+class FocusMode:
+    # Freezes whole process trees: through cgroup.freeze when the tree is
+    # exactly one cgroup (the kernel then stops it atomically, forks
+    # included), otherwise by SIGSTOP, repeated until no new descendant shows
+    # up. Every group is written to FROZEN_FILE *before* anything is stopped,
+    # so `simplytoast thaw` can always undo it, and a guard process
+    # (start_guard) does that if the owning process dies.
+    #
+    # FROZEN_FILE is shared by every running instance. Each group records the
+    # process that froze it, and self.groups only holds this process's own:
+    # another window's timed freeze is left alone unless its owner is gone
+    # (adopt).
+
+    def __init__(self, path=FROZEN_FILE, proc_root="/proc", cgroup_root=CGROUP_ROOT):
+        self.path = str(path)
+        self.proc_root = proc_root
+        self.cgroup_root = cgroup_root
+        self.owner = [os.getpid(), starttime_of(os.getpid(), proc_root)]
+        self.groups = {}
+        self.guard = None
+
+    def read_groups(self):
+        # Every group in FROZEN_FILE, whoever froze it.
+        try:
+            with open(self.path, "r") as f:
+                return {g["id"]: g for g in json.load(f).get("groups", [])}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return {}
+
+    def adopt(self, owner=None, everything=False):
+        # Takes over the groups whose owner has exited (or is the pid
+        # `owner`, for a guard whose owner is still exiting), or with
+        # everything every group, so resume()/resume_all() can undo them.
+        for gid, group in self.read_groups().items():
+            if gid in self.groups:
+                continue
+            frozen_by = group.get("owner")
+            if everything or not owner_alive(frozen_by, self.proc_root) or frozen_by[0] == owner:
+                group["owner"] = self.owner
+                self.groups[gid] = group
+        self.save()
+
+    def save(self):
+        # Other owners' groups are written back as they are on disk.
+        groups = {gid: g for gid, g in self.read_groups().items() if g.get("owner") != self.owner}
+        groups.update(self.groups)
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        if groups:
+            write_atomic(self.path, json.dumps({"groups": list(groups.values())}), fsync=True)
+        else:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def frozen_keys(self):
+        # {(pid, starttime): group id} of every process stopped so far.
+        keys = {}
+        for gid, group in self.groups.items():
+            for pid, starttime in group["pids"]:
+                keys[(pid, starttime)] = gid
+        return keys
+
+    def protected(self):
+        # Never stop ourselves (e.g. when freezing the terminal we run in) or
+        # the guard that would resume everything.
+        skip = {os.getpid()}
+        if self.guard is not None:
+            skip.add(self.guard[1].pid)
+        return skip
+
+    def whole_cgroup(self, pids):
+        # The cgroup dir if every member of it is in pids, else None.
+        paths = {process_cgroup(pid, self.proc_root, self.cgroup_root) for pid in pids}
+        if len(paths) != 1:
+            return None
+        path = paths.pop()
+        if path is None or path == self.cgroup_root or not os.path.exists(os.path.join(path, "cgroup.freeze")):
+            return None
+        members = read_cgroup_file(path, "cgroup.procs")
+        if members is None or not {int(m) for m in members.split()} <= set(pids):
+            return None
+        return path
+
+    def freeze(self, processes, label, until=None):
+        # Returns (group id, [(label, OSError), ...]).
+        roots = [(p.pid, p.starttime) for p in processes]
+        gid = f"{int(time.time() * 1000)}-{roots[0][0]}" if roots else ""
+        self.start_guard()
+        table = proc_table(self.proc_root)
+        pids = subtree(roots, table, self.protected())
+        if not pids:
+            return None, [(label, OSError(errno.ESRCH, "process has exited"))]
+        group = {"id": gid, "label": label, "until": until, "cgroup": None, "owner": self.owner,
+                 "pids": [[pid, table[pid][1]] for pid in pids]}
+        self.groups[gid] = group
+        cgroup = self.whole_cgroup(pids)
+        try:
+            if cgroup is not None:
+                group["cgroup"] = cgroup
+                self.save()
+                with open(os.path.join(cgroup, "cgroup.freeze"), "w") as f:
+                    f.write("1")
+                return gid, []
+            self.save()
+            return gid, self.stop_tree(group, roots, table)
+        except OSError as e:
+            errors = self.resume(gid)
+            return None, [(label, e)] + errors
+
+    def stop_tree(self, group, roots, table):
+        errors = []
+        stopped = set()
+        for _ in range(FREEZE_PASSES):
+            new = [pid for pid in subtree(roots, table, self.protected()) if pid not in stopped]
+            if not new:
+                break
+            known = {pid for pid, _ in group["pids"]}
+            added = [[pid, table[pid][1]] for pid in new if pid not in known]
+            if added:
+                group["pids"].extend(added)
+                self.save()
+            for pid in new:
+                stopped.add(pid)
+                try:
+                    os.kill(pid, signal.SIGSTOP)
+                except ProcessLookupError:
+                    continue
+                except OSError as e:
+                    errors.append((f"{group['label']} ({pid})", e))
+            table = proc_table(self.proc_root)
+        return errors
+
+    def resume(self, gid):
+        group = self.groups.pop(gid, None)
+        if group is None:
+            return []
+        errors = []
+        if group.get("cgroup"):
+            try:
+                with open(os.path.join(group["cgroup"], "cgroup.freeze"), "w") as f:
+                    f.write("0")
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                errors.append((group["label"], e))
+        # Children before parents, and only pids that still are the process
+        # that was stopped.
+        for pid, starttime in reversed(group["pids"]):
+            if group.get("cgroup") or starttime_of(pid, self.proc_root) != starttime:
+                continue
+            try:
+                os.kill(pid, signal.SIGCONT)
+            except ProcessLookupError:
+                continue
+            except OSError as e:
+                errors.append((f"{group['label']} ({pid})", e))
+        self.save()
+        return errors
+
+    def resume_all(self):
+        errors = []
+        for gid in list(self.groups):
+            errors.extend(self.resume(gid))
+        return errors
+
+    def due(self, now=None):
+        now = time.time() if now is None else now
+        return [gid for gid, g in self.groups.items() if g.get("until") and g["until"] <= now]
+
+    # Guard
+    def start_guard(self):
+        # A detached `simplytoast thaw --wait-fd N` that blocks on a pipe we
+        # hold the write end of; when we exit (or crash) it sees EOF and
+        # resumes what we left in FROZEN_FILE, and any other dead owner's.
+        if self.guard is not None and self.guard[1].poll() is None:
+            return
+        r, w = os.pipe()
+        package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, (package_parent, env.get("PYTHONPATH"))))
+        try:
+            child = subprocess.Popen(
+                [sys.executable, "-c", "import sys; from toastcore.cli import run; sys.exit(run(sys.argv[1:]))",
+                 "thaw", "--wait-fd", str(r), "--owner", str(os.getpid()), "--file", self.path],
+                pass_fds=(r,), env=env, start_new_session=True,
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+        except OSError:
+            os.close(w)
+            return
+        finally:
+            os.close(r)
+        self.guard = (w, child)
+
+    def stop_guard(self):
+        if self.guard is not None:
+            os.close(self.guard[0])
+            self.guard = None
+
+
+def wait_and_thaw(fd, path=FROZEN_FILE, owner=None):
+    # Guard side: block until the owner's end of the pipe closes, then resume
+    # its groups (it may not have finished exiting yet) and orphaned ones.
+    while True:
+        try:
+            if not os.read(fd, 64):
+                break
+        except InterruptedError:
+            continue
+        except OSError:
+            break
+    focus = FocusMode(path)
+    focus.adopt(owner)
+    return focus.resume_all()
@@ -0,0 +1,142 @@
+import json
+import os
+import stat
+from pathlib import Path
+
+from .desktop import LOCALES, DesktopEntry, parse_desktop_file, resolve_overrides
+from .paths import CACHE_DIR, autostart_dirs
+from .profiling import PROFILER
+
+INDEX_FILE = CACHE_DIR / "autostart-index.json"
+INDEX_VERSION = 2
+
+
+# ---------- Desktop entry index ----------
+class DesktopIndex:
+    # Parsed .desktop entries keyed by path and validated by (mtime, size, inode),
+    # so a rescan only re-reads files that actually changed on disk.
+
+    def __init__(self, path=INDEX_FILE, dirs=None):
+        self.path = Path(path) if path else None
+        self.dirs = dirs
+        self.entries = {}
+        self.loaded = False
+        self.dirty = False
+        self.parsed = 0
+
+    def load(self):
+        self.loaded = True
+        if self.path is None:
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except Exception:
+            return
+        # Localized Name/Comment are resolved at parse time, so a locale change
+        # invalidates the whole index.
+        if data.get("version") != INDEX_VERSION or data.get("locale") != list(LOCALES):
+            return
+        entries = data.get("entries")
+        if isinstance(entries, dict):
+            self.entries = entries
+
+    def save(self):
+        if self.path is None or not self.dirty:
+            return
+        # Imported here: autostart imports this module.
+        from .autostart import write_atomic
+
+        text = json.dumps({"version": INDEX_VERSION, "locale": list(LOCALES), "entries": self.entries}, separators=(",", ":"))
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Only a cache: a unique temp file keeps two instances from
+            # clobbering each other, but it is not worth an fsync.
+            write_atomic(self.path, text, fsync=False)
+            self.dirty = False
+        except OSError:
+            pass
+
+    def lookup(self, filepath, source, st):
+        key = str(filepath)
+        cached = self.entries.get(key)
+        if (cached is not None and cached[0] == st.st_mtime_ns
+                and cached[1] == st.st_size and cached[2] == st.st_ino):
+            if cached[3] != source:
+                cached[3] = source
+                self.dirty = True
+            return DesktopEntry(key, source, cached[4:])
+        with PROFILER.span("index.parse"):
+            entry = parse_desktop_file(key, source=source)
+        self.parsed += 1
+        self.entries[key] = [st.st_mtime_ns, st.st_size, st.st_ino, source] + entry.values()
+        self.dirty = True
+        return entry
+
+    def update(self, changes):
+        # changes: iterable of (path, source). Returns {path: entry or None if gone}.
+        if not self.loaded:
+            self.load()
+        self.parsed = 0
+        result = {}
+        for path, source in changes:
+            path = str(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                st = None
+            if st is None or not stat.S_ISREG(st.st_mode):
+                if self.entries.pop(path, None) is not None:
+                    self.dirty = True
+                result[path] = None
+                continue
+            result[path] = self.lookup(path, source, st)
+        self.save()
+        return result
+
+    def update_ids(self, ids):
+        # Re-resolve the effective entry for each desktop-file id (basename)
+        # across every autostart dir, so shadowing changes are picked up too.
+        dirs = self.dirs if self.dirs is not None else autostart_dirs()
+        updated = self.update((os.path.join(directory, i), source) for i in ids for directory, source in dirs)
+        result = {}
+        for i in ids:
+            candidates = [updated[os.path.join(directory, i)] for directory, _ in dirs]
+            effective = resolve_overrides([e for e in candidates if e is not None])
+            result[i] = effective[0] if effective else None
+        return result
+
+    def scan(self):
+        if not self.loaded:
+            self.load()
+        self.parsed = 0
+        seen = set()
+        result = []
+        for directory, source in (self.dirs if self.dirs is not None else autostart_dirs()):
+            try:
+                it = os.scandir(directory)
+            except OSError:
+                continue
+            found = []
+            with it:
+                for de in it:
+                    if not de.name.endswith(".desktop"):
+                        continue
+                    try:
+                        st = de.stat()
+                    except OSError:
+                        continue
+                    if not de.is_file():
+                        continue
+                    found.append((de.name, de.path, st))
+            found.sort()
+            for _, path, st in found:
+                seen.add(path)
+                result.append(self.lookup(path, source, st))
+
+        if len(seen) != len(self.entries):
+            for stale in [p for p in self.entries if p not in seen]:
+                del self.entries[stale]
+            self.dirty = True
+        self.save()
+        return result
@@ -0,0 +1,94 @@
+# Exponentially weighted least squares of summed RSS (MB) against time (hours)
+# per app. Each sample decays the running sums and adds one point, so a fit
+# costs O(1) per app and tick and old behaviour fades out with the half-life.
+LEAK_HALF_LIFE = 2 * 3600.0
+# Minimum history, slope and goodness of fit before an app is flagged.
+LEAK_MIN_SPAN = 15 * 60.0
+LEAK_MIN_RATE = 5.0
+LEAK_MIN_R2 = 0.6
+# Fits are only updated this often; faster ticks would add noise, not signal.
+LEAK_STEP = 30.0
+
+
+class Trend:
+    __slots__ = ("t0", "last", "w", "st", "sy", "stt", "sty", "syy")
+
+    def __init__(self, t):
+        self.t0 = t
+        self.last = None
+        self.w = self.st = self.sy = self.stt = self.sty = self.syy = 0.0
+
+    def add(self, t, mb):
+        if self.last is not None:
+            decay = 0.5 ** ((t - self.last) / LEAK_HALF_LIFE)
+            self.w *= decay
+            self.st *= decay
+            self.sy *= decay
+            self.stt *= decay
+            self.sty *= decay
+            self.syy *= decay
+        self.last = t
+        # Hours since the first point keeps the sums well conditioned.
+        x = (t - self.t0) / 3600.0
+        self.w += 1.0
+        self.st += x
+        self.sy += mb
+        self.stt += x * x
+        self.sty += x * mb
+        self.syy += mb * mb
+
+    def fit(self):
+        # (MB per hour, r^2), or None while the points are degenerate.
+        w = self.w
+        var_t = self.stt - self.st * self.st / w
+        var_y = self.syy - self.sy * self.sy / w
+        if var_t <= 1e-12:
+            return None
+        cov = self.sty - self.st * self.sy / w
+        slope = cov / var_t
+        r2 = cov * cov / (var_t * var_y) if var_y > 1e-12 else 0.0
+        return slope, r2
+
+
+class LeakDetector:
+    # Fed one Snapshot per tick; rates holds {app: MB/hour} for apps whose
+    # memory has grown steadily for at least LEAK_MIN_SPAN.
+
+    def __init__(self):
+        self.trends = {}
+        self.rates = {}
+        self.last_time = None
+
+    def feed(self, snapshot):
+        # Returns True when the set of flagged apps or their rates changed.
+        t = snapshot.time
+        if self.last_time is not None and t - self.last_time < LEAK_STEP:
+            return False
+        self.last_time = t
+        rss = {}
+        for p in snapshot.processes:
+            name = p.comm.lower()
+            rss[name] = rss.get(name, 0) + p.rss
+        trends = self.trends
+        for name in [n for n in trends if n not in rss]:
+            del trends[name]
+        rates = {}
+        for name, kb in rss.items():
+            trend = trends.get(name)
+            if trend is None:
+                trend = trends[name] = Trend(t)
+            trend.add(t, kb / 1024)
+            if t - trend.t0 < LEAK_MIN_SPAN:
+                continue
+            fit = trend.fit()
+            if fit is not None and fit[0] >= LEAK_MIN_RATE and fit[1] >= LEAK_MIN_R2:
+                rates[name] = round(fit[0], 1)
+        changed = rates != self.rates
+        self.rates = rates
+        return changed
+
+
+def format_rate(rate):
+    if not rate:
+        return ""
+    return f"+{rate:.0f} MB/h" if rate >= 10 else f"+{rate:.1f} MB/h"
@@ -0,0 +1,32 @@
+from collections import deque, namedtuple
+
+RECENT_EXITED_LEN = 200
+EVENT_LOG_LEN = 1000
+
+
+class ProcessEvent(namedtuple("ProcessEvent", ("kind", "time", "process"))):
+    # kind: "started" or "exited". For "exited", process is the last sample
+    # taken before it went away (final cpu_time, CPU% and RSS); time is when
+    # the exit was noticed, i.e. at most one refresh interval late.
+    __slots__ = ()
+
+
+class LifecycleLog:
+    # Bounded history of started/exited events, fed from Sampler.started /
+    # .exited (or the same lists on CollectorClient). Events are keyed by
+    # (pid, starttime), so a reused PID is a new process, never the old one.
+
+    def __init__(self, maxlen=RECENT_EXITED_LEN, log_len=EVENT_LOG_LEN):
+        self.exited = deque(maxlen=maxlen)
+        self.events = deque(maxlen=log_len)
+
+    def record(self, time, started, exited):
+        # Returns the new events. Skip a sampler's first sample (interval 0):
+        # every process looks "started" in it.
+        events = [ProcessEvent("started", time, p) for p in started]
+        for p in exited:
+            event = ProcessEvent("exited", time, p)
+            events.append(event)
+            self.exited.appendleft(event)
+        self.events.extend(events)
+        return events
@@ -0,0 +1,38 @@
+import os
+from pathlib import Path
+
+# ---------- XDG locations ----------
+CONFIG_HOME = Path(os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config")
+CACHE_HOME = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+
+CONFIG_DIR = CONFIG_HOME / "simplytoast"
+CACHE_DIR = CACHE_HOME / "simplytoast"
+AUTOSTART_USER = CONFIG_HOME / "autostart"
+AUTOSTART_SYSTEM = Path("/etc/xdg/autostart")
+BASELINE_DIR = CONFIG_DIR / "baselines"
+
+
+def autostart_dirs():
+    # User dir first, then every $XDG_CONFIG_DIRS entry in priority order.
+    dirs = [(AUTOSTART_USER, "user")]
+    seen = {str(AUTOSTART_USER)}
+    for base in (os.environ.get("XDG_CONFIG_DIRS") or "/etc/xdg").split(":"):
+        if not base:
+            continue
+        d = Path(base) / "autostart"
+        if str(d) in seen:
+            continue
+        seen.add(str(d))
+        dirs.append((d, "system"))
+    return dirs
+
+
+def runtime_dir():
+    # $XDG_RUNTIME_DIR is per-user and 0700; fall back to the cache dir.
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    return Path(base) / "simplytoast" if base else CACHE_DIR / "run"
+
+
+COLLECTOR_SOCKET = runtime_dir() / "collector.sock"
+# Focus mode's frozen set; tmpfs, so it is gone with the session it belongs to.
+FROZEN_FILE = runtime_dir() / "frozen.json"
@@ -0,0 +1,11 @@
+# ---------- Impact ----------
+def usage_by_comm(processes):
+    # Impact score per lowercased comm, as used by the autostart Impact column.
+    usage = {}
+    for p in processes:
+        usage[p.comm.lower()] = p.cpu + p.mem
+    return usage
+
+
+def impact_percent(score, total):
+    return float(f"{round((score / (total or 1.0)) * 100, 1):.2f}")
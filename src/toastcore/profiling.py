@@ -0,0 +1,139 @@
+import json
+import math
+import os
+import time
+
+ENV_VAR = "SIMPLYTOAST_PROFILE"
+BUCKETS_PER_OCTAVE = 16
+
+
+# ---------- Histogram ----------
+class Histogram:
+    # Log-bucketed durations (16 buckets per doubling, ~4% resolution): O(1)
+    # record and bounded memory however long the app runs.
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = {}
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        ns = seconds * 1e9
+        b = int(math.log2(ns) * BUCKETS_PER_OCTAVE) if ns >= 1 else 0
+        self.buckets[b] = self.buckets.get(b, 0) + 1
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for b in sorted(self.buckets):
+            seen += self.buckets[b]
+            if seen >= rank:
+                return min(2 ** ((b + 0.5) / BUCKETS_PER_OCTAVE) / 1e9, self.max)
+        return self.max
+
+    def summary(self):
+        ms = 1000.0
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * ms, 3),
+            "mean_ms": round(self.total / self.count * ms, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.50) * ms, 3),
+            "p95_ms": round(self.percentile(0.95) * ms, 3),
+            "p99_ms": round(self.percentile(0.99) * ms, 3),
+            "max_ms": round(self.max * ms, 3),
+        }
+
+
+# ---------- Spans ----------
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.record(time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    # `with PROFILER.span("name"):` times a block. While disabled, span()
+    # hands back a shared no-op context manager, so instrumented code pays one
+    # attribute check per span and allocates nothing.
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.started = time.time()
+
+    def span(self, name):
+        if not self.enabled:
+            return _NULL_SPAN
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return _Span(histogram)
+
+    def reset(self):
+        self.histograms = {}
+        self.started = time.time()
+
+    def stats(self):
+        return {name: h.summary() for name, h in sorted(self.histograms.items())}
+
+    def report(self):
+        # Fixed-width table for the debug overlay.
+        lines = [f"{'span':<28}{'n':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  ms"]
+        for name, s in self.stats().items():
+            lines.append(f"{name:<28}{s['count']:>7}{s['p50_ms']:>9.2f}{s['p95_ms']:>9.2f}"
+                         f"{s['p99_ms']:>9.2f}{s['max_ms']:>9.2f}")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        import tempfile
+
+        path = str(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"started": self.started, "time": time.time(), "spans": self.stats()}, f, indent=2)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+
+PROFILER = Profiler(enabled=os.environ.get(ENV_VAR, "") not in ("", "0"))
+
+
+def span(name):
+    return PROFILER.span(name)
@@ -0,0 +1,233 @@
+import json
+import os
+import re
+import sys
+
+from .control import IOPRIO_CLASSES, ThrottleSet, cgroup_app_id, process_cgroup
+from .paths import CONFIG_DIR
+from .users import can_inspect
+
+RULES_FILE = CONFIG_DIR / "rules.json"
+MATCH_KEYS = ("comm", "exe", "cmdline", "app_id")
+ACTION_KEYS = ("nice", "ionice", "affinity", "cpu_max", "memory_high")
+SIZE_UNITS = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+# rules.json:
+# {"rules": [
+#   {"match": {"comm": "tracker-miner-f"}, "actions": {"nice": 19, "ionice": "idle"}},
+#   {"match": {"cmdline": "--type=renderer"}, "actions": {"affinity": "0-1"}},
+#   {"match": {"app_id": "com.spotify.Client"}, "actions": {"cpu_max": 50, "memory_high": "1G"}}
+# ]}
+# Every key in "match" must hold (comm and exe exact, cmdline a regex searched
+# in the full command line, app_id from the systemd scope). Actions of later
+# matching rules override earlier ones.
+
+
+# ---------- Parsing ----------
+def parse_cpus(value):
+    if isinstance(value, str):
+        cpus = []
+        for part in value.split(","):
+            first, _, last = part.strip().partition("-")
+            cpus.extend(range(int(first), int(last or first) + 1))
+        return cpus
+    return [int(c) for c in value]
+
+
+def parse_size(value):
+    if isinstance(value, int):
+        return value
+    value = str(value).strip().upper().rstrip("B")
+    if value and value[-1] in SIZE_UNITS:
+        return int(float(value[:-1]) * SIZE_UNITS[value[-1]])
+    return int(value)
+
+
+def parse_actions(actions):
+    parsed = {}
+    for key, value in actions.items():
+        if key not in ACTION_KEYS:
+            raise ValueError(f"unknown action {key!r}")
+        if key == "nice":
+            value = int(value)
+            if not -20 <= value <= 19:
+                raise ValueError("nice must be between -20 and 19")
+        elif key == "ionice":
+            if isinstance(value, str):
+                cls, _, level = value.partition(":")
+                value = (cls, int(level or 4))
+            else:
+                value = (value[0], int(value[1]) if len(value) > 1 else 4)
+            if value[0] not in IOPRIO_CLASSES:
+                raise ValueError(f"unknown I/O class {value[0]!r}")
+        elif key == "affinity":
+            value = parse_cpus(value)
+        elif key == "cpu_max":
+            value = float(value)
+        else:
+            value = parse_size(value)
+        parsed[key] = value
+    return parsed
+
+
+class Rule:
+    __slots__ = ("index", "comm", "exe", "cmdline", "app_id", "actions")
+
+    def __init__(self, index, match, actions):
+        unknown = set(match) - set(MATCH_KEYS)
+        if unknown or not match:
+            raise ValueError(f"bad match keys {sorted(unknown) or 'none'}")
+        self.index = index
+        self.comm = match.get("comm")
+        self.exe = match.get("exe")
+        self.cmdline = re.compile(match["cmdline"]) if "cmdline" in match else None
+        self.app_id = match.get("app_id")
+        self.actions = parse_actions(actions)
+        if not self.actions:
+            raise ValueError("no actions")
+
+
+# ---------- Engine ----------
+class _Facts:
+    # exe and cgroup are only read if some candidate rule asks for them.
+    __slots__ = ("proc", "proc_root", "_exe", "_app_id")
+
+    def __init__(self, proc, proc_root):
+        self.proc = proc
+        self.proc_root = proc_root
+        self._exe = self._app_id = None
+
+    @property
+    def exe(self):
+        if self._exe is None and not can_inspect(self.proc.uid):
+            # Another user's exe link is never readable to us.
+            self._exe = ""
+        if self._exe is None:
+            try:
+                self._exe = os.readlink(f"{self.proc_root}/{self.proc.pid}/exe")
+            except OSError:
+                self._exe = ""
+        return self._exe
+
+    @property
+    def app_id(self):
+        if self._app_id is None:
+            self._app_id = cgroup_app_id(process_cgroup(self.proc.pid, self.proc_root))
+        return self._app_id
+
+
+class RuleEngine:
+    # Rules are compiled into an index keyed by the cheapest exact field each
+    # rule has (comm, then app_id, then exe); only cmdline-only rules are
+    # scanned. apply() is fed the processes whose (pid, starttime) is new
+    # this tick (Sampler.started), so the cost follows process churn, not
+    # the size of the process table.
+
+    def __init__(self, path=RULES_FILE, throttles=None, proc_root="/proc"):
+        self.path = str(path)
+        self.throttles = throttles if throttles is not None else ThrottleSet(proc_root)
+        self.proc_root = proc_root
+        self.stamp = None
+        self.rules = []
+        self.errors = []
+        self.by_comm = {}
+        self.by_app_id = {}
+        self.by_exe = {}
+        self.scan = []
+
+    def load(self):
+        # Re-reads rules.json only when its mtime/size changed; True if it did.
+        try:
+            st = os.stat(self.path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamp = None
+        if stamp == self.stamp:
+            return False
+        self.stamp = stamp
+        self.rules = []
+        self.errors = []
+        if stamp is not None:
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+                entries = data.get("rules", []) if isinstance(data, dict) else data
+            except (OSError, ValueError) as e:
+                self.errors.append((self.path, e))
+                entries = []
+            for n, entry in enumerate(entries):
+                try:
+                    self.rules.append(Rule(n, entry.get("match", {}), entry.get("actions", {})))
+                except (AttributeError, TypeError, ValueError, re.error) as e:
+                    self.errors.append((f"{self.path}: rule {n + 1}", e))
+        self.compile()
+        return True
+
+    def compile(self):
+        self.by_comm, self.by_app_id, self.by_exe, self.scan = {}, {}, {}, []
+        for rule in self.rules:
+            if rule.comm is not None:
+                self.by_comm.setdefault(rule.comm, []).append(rule)
+            elif rule.app_id is not None:
+                self.by_app_id.setdefault(rule.app_id, []).append(rule)
+            elif rule.exe is not None:
+                self.by_exe.setdefault(rule.exe, []).append(rule)
+            else:
+                self.scan.append(rule)
+
+    def matches(self, proc):
+        facts = _Facts(proc, self.proc_root)
+        candidates = list(self.by_comm.get(proc.comm, ()))
+        if self.by_app_id and facts.app_id:
+            candidates.extend(self.by_app_id.get(facts.app_id, ()))
+        if self.by_exe and facts.exe:
+            candidates.extend(self.by_exe.get(facts.exe, ()))
+        candidates.extend(self.scan)
+        result = []
+        for rule in sorted(candidates, key=lambda r: r.index):
+            if rule.comm is not None and rule.comm != proc.comm:
+                continue
+            if rule.app_id is not None and rule.app_id != facts.app_id:
+                continue
+            if rule.exe is not None and rule.exe != facts.exe:
+                continue
+            if rule.cmdline is not None and not rule.cmdline.search(proc.args):
+                continue
+            result.append(rule)
+        return result
+
+    def apply(self, started):
+        # Returns [(label, error), ...]: rules that failed to parse (once per
+        # reload of the file) and actions that failed.
+        errors = list(self.errors) if self.load() else []
+        if not self.rules or not started:
+            return errors
+        t = self.throttles
+        euid = os.geteuid()
+        for proc in started:
+            # With other users in view, their processes are not ours to
+            # renice or limit; skip them rather than fail every one.
+            if not can_inspect(proc.uid, euid):
+                continue
+            actions = {}
+            for rule in self.matches(proc):
+                actions.update(rule.actions)
+            if not actions:
+                continue
+            target = [proc]
+            if "nice" in actions:
+                errors.extend(t.renice(target, actions["nice"]))
+            if "ionice" in actions:
+                errors.extend(t.ionice(target, *actions["ionice"]))
+            if "affinity" in actions:
+                errors.extend(t.pin(target, actions["affinity"]))
+            if "cpu_max" in actions:
+                errors.extend(t.limit_cpu(target, actions["cpu_max"]))
+            if "memory_high" in actions:
+                errors.extend(t.limit_memory(target, actions["memory_high"]))
+        return errors
+
+
+def report(errors, file=sys.stderr):
+    for label, e in errors:
+        print(f"simplytoast: rules: {label}: {getattr(e, 'strerror', None) or e}", file=file)
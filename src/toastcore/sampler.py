@@ -0,0 +1,254 @@
+import os
+import sys
+import time
+
+from .snapshot import ProcessSample, Snapshot
+from .users import SCOPE_USER, scope_filter
+
+# Below this many processes a sample is read serially: the pool hand-off
+# costs more than it saves. Above it, the pid list is cut into one shard per
+# worker thread. /proc reads release the GIL while the kernel formats the
+# file, which is most of the cost on a real /proc.
+PARALLEL_MIN = 4000
+MAX_WORKERS = 8
+
+
+# ---------- /proc readers ----------
+def read_file(path, size=4096):
+    # Reads until EOF: seq_file-backed /proc files (maps, smaps, ...) return
+    # about a page per read(), whatever `size` asks for.
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        chunks = []
+        while True:
+            chunk = os.read(fd, size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+    finally:
+        os.close(fd)
+
+
+def parse_stat(data):
+    # /proc/<pid>/stat; comm may contain spaces and parens, so split around the
+    # last ')'. Returns (comm, state, ppid, cpu_ticks, threads, starttime, rss_pages).
+    left = data.index(b"(")
+    right = data.rindex(b")")
+    comm = data[left + 1:right].decode(errors="replace")
+    fields = data[right + 2:].split()
+    return (
+        comm,
+        fields[0].decode(),
+        int(fields[1]),
+        int(fields[11]) + int(fields[12]),
+        int(fields[17]),
+        int(fields[19]),
+        int(fields[21]),
+    )
+
+
+def read_meminfo_total(proc_root):
+    try:
+        for line in read_file(os.path.join(proc_root, "meminfo")).splitlines():
+            if line.startswith(b"MemTotal:"):
+                return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def read_uptime(proc_root):
+    try:
+        return float(read_file(os.path.join(proc_root, "uptime")).split()[0])
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def read_pss(proc_root, pid):
+    # kB from smaps_rollup (one summary instead of walking every mapping);
+    # None if the kernel is too old or the process is not ours to inspect.
+    try:
+        data = read_file(f"{proc_root}/{pid}/smaps_rollup")
+    except OSError:
+        return None
+    start = data.find(b"\nPss:")
+    if start == -1:
+        return None
+    try:
+        return int(data[start + 5:data.index(b"kB", start)])
+    except ValueError:
+        return None
+
+
+def read_io(proc_root, pid):
+    # (read_bytes, write_bytes) that actually hit storage; (0, 0) if unreadable.
+    try:
+        data = read_file(f"{proc_root}/{pid}/io")
+    except OSError:
+        return (0, 0)
+    read = write = 0
+    for line in data.splitlines():
+        if line.startswith(b"read_bytes:"):
+            read = int(line[11:])
+        elif line.startswith(b"write_bytes:"):
+            write = int(line[12:])
+    return (read, write)
+
+
+# ---------- Sampler ----------
+class Sampler:
+    # Reads /proc (or a fake tree via proc_root) and returns Snapshot objects.
+    # CPU% is the delta since the previous sample of the same (pid, starttime);
+    # processes seen for the first time get their lifetime average, as ps does.
+    # cmdline never changes for a (pid, starttime), so it is read and decoded
+    # once per process; known processes cost one read of /proc/<pid>/stat.
+    # comm and args strings are interned, so a hundred bash processes share
+    # one "bash". scope (users.SCOPES) picks whose processes are kept, from
+    # the owner of /proc/<pid> before anything in it is read.
+
+    def __init__(self, proc_root="/proc", uid=None, workers=None, parallel_min=PARALLEL_MIN, scope=SCOPE_USER):
+        self.proc_root = proc_root
+        # workers=None picks one per CPU (up to MAX_WORKERS); 1 is always serial.
+        self.workers = min(os.cpu_count() or 1, MAX_WORKERS) if workers is None else max(workers, 1)
+        self.parallel_min = parallel_min
+        self.pool = None
+        self.uid = os.getuid() if uid is None else uid
+        self.scope = scope
+        self.keep = scope_filter(scope, self.uid)
+        self.hz = os.sysconf("SC_CLK_TCK")
+        self.page_kb = os.sysconf("SC_PAGE_SIZE") // 1024
+        self.mem_total = read_meminfo_total(proc_root)
+        self.prev = {}
+        self.prev_time = None
+        self.prev_uptime = None
+        self.rescoped = False
+        self.latest = None
+        # Processes whose (pid, starttime) first appeared in the last sample,
+        # and the last sample of those that were gone in it.
+        self.started = []
+        self.exited = []
+        # Per sample: bytes read from /proc/<pid> files, and how many
+        # processes needed the full (stat + cmdline) read.
+        self.bytes_read = 0
+        self.full_reads = 0
+        self.shards = 1
+
+    def pids(self):
+        try:
+            names = os.listdir(self.proc_root)
+        except OSError:
+            return []
+        return [name for name in names if name.isdigit()]
+
+    def read_process(self, pid, uptime, interval, prev, current, counts):
+        base = f"{self.proc_root}/{pid}"
+        try:
+            uid = os.stat(base).st_uid
+            if self.keep is not None and not self.keep(uid):
+                return None
+            data = read_file(base + "/stat")
+            comm, state, ppid, ticks, threads, starttime, rss_pages = parse_stat(data)
+            pid = int(pid)
+            key = (pid, starttime)
+            last = prev.get(key)
+            if last is None:
+                cmdline = read_file(base + "/cmdline")
+                counts[0] += len(cmdline)
+                counts[1] += 1
+        except (OSError, ValueError, IndexError):
+            return None
+        counts[0] += len(data)
+
+        if last is None:
+            comm = sys.intern(comm)
+            args = sys.intern(cmdline.rstrip(b"\0").replace(b"\0", b" ").decode(errors="replace") or f"[{comm}]")
+        else:
+            args = last.args
+            # comm can change (prctl PR_SET_NAME); keep the shared string if not.
+            comm = last.comm if comm == last.comm else sys.intern(comm)
+        cpu_time = ticks / self.hz
+        if last is not None and interval > 0:
+            cpu = (cpu_time - last.cpu_time) / interval * 100
+        else:
+            age = uptime - starttime / self.hz
+            cpu = cpu_time / age * 100 if age > 0 else 0.0
+        rss = rss_pages * self.page_kb
+        mem = rss / self.mem_total * 100 if self.mem_total else 0.0
+        proc = current[key] = ProcessSample(pid, starttime, ppid, uid, state, comm, args,
+                                            cpu_time, round(cpu, 1), rss, round(mem, 1), threads)
+        return proc
+
+    def read_shard(self, names, uptime, interval, prev):
+        # Only touches its own dict and counters, so shards can run on
+        # separate threads; prev is shared but read-only here.
+        current = {}
+        started = []
+        counts = [0, 0]
+        for pid in names:
+            proc = self.read_process(pid, uptime, interval, prev, current, counts)
+            if proc is not None and proc.key not in prev:
+                started.append(proc)
+        return current, started, counts
+
+    def read_all(self, names, uptime, interval, prev):
+        if self.workers < 2 or len(names) < self.parallel_min:
+            self.shards = 1
+            return [self.read_shard(names, uptime, interval, prev)]
+        if self.pool is None:
+            # Only large process counts need it; spares `top` the import.
+            from concurrent.futures import ThreadPoolExecutor
+
+            self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix="sampler")
+        size = -(-len(names) // self.workers)
+        shards = [names[i:i + size] for i in range(0, len(names), size)]
+        self.shards = len(shards)
+        return list(self.pool.map(lambda shard: self.read_shard(shard, uptime, interval, prev), shards))
+
+    def set_scope(self, scope):
+        # Processes still in view keep their previous sample. Those that leave
+        # it are not reported as exited, and the next sample only reports as
+        # started the processes that came into view and really are new.
+        self.keep = keep = scope_filter(scope, self.uid)
+        self.scope = scope
+        if keep is not None:
+            self.prev = {key: p for key, p in self.prev.items() if keep(p.uid)}
+        self.rescoped = True
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = None
+
+    def sample(self):
+        now = time.monotonic()
+        interval = now - self.prev_time if self.prev_time is not None else 0.0
+        uptime = read_uptime(self.proc_root)
+        prev = self.prev
+        current = {}
+        started = []
+        self.bytes_read = self.full_reads = 0
+        for shard_current, shard_started, counts in self.read_all(self.pids(), uptime, interval, prev):
+            current.update(shard_current)
+            started.extend(shard_started)
+            self.bytes_read += counts[0]
+            self.full_reads += counts[1]
+        processes = sorted(current.values(), key=lambda p: (-p.cpu, -p.mem))
+        # Every process is either new or was in prev, so exits only need the
+        # key difference when the survivor count falls short of prev.
+        if len(current) - len(started) < len(prev):
+            self.exited = [prev[key] for key in prev.keys() - current.keys()]
+        else:
+            self.exited = []
+        if self.rescoped and self.prev_uptime is not None:
+            # Only what started after the previous sample is new; the rest
+            # just came into view.
+            since = self.prev_uptime * self.hz
+            started = [p for p in started if p.starttime > since]
+        self.rescoped = False
+        self.started = started
+        self.prev = current
+        self.prev_time = now
+        self.prev_uptime = uptime
+        self.latest = Snapshot(time.time(), interval, tuple(processes), self.mem_total)
+        return self.latest
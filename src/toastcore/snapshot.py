@@ -0,0 +1,29 @@
+from collections import namedtuple
+
+
+# ---------- Snapshot types ----------
+# namedtuples with empty __slots__: immutable, no per-instance dict, cheap to
+# build for thousands of processes per tick and safe to share across threads.
+class ProcessSample(namedtuple("ProcessSample", (
+        "pid", "starttime", "ppid", "uid", "state", "comm", "args",
+        "cpu_time", "cpu", "rss", "mem", "threads"))):
+    # cpu_time in seconds, cpu/mem in percent (cpu is per core, like ps),
+    # rss in kB, starttime in clock ticks since boot.
+    __slots__ = ()
+
+    @property
+    def key(self):
+        # (pid, starttime) identifies a process across PID reuse.
+        return (self.pid, self.starttime)
+
+
+class Snapshot(namedtuple("Snapshot", ("time", "interval", "processes", "mem_total"))):
+    # time: wall clock; interval: seconds since the previous sample (0 on the
+    # first one, when cpu is the lifetime average); processes sorted by cpu, mem.
+    __slots__ = ()
+
+    def by_pid(self):
+        return {p.pid: p for p in self.processes}
+
+
+EMPTY_SNAPSHOT = Snapshot(0.0, 0.0, (), 0)
@@ -0,0 +1,132 @@
+import os
+import time
+from collections import namedtuple
+
+from .sampler import read_file
+
+PSI_RESOURCES = ("cpu", "memory", "io")
+# Refresh back-off under pressure: while the system is stalling, sampling
+# every process is part of the problem, so the refresh interval is
+# stretched up to PRESSURE_MAX_FACTOR times.
+PRESSURE_HIGH = {"cpu": 40.0, "memory": 10.0, "io": 30.0}
+PRESSURE_MAX_FACTOR = 4
+
+
+class SystemSample(namedtuple("SystemSample", (
+        "time", "cpu", "cores", "mem_total", "mem_available", "swap_total", "swap_free", "pressure"))):
+    # cpu and cores in percent busy since the previous sample (cores is a
+    # tuple, one per CPU); memory in kB; pressure {resource: (some %, full %)}
+    # of wall time stalled since the previous sample, or {} without PSI.
+    __slots__ = ()
+
+    @property
+    def mem_used(self):
+        return self.mem_total - self.mem_available
+
+    @property
+    def swap_used(self):
+        return self.swap_total - self.swap_free
+
+
+EMPTY_SYSTEM = SystemSample(0.0, 0.0, (), 0, 0, 0, 0, {})
+
+
+def parse_proc_stat(data):
+    # [(busy ticks, total ticks)] for the "cpu" line and then every "cpuN".
+    counters = []
+    for line in data.splitlines():
+        if not line.startswith(b"cpu"):
+            break
+        fields = [int(f) for f in line.split()[1:]]
+        # user nice system idle iowait irq softirq steal (guest is in user).
+        idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+        total = sum(fields[:8])
+        counters.append((total - idle, total))
+    return counters
+
+
+def parse_meminfo(data):
+    values = {}
+    for line in data.splitlines():
+        name, _, rest = line.partition(b":")
+        if name in (b"MemTotal", b"MemAvailable", b"SwapTotal", b"SwapFree"):
+            values[name.decode()] = int(rest.split()[0])
+    return values
+
+
+def parse_pressure(data):
+    # (some total us, full total us); the "full" line is missing for cpu on
+    # older kernels.
+    some = full = 0
+    for line in data.splitlines():
+        total = int(line.rsplit(b"total=", 1)[1])
+        if line.startswith(b"some"):
+            some = total
+        elif line.startswith(b"full"):
+            full = total
+    return some, full
+
+
+class SystemSampler:
+    # /proc/stat, /proc/meminfo and /proc/pressure/* (five small reads per
+    # tick). Utilisation and stall percentages are deltas against the
+    # previous call, so they cover exactly one refresh interval.
+
+    def __init__(self, proc_root="/proc"):
+        self.proc_root = proc_root
+        self.prev_cpu = None
+        self.prev_psi = None
+        self.prev_time = None
+        self.psi = os.path.isdir(os.path.join(proc_root, "pressure"))
+        self.latest = EMPTY_SYSTEM
+
+    def sample(self):
+        now = time.monotonic()
+        root = self.proc_root
+        try:
+            counters = parse_proc_stat(read_file(os.path.join(root, "stat"), 65536))
+            mem = parse_meminfo(read_file(os.path.join(root, "meminfo")))
+        except (OSError, ValueError, IndexError):
+            return self.latest
+        psi = {}
+        if self.psi:
+            for resource in PSI_RESOURCES:
+                try:
+                    psi[resource] = parse_pressure(read_file(os.path.join(root, "pressure", resource)))
+                except (OSError, ValueError, IndexError):
+                    continue
+
+        busy = []
+        prev = self.prev_cpu
+        for n, (b, t) in enumerate(counters):
+            if prev is not None and n < len(prev) and t > prev[n][1]:
+                busy.append(round((b - prev[n][0]) / (t - prev[n][1]) * 100, 1))
+            else:
+                busy.append(round(b / t * 100, 1) if t else 0.0)
+        pressure = {}
+        if self.prev_psi is not None and self.prev_time is not None:
+            elapsed_us = (now - self.prev_time) * 1e6
+            for resource, (some, full) in psi.items():
+                last = self.prev_psi.get(resource)
+                if last is not None and elapsed_us > 0:
+                    pressure[resource] = (round(min((some - last[0]) / elapsed_us * 100, 100.0), 1),
+                                          round(min((full - last[1]) / elapsed_us * 100, 100.0), 1))
+        self.prev_cpu = counters
+        self.prev_psi = psi
+        self.prev_time = now
+        self.latest = SystemSample(
+            time.time(), busy[0] if busy else 0.0, tuple(busy[1:]),
+            mem.get("MemTotal", 0), mem.get("MemAvailable", 0),
+            mem.get("SwapTotal", 0), mem.get("SwapFree", 0), pressure)
+        return self.latest
+
+
+def refresh_factor(sample):
+    # Refresh interval multiplier: 1 while calm, 2 once the some-stall of any
+    # resource reaches its PRESSURE_HIGH mark, PRESSURE_MAX_FACTOR at twice it.
+    worst = 0.0
+    for resource, (some, _) in sample.pressure.items():
+        worst = max(worst, some / PRESSURE_HIGH[resource])
+    if worst < 1.0:
+        return 1
+    return min(int(worst * 2), PRESSURE_MAX_FACTOR)
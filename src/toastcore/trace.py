@@ -0,0 +1,312 @@
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from operator import add, sub
+
+from .snapshot import ProcessSample, Snapshot
+from .system import SystemSample
+from .wire import WireError, pack, unpack
+
+# ---------- Trace format ----------
+# A recording is MAGIC, one msgpack header frame ({"version", "hz", ...}) and
+# then one record per snapshot:
+#
+#   RECORD_HEADER (compressed length, keyframe flag, wall time)
+#   zlib(msgpack {"interval", "mem_total", "rows", "strings", "columns", "system"})
+#
+# Times sit outside the compressed body, so a reader can index and seek a
+# trace by hopping over record headers without inflating anything.
+#
+# Rows are sorted by pid and stored column by column as little-endian int64
+# arrays. Every column except pid and starttime is the difference to the same
+# (pid, starttime) in the previous record, so a process that did not change
+# is a row of zeros, which zlib all but removes. comm and args are ids into a
+# string table that each record extends with the strings it introduces.
+# Keyframes (every KEYFRAME_EVERY records) reset the table and store plain
+# values, so seeking only decodes from the nearest keyframe.
+MAGIC = b"STTRACE\x01"
+RECORD_HEADER = struct.Struct(">IBd")
+TRACE_VERSION = 1
+KEYFRAME_EVERY = 60
+COMPRESS_LEVEL = 6
+# pid: gap to the previous row; starttime: 0 when the pid is the same process
+# as in the previous record, otherwise starttime + 1.
+COLUMNS = ("pid", "starttime", "ppid", "uid", "state", "comm", "args",
+           "cpu_ticks", "cpu", "rss", "mem", "threads")
+
+
+class TraceError(ValueError):
+    pass
+
+
+def _column_bytes(values):
+    column = array("q", values)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column.tobytes()
+
+
+def _column_values(data):
+    column = array("q")
+    column.frombytes(data)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column
+
+
+def _system_record(system):
+    if system is None:
+        return None
+    return [system.time, system.cpu, list(system.cores), system.mem_total, system.mem_available,
+            system.swap_total, system.swap_free, {r: list(v) for r, v in system.pressure.items()}]
+
+
+def _system_sample(record):
+    if record is None:
+        return None
+    time, cpu, cores, mem_total, mem_available, swap_total, swap_free, pressure = record
+    return SystemSample(time, cpu, tuple(cores), mem_total, mem_available, swap_total, swap_free,
+                        {r: tuple(v) for r, v in pressure.items()})
+
+
+# ---------- Writer ----------
+class TraceWriter:
+    # Appends one record per write(); each record is flushed as it is
+    # written, so a trace cut short by a crash is readable up to its last
+    # complete record.
+
+    def __init__(self, path, hz=None):
+        self.path = str(path)
+        self.hz = hz or os.sysconf("SC_CLK_TCK")
+        self.records = 0
+        self.bytes = 0
+        self.prev = {}
+        self.strings = {}
+        self.file = open(self.path, "wb")
+        try:
+            header = pack({"version": TRACE_VERSION, "hz": self.hz, "host": os.uname().nodename})
+            self.file.write(MAGIC + struct.pack(">I", len(header)) + header)
+        except (OSError, WireError):
+            self.file.close()
+            raise
+        self.bytes = self.file.tell()
+
+    def encode(self, snapshot, keyframe):
+        if keyframe:
+            self.prev = {}
+            self.strings = {}
+        prev = self.prev
+        table = self.strings
+        new_strings = []
+
+        def string_id(text):
+            n = table.get(text)
+            if n is None:
+                n = table[text] = len(table)
+                new_strings.append(text)
+            return n
+
+        processes = sorted(snapshot.processes, key=lambda p: p.pid)
+        hz = self.hz
+        rows = []
+        last_pid = 0
+        current = {}
+        for p in processes:
+            old = prev.get(p.pid)
+            if old is not None and old[0] != p.starttime:
+                old = None
+            # Integer view of the sample: CPU time in ticks, cpu/mem in tenths
+            # of a percent (the sampler rounds them to one decimal). comm and
+            # args are the same interned objects while they do not change.
+            if old is not None and old[2] is p.comm and old[3] is p.args:
+                comm, args = old[1][3], old[1][4]
+            else:
+                comm, args = string_id(p.comm), string_id(p.args)
+            row = (p.ppid, p.uid, ord(p.state[:1] or "?"), comm, args,
+                   round(p.cpu_time * hz), round(p.cpu * 10), p.rss, round(p.mem * 10), p.threads)
+            current[p.pid] = (p.starttime, row, p.comm, p.args)
+            if old is not None:
+                rows.append((p.pid - last_pid, 0) + tuple(map(sub, row, old[1])))
+            else:
+                rows.append((p.pid - last_pid, p.starttime + 1) + row)
+            last_pid = p.pid
+        self.prev = current
+        return {
+            "interval": snapshot.interval,
+            "mem_total": snapshot.mem_total,
+            "rows": len(processes),
+            "strings": new_strings,
+            "columns": [_column_bytes(col) for col in zip(*rows)] if rows else [b""] * len(COLUMNS),
+        }
+
+    def write(self, snapshot, system=None):
+        keyframe = self.records % KEYFRAME_EVERY == 0
+        body = self.encode(snapshot, keyframe)
+        body["system"] = _system_record(system)
+        data = zlib.compress(pack(body), COMPRESS_LEVEL)
+        self.file.write(RECORD_HEADER.pack(len(data), 1 if keyframe else 0, snapshot.time) + data)
+        self.file.flush()
+        self.records += 1
+        self.bytes += RECORD_HEADER.size + len(data)
+
+    def close(self):
+        self.file.close()
+
+
+# ---------- Reader ----------
+class TraceReader:
+    # Memory-maps a trace and indexes its record headers on open. frame(i)
+    # decodes from the nearest keyframe at or before i, or straight on from
+    # the last decoded record, so playing forward costs one record per step.
+    # Never touches /proc: a trace replays the same on any machine.
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, "rb") as f:
+            try:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise TraceError("empty trace") from e
+        try:
+            self.header, pos = self.read_header()
+            self.hz = self.header.get("hz") or 100
+            self.offsets, self.times, self.keyframes = self.index(pos)
+            self.keyframe_set = set(self.keyframes)
+        except (TraceError, WireError, struct.error, AttributeError) as e:
+            self.map.close()
+            raise TraceError(f"not a SimplyToast trace: {e}") from e
+        self.position = None
+        self.prev = {}
+        self.strings = []
+
+    def read_header(self):
+        m = self.map
+        if m[:len(MAGIC)] != MAGIC:
+            raise TraceError("bad magic")
+        start = len(MAGIC) + 4
+        n = struct.unpack_from(">I", m, len(MAGIC))[0]
+        header = unpack(m[start:start + n])
+        if header.get("version") != TRACE_VERSION:
+            raise TraceError(f"unsupported version {header.get('version')}")
+        return header, start + n
+
+    def index(self, pos):
+        offsets = []
+        times = []
+        keyframes = []
+        m = self.map
+        end = len(m)
+        while pos + RECORD_HEADER.size <= end:
+            length, keyframe, when = RECORD_HEADER.unpack_from(m, pos)
+            if pos + RECORD_HEADER.size + length > end:
+                break
+            if keyframe:
+                keyframes.append(len(offsets))
+            offsets.append(pos)
+            times.append(when)
+            pos += RECORD_HEADER.size + length
+        if offsets and not keyframes or keyframes and keyframes[0] != 0:
+            raise TraceError("first record is not a keyframe")
+        return offsets, times, keyframes
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def close(self):
+        self.map.close()
+
+    def seek_index(self, when):
+        # Last record at or before wall time `when` (0 for earlier times).
+        lo, hi = 0, len(self.times)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.times[mid] <= when:
+                lo = mid + 1
+            else:
+                hi = mid
+        return max(lo - 1, 0)
+
+    def body(self, i):
+        pos = self.offsets[i]
+        length = RECORD_HEADER.unpack_from(self.map, pos)[0]
+        start = pos + RECORD_HEADER.size
+        try:
+            return unpack(zlib.decompress(self.map[start:start + length]))
+        except zlib.error as e:
+            raise TraceError(f"record {i}: {e}") from e
+
+    def frame(self, i):
+        # (Snapshot, SystemSample or None) of record i.
+        if not 0 <= i < len(self.offsets):
+            raise IndexError(i)
+        start = self.keyframe_before(i)
+        if self.position is not None and start <= self.position < i:
+            start = self.position + 1
+        try:
+            for n in range(start, i + 1):
+                snapshot, system = self.decode(n)
+        except (KeyError, IndexError, TypeError, ValueError, WireError) as e:
+            self.position = None
+            raise TraceError(f"record {n}: {e}") from e
+        self.position = i
+        return snapshot, system
+
+    def keyframe_before(self, i):
+        lo, hi = 0, len(self.keyframes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.keyframes[mid] <= i:
+                lo = mid + 1
+            else:
+                hi = mid
+        return self.keyframes[lo - 1]
+
+    def decode(self, i):
+        body = self.body(i)
+        if i in self.keyframe_set:
+            self.prev = {}
+            self.strings = []
+        self.strings.extend(body["strings"])
+        strings = self.strings
+        prev = self.prev
+        columns = [_column_values(data) for data in body["columns"]]
+        if len(columns) != len(COLUMNS) or any(len(col) != body["rows"] for col in columns):
+            raise TraceError("column count mismatch")
+        hz = self.hz
+        current = {}
+        processes = []
+        pid = 0
+        for row in zip(*columns):
+            pid += row[0]
+            code = row[1]
+            if code == 0:
+                starttime, old, sample = prev[pid]
+                if not any(row[2:]):
+                    # Unchanged since the previous record: share the sample.
+                    current[pid] = (starttime, old, sample)
+                    processes.append(sample)
+                    continue
+                values = tuple(map(add, row[2:], old))
+            else:
+                starttime = code - 1
+                values = row[2:]
+            ppid, uid, state, comm, args, ticks, cpu, rss, mem, threads = values
+            sample = ProcessSample(pid, starttime, ppid, uid, chr(state), strings[comm], strings[args],
+                                   ticks / hz, cpu / 10, rss, mem / 10, threads)
+            current[pid] = (starttime, values, sample)
+            processes.append(sample)
+        self.prev = current
+        processes.sort(key=lambda p: (-p.cpu, -p.mem))
+        return (Snapshot(self.times[i], body["interval"], tuple(processes), body["mem_total"]),
+                _system_sample(body.get("system")))
+
+
+def changes(old, new):
+    # (started, exited) between two consecutive replayed snapshots.
+    before = {p.key: p for p in old.processes}
+    after = {p.key for p in new.processes}
+    return ([p for p in new.processes if p.key not in before],
+            [p for key, p in before.items() if key not in after])
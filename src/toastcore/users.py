@@ -0,0 +1,98 @@
+import os
+import pwd
+import time
+
+# ---------- Scopes ----------
+# Which processes the sampler keeps: the user's own, everyone's, or those of
+# system accounts and kernel threads. System accounts are the UIDs below
+# UID_MIN (root included) and those between UID_MAX and 65535: nobody
+# (65534) and systemd's DynamicUser range. Subordinate UIDs of containers
+# start above 65535 and are left out.
+SCOPE_USER = "me"
+SCOPE_ALL = "all"
+SCOPE_SYSTEM = "system"
+SCOPES = (SCOPE_USER, SCOPE_ALL, SCOPE_SYSTEM)
+LOGIN_DEFS = "/etc/login.defs"
+DEFAULT_UID_MIN = 1000
+DEFAULT_UID_MAX = 60000
+LAST_SYSTEM_UID = 65535
+
+
+def read_uid_range(path=LOGIN_DEFS):
+    # (UID_MIN, UID_MAX): the UIDs handed to regular users.
+    found = {"UID_MIN": DEFAULT_UID_MIN, "UID_MAX": DEFAULT_UID_MAX}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] in found:
+                    found[fields[0]] = int(fields[1])
+    except (OSError, ValueError):
+        pass
+    return found["UID_MIN"], found["UID_MAX"]
+
+
+UID_MIN, UID_MAX = read_uid_range()
+
+
+def scope_filter(scope, uid=None):
+    # Predicate on a process's UID, or None when every process is kept.
+    if scope == SCOPE_ALL:
+        return None
+    if scope == SCOPE_SYSTEM:
+        return lambda owner: owner < UID_MIN or UID_MAX < owner <= LAST_SYSTEM_UID
+    if scope == SCOPE_USER:
+        me = os.getuid() if uid is None else uid
+        return lambda owner: owner == me
+    raise ValueError(f"unknown scope {scope!r}")
+
+
+# ---------- Permissions ----------
+def can_inspect(uid, euid=None):
+    # /proc/<pid>/io, smaps_rollup, exe, fd and environ need ptrace read
+    # access: root, or the process's own user. Checked up front so a view of
+    # other users' processes does not fail those reads on every tick.
+    euid = os.geteuid() if euid is None else euid
+    return euid == 0 or uid == euid
+
+
+# ---------- Names ----------
+PASSWD_CHECK_INTERVAL = 60.0
+
+
+class UserNames:
+    # uid -> user name from the passwd database, cached until /etc/passwd
+    # changes. refresh() stats it at most once per PASSWD_CHECK_INTERVAL, so
+    # it can be called every tick; force=True checks right away.
+
+    def __init__(self, passwd="/etc/passwd"):
+        self.passwd = passwd
+        self.names = {}
+        self.mtime = None
+        self.checked = None
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self.checked is not None and now - self.checked < PASSWD_CHECK_INTERVAL:
+            return
+        self.checked = now
+        try:
+            mtime = os.stat(self.passwd).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self.mtime:
+            self.mtime = mtime
+            self.names = {}
+
+    def name(self, uid):
+        name = self.names.get(uid)
+        if name is None:
+            try:
+                name = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                name = str(uid)
+            self.names[uid] = name
+        return name
+
+
+USER_NAMES = UserNames()
@@ -0,0 +1,203 @@
+import struct
+
+# ---------- Compact binary encoding ----------
+# A dependency-free subset of MessagePack (nil, bool, int, float64, str, bin,
+# array, map), so frames stay readable by any msgpack decoder when debugging.
+# Frames on a stream are a 4-byte big-endian length followed by one value.
+
+_pack_f64 = struct.Struct(">Bd").pack
+_unpack_f64 = struct.Struct(">d").unpack_from
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME = 64 * 1024 * 1024
+
+
+class WireError(ValueError):
+    pass
+
+
+def _pack_into(obj, out):
+    if obj is None:
+        out.append(b"\xc0")
+    elif obj is True:
+        out.append(b"\xc3")
+    elif obj is False:
+        out.append(b"\xc2")
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80:
+            out.append(bytes((obj,)))
+        elif -32 <= obj < 0:
+            out.append(bytes((obj & 0xff,)))
+        elif 0 <= obj < 0x100:
+            out.append(struct.pack(">BB", 0xcc, obj))
+        elif 0 <= obj < 0x10000:
+            out.append(struct.pack(">BH", 0xcd, obj))
+        elif 0 <= obj <= 0xffffffff:
+            out.append(struct.pack(">BI", 0xce, obj))
+        elif 0 <= obj <= 0xffffffffffffffff:
+            out.append(struct.pack(">BQ", 0xcf, obj))
+        elif -0x80000000 <= obj < 0:
+            out.append(struct.pack(">Bi", 0xd2, obj))
+        elif -0x8000000000000000 <= obj < 0:
+            out.append(struct.pack(">Bq", 0xd3, obj))
+        else:
+            raise WireError(f"integer out of range: {obj}")
+    elif isinstance(obj, float):
+        out.append(_pack_f64(0xcb, obj))
+    elif isinstance(obj, str):
+        data = obj.encode("utf-8", "surrogateescape")
+        n = len(data)
+        if n < 32:
+            out.append(bytes((0xa0 | n,)))
+        elif n < 0x100:
+            out.append(struct.pack(">BB", 0xd9, n))
+        elif n < 0x10000:
+            out.append(struct.pack(">BH", 0xda, n))
+        else:
+            out.append(struct.pack(">BI", 0xdb, n))
+        out.append(data)
+    elif isinstance(obj, (bytes, bytearray)):
+        n = len(obj)
+        out.append(struct.pack(">BI", 0xc6, n))
+        out.append(bytes(obj))
+    elif isinstance(obj, (list, tuple)):
+        n = len(obj)
+        if n < 16:
+            out.append(bytes((0x90 | n,)))
+        elif n < 0x10000:
+            out.append(struct.pack(">BH", 0xdc, n))
+        else:
+            out.append(struct.pack(">BI", 0xdd, n))
+        for item in obj:
+            _pack_into(item, out)
+    elif isinstance(obj, dict):
+        n = len(obj)
+        if n < 16:
+            out.append(bytes((0x80 | n,)))
+        elif n < 0x10000:
+            out.append(struct.pack(">BH", 0xde, n))
+        else:
+            out.append(struct.pack(">BI", 0xdf, n))
+        for key, value in obj.items():
+            _pack_into(key, out)
+            _pack_into(value, out)
+    else:
+        raise WireError(f"cannot encode {type(obj).__name__}")
+
+
+def pack(obj):
+    out = []
+    _pack_into(obj, out)
+    return b"".join(out)
+
+
+def _unpack(buf, pos):
+    b = buf[pos]
+    pos += 1
+    if b < 0x80:
+        return b, pos
+    if b >= 0xe0:
+        return b - 0x100, pos
+    if 0xa0 <= b <= 0xbf:
+        n = b & 0x1f
+        return bytes(buf[pos:pos + n]).decode("utf-8", "surrogateescape"), pos + n
+    if 0x90 <= b <= 0x9f:
+        return _unpack_array(buf, pos, b & 0x0f)
+    if 0x80 <= b <= 0x8f:
+        return _unpack_map(buf, pos, b & 0x0f)
+    if b == 0xc0:
+        return None, pos
+    if b == 0xc2:
+        return False, pos
+    if b == 0xc3:
+        return True, pos
+    if b == 0xcb:
+        return _unpack_f64(buf, pos)[0], pos + 8
+    if b == 0xcc:
+        return buf[pos], pos + 1
+    if b == 0xcd:
+        return struct.unpack_from(">H", buf, pos)[0], pos + 2
+    if b == 0xce:
+        return struct.unpack_from(">I", buf, pos)[0], pos + 4
+    if b == 0xcf:
+        return struct.unpack_from(">Q", buf, pos)[0], pos + 8
+    if b == 0xd0:
+        return struct.unpack_from(">b", buf, pos)[0], pos + 1
+    if b == 0xd1:
+        return struct.unpack_from(">h", buf, pos)[0], pos + 2
+    if b == 0xd2:
+        return struct.unpack_from(">i", buf, pos)[0], pos + 4
+    if b == 0xd3:
+        return struct.unpack_from(">q", buf, pos)[0], pos + 8
+    if b == 0xca:
+        return struct.unpack_from(">f", buf, pos)[0], pos + 4
+    if b in (0xd9, 0xda, 0xdb):
+        fmt, size = {0xd9: (">B", 1), 0xda: (">H", 2), 0xdb: (">I", 4)}[b]
+        n = struct.unpack_from(fmt, buf, pos)[0]
+        pos += size
+        return bytes(buf[pos:pos + n]).decode("utf-8", "surrogateescape"), pos + n
+    if b in (0xc4, 0xc5, 0xc6):
+        fmt, size = {0xc4: (">B", 1), 0xc5: (">H", 2), 0xc6: (">I", 4)}[b]
+        n = struct.unpack_from(fmt, buf, pos)[0]
+        pos += size
+        return bytes(buf[pos:pos + n]), pos + n
+    if b == 0xdc:
+        return _unpack_array(buf, pos + 2, struct.unpack_from(">H", buf, pos)[0])
+    if b == 0xdd:
+        return _unpack_array(buf, pos + 4, struct.unpack_from(">I", buf, pos)[0])
+    if b == 0xde:
+        return _unpack_map(buf, pos + 2, struct.unpack_from(">H", buf, pos)[0])
+    if b == 0xdf:
+        return _unpack_map(buf, pos + 4, struct.unpack_from(">I", buf, pos)[0])
+    raise WireError(f"unsupported type byte 0x{b:02x}")
+
+
+def _unpack_array(buf, pos, n):
+    items = []
+    for _ in range(n):
+        item, pos = _unpack(buf, pos)
+        items.append(item)
+    return items, pos
+
+
+def _unpack_map(buf, pos, n):
+    result = {}
+    for _ in range(n):
+        key, pos = _unpack(buf, pos)
+        value, pos = _unpack(buf, pos)
+        try:
+            result[key] = value
+        except TypeError as e:
+            raise WireError(f"unhashable map key: {type(key).__name__}") from e
+    return result, pos
+
+
+def unpack(buf):
+    try:
+        obj, pos = _unpack(memoryview(buf), 0)
+    except (IndexError, struct.error) as e:
+        raise WireError("truncated value") from e
+    except RecursionError as e:
+        raise WireError("value nested too deeply") from e
+    if pos != len(buf):
+        raise WireError("trailing bytes")
+    return obj
+
+
+# ---------- Framing ----------
+def frame(obj):
+    body = pack(obj)
+    return FRAME_HEADER.pack(len(body)) + body
+
+
+def read_frames(buf):
+    # Pops every complete frame off the front of a bytearray.
+    frames = []
+    while len(buf) >= 4:
+        n = FRAME_HEADER.unpack_from(buf)[0]
+        if n > MAX_FRAME:
+            raise WireError("frame too large")
+        if len(buf) < 4 + n:
+            break
+        frames.append(unpack(bytes(buf[4:4 + n])))
+        del buf[:4 + n]
+    return frames